@@ -1,49 +1,197 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Header, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.datastructures import MutableHeaders
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, NamedTuple, Optional, Dict, Any, Tuple, Union
 import uuid
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 import json
-import googlemaps
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import bisect
+import collections
+import contextvars
+import fcntl
+import functools
+import gzip
+import hashlib
+import hmac
+import math
+import mmap
+import queue
+import random
+import re
+import struct
+import sys
+import threading
+import time
+import zlib
+from contextlib import asynccontextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait as futures_wait
+from urllib.parse import urlparse
+from cachetools import TTLCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# Initialize LLM integration
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+# Upstream record/replay: "record" saves Places and LLM responses to disk, "replay" serves them without the network
+UPSTREAM_MODE = os.environ.get('UPSTREAM_MODE', 'live')  # "live", "record" or "replay"
 
-# Initialize Google Maps client
-try:
-    gmaps = googlemaps.Client(key=os.environ.get('GOOGLE_PLACES_API_KEY'))
-    GOOGLE_PLACES_ENABLED = True
-except Exception as e:
-    logging.warning(f"Google Places API not available: {str(e)}")
-    gmaps = None
-    GOOGLE_PLACES_ENABLED = False
+# Google Places configuration (GOOGLE_PLACES_BASE_URL points it at a local stand-in for load tests)
+GOOGLE_PLACES_API_KEY = os.environ.get('GOOGLE_PLACES_API_KEY') or ''
+GOOGLE_PLACES_BASE_URL = os.environ.get('GOOGLE_PLACES_BASE_URL', 'https://maps.googleapis.com')
+# googlemaps.Client rejects keys without this prefix, so decide up front instead of building the client
+GOOGLE_PLACES_ENABLED = GOOGLE_PLACES_API_KEY.startswith('AIza') or UPSTREAM_MODE == "replay"
+if not GOOGLE_PLACES_ENABLED:
+    logging.warning(f"Google Places API not available: {'Invalid API key provided' if GOOGLE_PLACES_API_KEY else 'no API key configured'}")
+
+@functools.lru_cache(maxsize=None)
+def get_gmaps():
+    """Google Maps client, built on the first Places call"""
+    if UPSTREAM_MODE == "replay":
+        return ReplayClient(places_recordings)
+    import googlemaps
+    client = googlemaps.Client(
+        key=GOOGLE_PLACES_API_KEY,
+        base_url=GOOGLE_PLACES_BASE_URL,
+        timeout=float(os.environ.get('PLACES_TIMEOUT_SECONDS', 5)),
+        retry_timeout=float(os.environ.get('PLACES_RETRY_TIMEOUT_SECONDS', 5))
+    )
+    return RecordingClient(client, places_recordings) if UPSTREAM_MODE == "record" else client
+
+EXECUTOR_WORKERS = int(os.environ.get('EXECUTOR_WORKERS', 3))
+# Refresh and batch upstream calls (warm-up, enrichment) queue for quota on their own threads
+BACKGROUND_EXECUTOR_WORKERS = int(os.environ.get('BACKGROUND_EXECUTOR_WORKERS', 2))
+SHARED_CACHE_PATH = os.environ.get('SHARED_CACHE_PATH', '')
+
+# MongoDB pool and timeouts (these override the same options in MONGO_URL)
+MONGO_CLIENT_OPTIONS = {
+    "maxPoolSize": int(os.environ.get('MONGO_MAX_POOL_SIZE', 100)),
+    "minPoolSize": int(os.environ.get('MONGO_MIN_POOL_SIZE', 0)),
+    "maxIdleTimeMS": int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', 300000)),
+    "waitQueueTimeoutMS": int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', 2000)),
+    "connectTimeoutMS": int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', 5000)),
+    "serverSelectionTimeoutMS": int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000)),
+    "socketTimeoutMS": int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', 10000))
+}
+# Itinerary reads: primary, primaryPreferred, secondary, secondaryPreferred or nearest
+MONGO_READ_PREFERENCE = os.environ.get('MONGO_READ_PREFERENCE', 'primary')
+MONGO_READ_PREFERENCES = ("primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest")
+# Secondaries lagging further than this are not read from (MongoDB requires at least 90s)
+MONGO_MAX_STALENESS_SECONDS = max(90, int(os.environ.get('MONGO_MAX_STALENESS_SECONDS', 90)))
+
+class WorkerResources:
+    """Per-process clients, pools and tasks; Mongo and the thread pool are created on first use"""
+
+    def __init__(self):
+        self.client = None
+        self._db = None
+        self._read_db = None
+        self._executor = None
+        self._hedge_executor = None
+        self._background_executor = None
+        self.shared_cache = None
+        self.tasks = []
+
+    @property
+    def db(self):
+        """MongoDB connection"""
+        if self._db is None:
+            from motor.motor_asyncio import AsyncIOMotorClient
+            self.client = AsyncIOMotorClient(os.environ['MONGO_URL'], event_listeners=[mongo_pool_listener()],
+                                             **MONGO_CLIENT_OPTIONS)
+            self._db = self.client[os.environ['DB_NAME']]
+        return self._db
+
+    @db.setter
+    def db(self, value):
+        # Benchmarks and load tests inject their own database
+        self._db = value
+        self._read_db = None
+
+    @property
+    def read_db(self):
+        """Database handle for reads that tolerate bounded staleness, routed by MONGO_READ_PREFERENCE"""
+        if self._read_db is None:
+            db = self.db
+            if self.client is None or MONGO_READ_PREFERENCE == "primary":
+                self._read_db = db
+            else:
+                self._read_db = self.client.get_database(os.environ['DB_NAME'], read_preference=mongo_read_preference())
+        return self._read_db
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Thread pool for external API calls"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=EXECUTOR_WORKERS)
+        return self._executor
+
+    @property
+    def background_executor(self) -> ThreadPoolExecutor:
+        """Thread pool for refresh and batch calls, so their quota waits never hold an interactive thread"""
+        if self._background_executor is None:
+            self._background_executor = ThreadPoolExecutor(max_workers=BACKGROUND_EXECUTOR_WORKERS,
+                                                           thread_name_prefix="background")
+        return self._background_executor
+
+    @property
+    def hedge_executor(self) -> ThreadPoolExecutor:
+        """Thread pool running the primary and hedged attempts of hedged upstream calls"""
+        if self._hedge_executor is None:
+            self._hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+        return self._hedge_executor
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+    async def start(self):
+        if MONGO_READ_PREFERENCE not in MONGO_READ_PREFERENCES:
+            raise ValueError(f"MONGO_READ_PREFERENCE must be one of {', '.join(MONGO_READ_PREFERENCES)}, "
+                             f"not {MONGO_READ_PREFERENCE!r}")
+        build_worker_state()
+        if SHARED_CACHE_PATH:
+            self.shared_cache = SharedCache(SHARED_CACHE_PATH, SHARED_CACHE_SIZE_MB * 1024 * 1024, SHARED_CACHE_INDEX_SLOTS)
+        self.tasks.append(asyncio.create_task(monitor_event_loop_lag()))
+        if RATE_LIMIT_ENABLED:
+            if not RATE_LIMIT_TRUST_FORWARDED:
+                logging.warning("Rate limiting by connection address; behind a proxy set RATE_LIMIT_TRUST_FORWARDED=true")
+            self.tasks.append(asyncio.create_task(rate_limit_sync_loop()))
+        if WARMUP_ENABLED:
+            self.tasks.append(asyncio.create_task(warmup_loop()))
+        if ITINERARY_DEDUP_ENABLED:
+            self.tasks.append(asyncio.create_task(ensure_itinerary_body_index()))
+        self.tasks.append(asyncio.create_task(live_poll_loop()))
 
-# Create the main app without a prefix
-app = FastAPI()
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        self.tasks.clear()
+        for executor in (self._executor, self._background_executor, self._hedge_executor):
+            if executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = self._background_executor = self._hedge_executor = None
+        if self.shared_cache:
+            self.shared_cache.close()
+            self.shared_cache = None
+        if self.client:
+            self.client.close()
+            self.client = None
+            self._db = None
+            self._read_db = None
+
+worker = WorkerResources()
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# Thread pool for external API calls
-executor = ThreadPoolExecutor(max_workers=3)
-
 # Pydantic Models
 class TripRequest(BaseModel):
     destination: str
@@ -54,11 +202,48 @@ class TripRequest(BaseModel):
     period_friendly: Optional[bool] = False
     special_preferences: Optional[str] = ""
 
+class DayRegenerationRequest(BaseModel):
+    special_preferences: Optional[str] = ""
+
+# Day contents are fully validated when they come from the LLM; data this service built itself
+# (templates, stored documents) goes through Itinerary.trusted(), which only checks the top level
+class Activity(BaseModel):
+    # Day routing adds place_id, lat, lng and travel_minutes_from_previous
+    model_config = ConfigDict(extra="allow")
+
+    time: str = ""
+    activity: str
+    description: str = ""
+    location: str = ""
+    cost: int = 0
+    safety_level: str = "high"
+    duration: str = ""
+
+class Accommodation(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    name: str
+    type: str = ""
+    location: str = ""
+    cost: int = 0
+    safety_rating: Union[int, float] = 0
+    women_friendly: bool = True
+    amenities: List[str] = []
+
+class Meal(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    meal: str
+    restaurant: str
+    cuisine: str = ""
+    cost: int = 0
+    location: str = ""
+
 class ItineraryDay(BaseModel):
     day: int
-    activities: List[dict]
-    accommodation: dict
-    meals: List[dict]
+    activities: List[Activity]
+    accommodation: Accommodation
+    meals: List[Meal]
     estimated_cost: int
     safety_tips: List[str]
 
@@ -75,6 +260,18 @@ class Itinerary(BaseModel):
     community_impact: dict
     safety_score: int
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    # Bumped by every stored change; status is "template", "enriching", "enriched" or "enrichment_failed",
+    # or "unsaved" for an itinerary served under overload that could not be stored
+    version: int = 1
+    status: str = "template"
+
+    @classmethod
+    def trusted(cls, data: Dict[str, Any]) -> "Itinerary":
+        """Build an itinerary from a stored document or internal data without re-validating its days"""
+        return TrustedItinerary.model_validate(data)
+
+class TrustedItinerary(Itinerary):
+    days: List[Dict[str, Any]]
 
 class CommunityHost(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -85,65 +282,1043 @@ class CommunityHost(BaseModel):
     story: str
     photo_url: str
 
+# Metrics (Prometheus text format, dependency-free and cheap enough for the fast path)
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _format_labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name, self.help_text, self.labels = name, help_text, tuple(labels)
+        self.values: Dict[tuple, float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        if not METRICS_ENABLED:
+            return
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            items = sorted(self.values.items())
+        for label_values, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+class Gauge:
+    def __init__(self, name: str, help_text: str, read):
+        self.name, self.help_text, self.read = name, help_text, read
+
+    def collect(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge", f"{self.name} {self.read()}"]
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help_text, self.labels, self.buckets = name, help_text, tuple(labels), tuple(buckets)
+        self.series: Dict[tuple, list] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        if not METRICS_ENABLED:
+            return
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            items = sorted((labels, (list(counts), total, count)) for labels, (counts, total, count) in self.series.items())
+        for label_values, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, label_values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, label_values)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, label_values)} {count}")
+        return lines
+
+class stage_timer:
+    """Context manager recording the wall time of one generation stage"""
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        stage_latency.observe(time.perf_counter() - self.started, self.stage)
+        if exc_type is not None:
+            errors_total.inc(self.stage)
+        return False
+
+http_in_flight = [0]
+stage_latency = Histogram("sanskriti_stage_duration_seconds", "Latency of itinerary generation stages", ["stage"])
+request_latency = Histogram("sanskriti_http_request_duration_seconds", "HTTP request latency by route", ["method", "route"])
+fallback_total = Counter("sanskriti_fallback_total", "get_fallback_* invocations", ["kind"])
+cache_requests_total = Counter("sanskriti_cache_requests_total", "Cache lookups by cache and result", ["cache", "result"])
+errors_total = Counter("sanskriti_errors_total", "Errors by stage", ["stage"])
+
+def render_metrics() -> str:
+    metrics = [
+        stage_latency, request_latency, fallback_total, cache_requests_total, errors_total,
+        Gauge("sanskriti_executor_queue_depth", "External API calls waiting for an executor thread", executor_queue_depth),
+        Gauge("sanskriti_http_requests_in_flight", "HTTP requests currently being served", lambda: http_in_flight[0]),
+        admission_total, background_writes_dropped_total, circuit_short_circuits_total, hedges_total, upstream_recordings_total,
+        quota_granted_total, quota_timeouts_total, quota_wait, rate_limited_total,
+        response_compression_total, response_bytes_saved_total,
+        itinerary_bodies_total, itinerary_body_bytes_deduplicated_total,
+        enrichment_total, websocket_events_total, websocket_closed_total,
+        Gauge("sanskriti_websocket_connections", "Open live-update WebSocket connections", lambda: len(websocket_connections)),
+        Gauge("sanskriti_websocket_subscriptions", "Itineraries followed by WebSocket connections on this worker",
+              lambda: sum(len(listeners) for listeners in live_subscribers.values())),
+        mongo_reads_total, mongo_pool_wait, mongo_pool_checkout_failures_total,
+        Gauge("sanskriti_mongo_connections_checked_out", "Mongo connections currently checked out",
+              lambda: mongo_pool_state["checked_out"]),
+        Gauge("sanskriti_places_circuit_open", "1 while the Places circuit breaker is open", lambda: int(places_guard.is_open())),
+        Gauge("sanskriti_llm_circuit_open", "1 while every LLM model's circuit breaker is open", lambda: int(llm_router.is_open())),
+        llm_calls_total, llm_latency, llm_tokens_total, llm_cost_usd_total, llm_fallback_total,
+        Gauge("sanskriti_generate_concurrency_limit", "Adaptive concurrency limit for itinerary generation",
+              lambda: int(generate_limiter.limit))
+    ]
+    return "\n".join(line for metric in metrics for line in metric.collect()) + "\n"
+
+class MetricsMiddleware:
+    """Pure ASGI middleware tracking in-flight requests and per-route latency"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        http_in_flight[0] += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            http_in_flight[0] -= 1
+            endpoint = scope.get("endpoint")
+            route = endpoint.__name__ if endpoint else "unmatched"
+            request_latency.observe(time.perf_counter() - started, scope["method"], route)
+
+# Tracing (OpenTelemetry/OTLP-JSON compatible spans, sampled per request and written to a local file)
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', 0))
+TRACE_EXPORT_FILE = os.environ.get('TRACE_EXPORT_FILE', str(ROOT_DIR / 'traces.jsonl'))
+
+current_span = contextvars.ContextVar("current_span", default=None)
+span_export_queue = queue.SimpleQueue()
+span_exporter_thread = None
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    converted = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            converted.append({"key": key, "value": {"boolValue": value}})
+        elif isinstance(value, int):
+            converted.append({"key": key, "value": {"intValue": str(value)}})
+        elif isinstance(value, float):
+            converted.append({"key": key, "value": {"doubleValue": value}})
+        else:
+            converted.append({"key": key, "value": {"stringValue": str(value)}})
+    return converted
+
+def export_spans_forever():
+    """Background writer so span export never blocks the event loop or executor threads"""
+    with open(TRACE_EXPORT_FILE, "a") as export_file:
+        while True:
+            export_file.write(json.dumps(span_export_queue.get()) + "\n")
+            while not span_export_queue.empty():
+                export_file.write(json.dumps(span_export_queue.get()) + "\n")
+            export_file.flush()
+
+def export_span(record: Dict[str, Any]):
+    global span_exporter_thread
+    if span_exporter_thread is None:
+        span_exporter_thread = threading.Thread(target=export_spans_forever, name="span-exporter", daemon=True)
+        span_exporter_thread.start()
+    span_export_queue.put(record)
+
+class span:
+    """Context manager for a child span; a no-op unless the enclosing request was sampled"""
+    __slots__ = ("name", "attributes", "trace_id", "span_id", "parent_id", "start_ns", "token")
+
+    def __init__(self, name: str, trace_id: str = None, parent_id: str = None, **attributes):
+        self.name, self.attributes = name, attributes
+        self.trace_id, self.parent_id, self.token = trace_id, parent_id, None
+
+    def __enter__(self):
+        parent = current_span.get()
+        if self.trace_id is None:
+            if parent is None:
+                return self
+            self.trace_id, self.parent_id = parent.trace_id, parent.span_id
+        self.span_id = os.urandom(8).hex()
+        self.start_ns = time.time_ns()
+        self.token = current_span.set(self)
+        return self
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.token is None:
+            return False
+        current_span.reset(self.token)
+        export_span({
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(time.time_ns()),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": 2, "message": str(exc)[:200]} if exc_type else {"code": 1}
+        })
+        return False
+
+TRACEPARENT_PATTERN = re.compile(r"^(?!ff)[0-9a-f]{2}-(?!0{32})([0-9a-f]{32})-(?!0{16})([0-9a-f]{16})-([0-9a-f]{2})$")
+
+def start_request_span(name: str, traceparent: Optional[str]) -> Optional[span]:
+    """Root span for a request, honouring a valid incoming W3C traceparent (a malformed one starts a new trace)"""
+    match = TRACEPARENT_PATTERN.match(traceparent.strip()) if traceparent else None
+    if match and int(match.group(3), 16) & 1:
+        return span(name, trace_id=match.group(1), parent_id=match.group(2))
+    if TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE:
+        return span(name, trace_id=os.urandom(16).hex())
+    return None
+
+def traced(name: str):
+    """Decorator wrapping a sync or async function in a span"""
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def run_in_executor(fn, *args):
+    """Run fn on the shared executor (the background one for refresh and batch work), carrying the trace context"""
+    context = contextvars.copy_context()
+    executor = worker.executor if upstream_priority.get() == "interactive" else worker.background_executor
+    return asyncio.get_running_loop().run_in_executor(executor, context.run, fn, *args)
+
+class TracingMiddleware:
+    """Pure ASGI middleware opening a root span for sampled requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        traceparent = None
+        for header, value in scope["headers"]:
+            if header == b"traceparent":
+                traceparent = value.decode("latin-1")
+        root = start_request_span(f"{scope['method']} {scope['path']}", traceparent)
+        if root is None:
+            await self.app(scope, receive, send)
+            return
+        with root:
+            await self.app(scope, receive, send)
+
+# Sampling Profiler (on demand, admin only; returns collapsed stacks for flame graphs)
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+PROFILE_MAX_SECONDS = int(os.environ.get('PROFILE_MAX_SECONDS', 60))
+profiler_lock = threading.Lock()
+
+def admin_authorized(token: Optional[str]) -> bool:
+    """Constant-time comparison with ADMIN_TOKEN, so the token cannot be guessed from response timing"""
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+def sample_stacks(seconds: float, interval: float) -> Dict[str, int]:
+    """Sample every thread's stack for the given duration, folded as 'thread;outer;...;inner'"""
+    stacks: Dict[str, int] = {}
+    own_id = threading.get_ident()
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            frames.append(names.get(thread_id, str(thread_id)))
+            key = ";".join(reversed(frames))
+            stacks[key] = stacks.get(key, 0) + 1
+        time.sleep(interval)
+    return stacks
+
+# Upstream Resilience (circuit breakers and hedged requests for Places and the LLM)
+CIRCUIT_WINDOW_SECONDS = float(os.environ.get('CIRCUIT_WINDOW_SECONDS', 30))
+CIRCUIT_MIN_CALLS = int(os.environ.get('CIRCUIT_MIN_CALLS', 10))
+CIRCUIT_ERROR_RATE = float(os.environ.get('CIRCUIT_ERROR_RATE', 0.5))
+CIRCUIT_SLOW_CALL_RATE = float(os.environ.get('CIRCUIT_SLOW_CALL_RATE', 0.8))
+CIRCUIT_COOLDOWN_SECONDS = float(os.environ.get('CIRCUIT_COOLDOWN_SECONDS', 15))
+HEDGE_MIN_DELAY_SECONDS = float(os.environ.get('HEDGE_MIN_DELAY_SECONDS', 0.05))
+HEDGE_MAX_RATIO = float(os.environ.get('HEDGE_MAX_RATIO', 0.1))
+LLM_TIMEOUT_SECONDS = float(os.environ.get('LLM_TIMEOUT_SECONDS', 60))
+
+class CircuitOpenError(Exception):
+    pass
+
+class UpstreamGuard:
+    """Circuit breaker over a rolling window of error and slow-call rates, with optional p95-delayed hedging"""
+
+    def __init__(self, name: str, slow_call_seconds: float, hedge: bool, hedge_permit=None):
+        self.name = name
+        self.slow_call_seconds = slow_call_seconds
+        self.hedge_enabled = hedge
+        self.hedge_permit = hedge_permit  # optional non-blocking quota check for the extra attempt
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.calls = collections.deque()  # (finished_at, latency, ok)
+        self.p95 = None
+        self.calls_since_p95 = 0  # p95 is recomputed every 20 recorded calls, whatever the window length
+        self.hedges_in_window = collections.deque()
+        self.lock = threading.Lock()
+
+    def is_open(self) -> bool:
+        """True while calls should go straight to the fallback path"""
+        return self.state == "open" and time.monotonic() - self.opened_at < CIRCUIT_COOLDOWN_SECONDS
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= CIRCUIT_COOLDOWN_SECONDS:
+                self.state = "half_open"
+            if self.state == "half_open" and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            circuit_short_circuits_total.inc(self.name)
+            return False
+
+    def record(self, latency: float, ok: bool):
+        now = time.monotonic()
+        with self.lock:
+            if self.state == "half_open":
+                self.probe_in_flight = False
+                self.state = "closed" if ok else "open"
+                self.opened_at = now
+                self.calls.clear()
+                if ok:
+                    logging.info(f"Circuit for {self.name} closed after a successful probe")
+                return
+            self.calls.append((now, latency, ok))
+            while self.calls and now - self.calls[0][0] > CIRCUIT_WINDOW_SECONDS:
+                self.calls.popleft()
+            self.calls_since_p95 += 1
+            if self.calls_since_p95 >= 20:
+                self.calls_since_p95 = 0
+                latencies = sorted(call[1] for call in self.calls if call[2])
+                self.p95 = latencies[int(len(latencies) * 0.95)] if len(latencies) >= 20 else None
+            if len(self.calls) < CIRCUIT_MIN_CALLS:
+                return
+            errors = sum(1 for call in self.calls if not call[2])
+            slow = sum(1 for call in self.calls if call[1] > self.slow_call_seconds)
+            if errors / len(self.calls) >= CIRCUIT_ERROR_RATE or slow / len(self.calls) >= CIRCUIT_SLOW_CALL_RATE:
+                self.state = "open"
+                self.opened_at = now
+                logging.warning(f"Circuit for {self.name} opened ({errors} errors, {slow} slow of {len(self.calls)} calls)")
+
+    def take_hedge(self) -> Optional[float]:
+        """Delay before hedging this call, or None when hedging is off, unwarmed or over budget"""
+        # The quota permit is taken later, only if the hedge actually fires
+        if not self.hedge_enabled or self.p95 is None:
+            return None
+        now = time.monotonic()
+        with self.lock:
+            while self.hedges_in_window and now - self.hedges_in_window[0] > CIRCUIT_WINDOW_SECONDS:
+                self.hedges_in_window.popleft()
+            if len(self.hedges_in_window) >= max(1, HEDGE_MAX_RATIO * len(self.calls)):
+                return None
+        return max(HEDGE_MIN_DELAY_SECONDS, self.p95)
+
+    def _spend_hedge(self):
+        with self.lock:
+            self.hedges_in_window.append(time.monotonic())
+        hedges_total.inc(self.name)
+
+    def call(self, fn, *args, **kwargs):
+        """Blocking upstream call (runs on executor threads)"""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        started = time.perf_counter()
+        try:
+            delay = self.take_hedge()
+            if delay is None:
+                result = fn(*args, **kwargs)
+            else:
+                # Each attempt runs in its own copy of the caller's context, so its spans join the request trace
+                primary = worker.hedge_executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+                done, _ = futures_wait([primary], timeout=delay)
+                if done or (self.hedge_permit and not self.hedge_permit()):
+                    result = primary.result()
+                else:
+                    self._spend_hedge()
+                    hedge = worker.hedge_executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+                    pending = {primary, hedge}
+                    while True:
+                        done, pending = futures_wait(pending, return_when=FIRST_COMPLETED)
+                        winner = next((future for future in done if future.exception() is None), None)
+                        if winner is not None or not pending:
+                            result = (winner or done.pop()).result()
+                            break
+        except Exception:
+            self.record(time.perf_counter() - started, False)
+            raise
+        self.record(time.perf_counter() - started, True)
+        return result
+
+    async def call_async(self, factory):
+        """Awaitable upstream call; factory() must return a fresh coroutine for each attempt"""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        started = time.perf_counter()
+        attempts = [asyncio.ensure_future(factory())]
+        try:
+            delay = self.take_hedge()
+            if delay is not None:
+                done, _ = await asyncio.wait(attempts, timeout=delay)
+                if not done and (self.hedge_permit is None or self.hedge_permit()):
+                    self._spend_hedge()
+                    attempts.append(asyncio.ensure_future(factory()))
+            pending = set(attempts)
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if task.exception() is None), None)
+                if winner is not None or not pending:
+                    result = (winner or done.pop()).result()
+                    break
+        except Exception:
+            self.record(time.perf_counter() - started, False)
+            raise
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+        self.record(time.perf_counter() - started, True)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "circuit": self.state,
+            "window_calls": len(self.calls),
+            "p95_ms": round(self.p95 * 1000, 2) if self.p95 else None
+        }
+
+circuit_short_circuits_total = Counter("sanskriti_circuit_short_circuits_total", "Calls rejected by an open circuit", ["upstream"])
+hedges_total = Counter("sanskriti_hedged_requests_total", "Hedged requests issued", ["upstream"])
+HEDGE_WORKERS = int(os.environ.get('HEDGE_WORKERS', 8))
+places_guard = UpstreamGuard(
+    "places", float(os.environ.get('PLACES_SLOW_CALL_SECONDS', 2)),
+    os.environ.get('HEDGE_PLACES', 'false').lower() == 'true',
+    hedge_permit=lambda: places_scheduler.try_acquire(upstream_priority.get())
+)
+
+# Places Quota Scheduler (one token bucket for the shared Places quota, granted by priority class)
+PLACES_QPS = float(os.environ.get('PLACES_QPS', 10))
+PLACES_BURST = float(os.environ.get('PLACES_BURST', 20))
+# Each worker has its own bucket, so the host-wide quota is split evenly between the workers
+PLACES_QUOTA_WORKERS = max(1, int(os.environ.get('PLACES_QUOTA_WORKERS', os.environ.get('WEB_CONCURRENCY', 1))))
+QUOTA_BUDGET_WINDOW_SECONDS = float(os.environ.get('QUOTA_BUDGET_WINDOW_SECONDS', 60))
+
+# Lower number wins. share caps a class's use of the quota within the budget window; max_wait bounds queueing.
+QUOTA_CLASSES = {
+    "interactive": {"priority": 0, "share": 1.0, "max_wait": float(os.environ.get('QUOTA_INTERACTIVE_MAX_WAIT', 2))},
+    "refresh": {"priority": 1, "share": float(os.environ.get('QUOTA_REFRESH_SHARE', 0.3)),
+                "max_wait": float(os.environ.get('QUOTA_REFRESH_MAX_WAIT', 10))},
+    "batch": {"priority": 2, "share": float(os.environ.get('QUOTA_BATCH_SHARE', 0.2)),
+              "max_wait": float(os.environ.get('QUOTA_BATCH_MAX_WAIT', 30))}
+}
+
+# Priority of upstream calls made in the current context; run_in_executor carries it into the thread it picks for it
+upstream_priority = contextvars.ContextVar("upstream_priority", default="interactive")
+
+class QuotaTimeoutError(Exception):
+    pass
+
+class QuotaScheduler:
+    """Thread-safe token bucket; a class is only served when no higher-priority class is waiting"""
+
+    def __init__(self, rate: float, burst: float, classes: Dict[str, Dict[str, float]]):
+        self.rate, self.burst, self.classes = rate, burst, classes
+        self.tokens = burst
+        self.refilled_at = time.monotonic()
+        self.cond = threading.Condition()
+        self.waiting = {name: 0 for name in classes}
+        self.grants = {name: collections.deque() for name in classes}
+        self.granted = {name: 0 for name in classes}
+        self.timeouts = {name: 0 for name in classes}
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
+
+    def _within_budget(self, name: str, now: float) -> bool:
+        grants = self.grants[name]
+        while grants and now - grants[0] > QUOTA_BUDGET_WINDOW_SECONDS:
+            grants.popleft()
+        return len(grants) < max(1, self.classes[name]["share"] * self.rate * QUOTA_BUDGET_WINDOW_SECONDS)
+
+    def _can_grant(self, name: str, now: float) -> bool:
+        priority = self.classes[name]["priority"]
+        if any(self.waiting[other] for other, config in self.classes.items() if config["priority"] < priority):
+            return False
+        return self.tokens >= 1 and self._within_budget(name, now)
+
+    def _retry_after(self, name: str, now: float) -> float:
+        """Seconds until this class could be granted, barring notifications from other waiters"""
+        wait = 0.001
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        if not self._within_budget(name, now):
+            # Over its share: nothing changes until the oldest grant leaves the budget window
+            wait = max(wait, self.grants[name][0] + QUOTA_BUDGET_WINDOW_SECONDS - now)
+        elif self.tokens >= 1:
+            # Only held back by a higher-priority waiter, which notifies when it leaves
+            wait = QUOTA_BUDGET_WINDOW_SECONDS
+        return wait
+
+    def _grant(self, name: str, now: float):
+        self.tokens -= 1
+        self.grants[name].append(now)
+        self.granted[name] += 1
+        quota_granted_total.inc(name)
+
+    def acquire(self, name: str):
+        """Block until a token is granted to this class, or raise QuotaTimeoutError after its max_wait"""
+        started = time.monotonic()
+        deadline = started + self.classes[name]["max_wait"]
+        with self.cond:
+            self.waiting[name] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._can_grant(name, now):
+                        self._grant(name, now)
+                        quota_wait.observe(now - started, name)
+                        return
+                    if now >= deadline:
+                        self.timeouts[name] += 1
+                        quota_timeouts_total.inc(name)
+                        raise QuotaTimeoutError(f"Places quota wait exceeded for {name} calls")
+                    self.cond.wait(min(deadline - now, self._retry_after(name, now)))
+            finally:
+                self.waiting[name] -= 1
+                self.cond.notify_all()
+
+    def try_acquire(self, name: str) -> bool:
+        with self.cond:
+            now = time.monotonic()
+            self._refill(now)
+            if not self._can_grant(name, now):
+                return False
+            self._grant(name, now)
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self.cond:
+            now = time.monotonic()
+            return {
+                "tokens": round(self.tokens, 2),
+                "rate_per_second": self.rate,
+                "classes": {
+                    name: {
+                        "granted": self.granted[name],
+                        "granted_in_window": sum(1 for granted_at in self.grants[name]
+                                                 if now - granted_at <= QUOTA_BUDGET_WINDOW_SECONDS),
+                        "window_budget": int(self.classes[name]["share"] * self.rate * QUOTA_BUDGET_WINDOW_SECONDS),
+                        "waiting": self.waiting[name],
+                        "timeouts": self.timeouts[name]
+                    } for name in self.classes
+                }
+            }
+
+quota_granted_total = Counter("sanskriti_places_quota_granted_total", "Places quota tokens granted", ["priority"])
+quota_timeouts_total = Counter("sanskriti_places_quota_timeouts_total", "Places calls that gave up waiting for quota", ["priority"])
+quota_wait = Histogram("sanskriti_places_quota_wait_seconds", "Time spent waiting for Places quota", ["priority"])
+def build_places_scheduler() -> QuotaScheduler:
+    return QuotaScheduler(PLACES_QPS / PLACES_QUOTA_WORKERS, max(1.0, PLACES_BURST / PLACES_QUOTA_WORKERS), QUOTA_CLASSES)
+
+places_scheduler = build_places_scheduler()
+
+# Shared Cache (one mmap-backed segment per host, shared by every uvicorn worker)
+SHARED_CACHE_SIZE_MB = int(os.environ.get('SHARED_CACHE_SIZE_MB', 64))
+SHARED_CACHE_INDEX_SLOTS = int(os.environ.get('SHARED_CACHE_INDEX_SLOTS', 65536))
+# With the shared tier on, worker-local caches only keep a small, short-lived hot set in front of it
+SHARED_CACHE_LOCAL_TTL_SECONDS = int(os.environ.get('SHARED_CACHE_LOCAL_TTL_SECONDS', 300))
+LOCAL_CACHE_DIVISOR = 8 if SHARED_CACHE_PATH else 1
+
+class SharedCache:
+    """Key/value store in a memory-mapped file: an open-addressed index over a ring of entries.
+
+    Writers serialize on flock; readers are lock-free and validate every entry
+    (key, ring position and crc32), so a concurrent overwrite reads as a miss.
+    """
+    MAGIC = b"SKSHC001"
+    HEADER = struct.Struct("<8sIIQQ")  # magic, index slots, reserved, data size, absolute write position
+    SLOT = struct.Struct("<QQII")  # key hash, absolute entry position, entry length, expires at
+    ENTRY = struct.Struct("<QQIII")  # key hash, absolute entry position, key length, value length, crc32
+    PROBES = 8
+
+    def __init__(self, path: str, data_size: int, index_slots: int):
+        self.path = path
+        self.data_size = data_size
+        self.index_slots = index_slots
+        self.index_start = self.HEADER.size
+        self.data_start = self.index_start + index_slots * self.SLOT.size
+        self.lock = threading.Lock()
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        total = self.data_start + data_size
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self.fd).st_size < total:
+                os.ftruncate(self.fd, total)
+            self.mm = mmap.mmap(self.fd, total)
+            magic, slots, _, size, _ = self.HEADER.unpack_from(self.mm, 0)
+            if (magic, slots, size) != (self.MAGIC, index_slots, data_size):
+                if magic == self.MAGIC:
+                    logging.warning(f"Shared cache {path} had a different layout, resetting it")
+                self.mm[self.index_start:self.data_start] = bytes(self.data_start - self.index_start)
+                self.HEADER.pack_into(self.mm, 0, self.MAGIC, index_slots, 0, data_size, 0)
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def _write_position(self) -> int:
+        return struct.unpack_from("<Q", self.mm, 24)[0]
+
+    @staticmethod
+    def _hash(key: bytes) -> int:
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") or 1
+
+    def _slot_offset(self, key_hash: int, probe: int) -> int:
+        return self.index_start + (key_hash + probe) % self.index_slots * self.SLOT.size
+
+    def _read_entry(self, key: bytes, key_hash: int, position: int, length: int) -> Optional[bytes]:
+        if position < self._write_position() - self.data_size:
+            return None  # the ring has wrapped over this entry
+        offset = self.data_start + position % self.data_size
+        entry_hash, entry_position, key_length, value_length, crc = self.ENTRY.unpack_from(self.mm, offset)
+        if (entry_hash, entry_position, self.ENTRY.size + key_length + value_length) != (key_hash, position, length):
+            return None
+        start = offset + self.ENTRY.size
+        if self.mm[start:start + key_length] != key:
+            return None
+        value = self.mm[start + key_length:start + key_length + value_length]
+        if zlib.crc32(value) != crc or position < self._write_position() - self.data_size:
+            return None
+        return value
+
+    def get(self, key: str) -> Optional[bytes]:
+        encoded = key.encode()
+        key_hash = self._hash(encoded)
+        now = int(time.time())
+        for probe in range(self.PROBES):
+            slot_hash, position, length, expires_at = self.SLOT.unpack_from(self.mm, self._slot_offset(key_hash, probe))
+            if slot_hash == 0:
+                return None
+            if slot_hash == key_hash:
+                if expires_at < now:
+                    return None
+                value = self._read_entry(encoded, key_hash, position, length)
+                if value is not None:
+                    return value
+        return None
+
+    def set(self, key: str, value: bytes, ttl: int) -> bool:
+        encoded = key.encode()
+        length = self.ENTRY.size + len(encoded) + len(value)
+        if length > self.data_size // 16:
+            return False  # keep single entries from flushing the ring
+        key_hash = self._hash(encoded)
+        now = int(time.time())
+        with self.lock:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                position = self._write_position()
+                if position % self.data_size + length > self.data_size:
+                    position += self.data_size - position % self.data_size  # entries never straddle the ring end
+                offset = self.data_start + position % self.data_size
+                self.ENTRY.pack_into(self.mm, offset, key_hash, position, len(encoded), len(value), zlib.crc32(value))
+                self.mm[offset + self.ENTRY.size:offset + length] = encoded + value
+                struct.pack_into("<Q", self.mm, 24, position + length)
+
+                # Reuse this key's slot, else the first empty, expired or overwritten one in the probe window
+                slots = [self._slot_offset(key_hash, probe) for probe in range(self.PROBES)]
+                candidates = [self.SLOT.unpack_from(self.mm, slot) for slot in slots]
+                target = next((slot for slot, (h, _, _, _) in zip(slots, candidates) if h == key_hash), None)
+                if target is None:
+                    oldest = position + length - self.data_size
+                    target = next((slot for slot, (h, p, _, e) in zip(slots, candidates)
+                                   if h == 0 or e < now or p < oldest), slots[0])
+                self.SLOT.pack_into(self.mm, target, key_hash, position, length, now + ttl)
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+        return True
+
+    def delete(self, key: str):
+        key_hash = self._hash(key.encode())
+        with self.lock:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                for probe in range(self.PROBES):
+                    slot = self._slot_offset(key_hash, probe)
+                    slot_hash, position, length, _ = self.SLOT.unpack_from(self.mm, slot)
+                    if slot_hash == key_hash:
+                        self.SLOT.pack_into(self.mm, slot, key_hash, position, length, 0)
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def stats(self) -> Dict[str, Any]:
+        position = self._write_position()
+        return {
+            "path": self.path,
+            "size_bytes": self.data_size,
+            "used_bytes": min(position, self.data_size),
+            "wraps": position // self.data_size
+        }
+
+    def close(self):
+        self.mm.close()
+        os.close(self.fd)
+
+class TieredCache:
+    """Worker-local TTLCache in front of the shared segment (when this worker has one)"""
+    instances: List["TieredCache"] = []
+
+    def reset_local(self):
+        """Start this worker with an empty local tier and a fresh lock (nothing inherited from a parent process)"""
+        self.local = TTLCache(maxsize=self.local.maxsize, ttl=self.local.ttl)
+        self.lock = threading.Lock()
+
+    def __init__(self, name: str, maxsize: int, ttl: int, raw: bool = False, local_ttl: Optional[int] = None,
+                 decode=None):
+        self.name = name
+        self.ttl = ttl
+        self.raw = raw  # values are already bytes
+        self.decode = decode  # rebuilds the local value from its JSON form
+        if local_ttl is None:
+            local_ttl = min(ttl, SHARED_CACHE_LOCAL_TTL_SECONDS) if SHARED_CACHE_PATH else ttl
+        self.local = TTLCache(maxsize=max(1, maxsize // LOCAL_CACHE_DIVISOR), ttl=local_ttl)
+        self.lock = threading.Lock()
+        TieredCache.instances.append(self)
+
+    def _shared_key(self, key) -> str:
+        return self.name + ":" + json.dumps(key, separators=(",", ":"))
+
+    def get(self, key):
+        with self.lock:
+            value = self.local.get(key)
+        if value is not None:
+            cache_requests_total.inc(self.name, "hit")
+            return value
+        if worker.shared_cache is not None:
+            value = worker.shared_cache.get(self._shared_key(key))
+            if value is not None:
+                value = value if self.raw else json.loads(value)
+                if self.decode is not None:
+                    value = self.decode(value)
+                with self.lock:
+                    self.local[key] = value
+                cache_requests_total.inc(self.name, "shared_hit")
+                return value
+        cache_requests_total.inc(self.name, "miss")
+        return None
+
+    def set(self, key, value):
+        with self.lock:
+            self.local[key] = value
+        if worker.shared_cache is not None:
+            encoded = value if self.raw else json.dumps(value, separators=(",", ":")).encode()
+            worker.shared_cache.set(self._shared_key(key), encoded, self.ttl)
+
+    def delete(self, key):
+        with self.lock:
+            self.local.pop(key, None)
+        if worker.shared_cache is not None:
+            worker.shared_cache.delete(self._shared_key(key))
+
+    def __len__(self):
+        return len(self.local)
+
+# Places Records (raw Places results are reduced to one tuple per place as soon as they arrive)
+class Place(NamedTuple):
+    place_id: Optional[str]
+    name: Optional[str]
+    address: Optional[str]  # formatted_address
+    vicinity: Optional[str]
+    rating: float
+    price_level: Optional[int]
+    types: Tuple[str, ...]
+    lat: Optional[float]
+    lng: Optional[float]
+    reviews_count: int
+
+    @classmethod
+    def from_result(cls, result: Dict[str, Any]) -> "Place":
+        location = result.get('geometry', {}).get('location', {})
+        return cls(
+            result.get('place_id'), result.get('name'), result.get('formatted_address'), result.get('vicinity'),
+            result.get('rating', 0), result.get('price_level'), tuple(result.get('types', ())),
+            location.get('lat'), location.get('lng'), len(result.get('reviews', ()))
+        )
+
+def decode_places(rows: List[list]) -> List[Place]:
+    """Rebuild records read back from the shared cache (JSON turned them, and their types, into lists)"""
+    return [Place._make(row)._replace(types=tuple(row[6])) for row in rows]
+
+# Upstream Recordings (request/response pairs in append-only gzip JSON lines, one file per upstream)
+UPSTREAM_RECORDINGS_DIR = Path(os.environ.get('UPSTREAM_RECORDINGS_DIR', ROOT_DIR / 'upstream_recordings'))
+# Replayed calls wait for the recorded latency times the scale, or a fixed REPLAY_LATENCY_MS when that is set
+REPLAY_LATENCY_SCALE = float(os.environ.get('REPLAY_LATENCY_SCALE', 1.0))
+REPLAY_LATENCY_MS = os.environ.get('REPLAY_LATENCY_MS')
+
+upstream_recordings_total = Counter("sanskriti_upstream_recordings_total", "Upstream calls recorded or replayed", ["upstream", "result"])
+
+class ReplayMissError(Exception):
+    pass
+
+class UpstreamRecordings:
+    def __init__(self, upstream: str):
+        self.upstream = upstream
+        self.path = UPSTREAM_RECORDINGS_DIR / f"{upstream}.jsonl.gz"
+        self.lock = threading.Lock()
+        self.entries: Optional[Dict[str, tuple]] = None
+
+    @staticmethod
+    def key(*request) -> str:
+        return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode()).hexdigest()
+
+    def record(self, request: list, response, latency: float):
+        line = json.dumps({"key": self.key(*request), "request": request, "latency": round(latency, 4),
+                           "response": response}, default=str)
+        with self.lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Each append is its own gzip member; gzip readers see one continuous stream
+            with gzip.open(self.path, "at", encoding="utf-8") as recording:
+                recording.write(line + "\n")
+        upstream_recordings_total.inc(self.upstream, "recorded")
+
+    def _load(self) -> Dict[str, tuple]:
+        with self.lock:
+            if self.entries is None:
+                entries = {}
+                if self.path.exists():
+                    with gzip.open(self.path, "rt", encoding="utf-8") as recording:
+                        for line in recording:
+                            entry = json.loads(line)
+                            entries[entry["key"]] = (entry["response"], entry["latency"])  # the latest recording wins
+                self.entries = entries
+                logging.info(f"Loaded {len(entries)} {self.upstream} recordings from {self.path}")
+        return self.entries
+
+    def replay(self, request: list):
+        """Recorded response and the delay to serve it with; ReplayMissError when it was never recorded"""
+        entry = self._load().get(self.key(*request))
+        if entry is None:
+            upstream_recordings_total.inc(self.upstream, "miss")
+            raise ReplayMissError(f"No {self.upstream} recording for {str(request)[:120]}")
+        upstream_recordings_total.inc(self.upstream, "replayed")
+        response, latency = entry
+        delay = float(REPLAY_LATENCY_MS) / 1000 if REPLAY_LATENCY_MS else latency * REPLAY_LATENCY_SCALE
+        return response, delay
+
+places_recordings = UpstreamRecordings("places")
+llm_recordings = UpstreamRecordings("llm")
+
+class RecordingClient:
+    """googlemaps.Client wrapper saving each call (places, place, distance_matrix) and its response"""
+
+    def __init__(self, client, recordings: UpstreamRecordings):
+        self.client, self.recordings = client, recordings
+
+    def __getattr__(self, method):
+        def call(*args, **kwargs):
+            started = time.perf_counter()
+            response = getattr(self.client, method)(*args, **kwargs)
+            self.recordings.record([method, args, kwargs], response, time.perf_counter() - started)
+            return response
+        return call
+
+class ReplayClient:
+    """Stands in for googlemaps.Client, answering from recordings (runs on executor threads)"""
+
+    def __init__(self, recordings: UpstreamRecordings):
+        self.recordings = recordings
+
+    def __getattr__(self, method):
+        def call(*args, **kwargs):
+            response, delay = self.recordings.replay([method, args, kwargs])
+            time.sleep(delay)
+            return response
+        return call
+
+class RecordingLlmChat:
+    def __init__(self, chat, recordings: UpstreamRecordings, model: str):
+        self.chat, self.recordings, self.model = chat, recordings, model
+
+    async def send_message(self, message):
+        started = time.perf_counter()
+        response = await self.chat.send_message(message)
+        self.recordings.record([self.model, message.text], response, time.perf_counter() - started)
+        return response
+
+class ReplayMessage(NamedTuple):
+    text: str
+
+class ReplayLlmChat:
+    def __init__(self, recordings: UpstreamRecordings, model: str):
+        self.recordings, self.model = recordings, model
+
+    async def send_message(self, message):
+        response, delay = self.recordings.replay([self.model, message.text])
+        await asyncio.sleep(delay)
+        return response
+
+# Caches (Places records are read from executor threads; TieredCache locks internally)
+places_cache = TieredCache(
+    "places",
+    maxsize=int(os.environ.get('PLACES_CACHE_SIZE', 2048)),
+    ttl=int(os.environ.get('PLACES_CACHE_TTL_SECONDS', 6 * 3600)),
+    decode=decode_places
+)
+template_cache = TieredCache(
+    "template",
+    maxsize=int(os.environ.get('TEMPLATE_CACHE_SIZE', 1024)),
+    ttl=int(os.environ.get('TEMPLATE_CACHE_TTL_SECONDS', 24 * 3600))
+)
+llm_cache = TieredCache(
+    "llm",
+    maxsize=int(os.environ.get('LLM_CACHE_SIZE', 256)),
+    ttl=int(os.environ.get('LLM_CACHE_TTL_SECONDS', 24 * 3600))
+)
+# Last LLM itinerary per trip shape, served when every model misses the deadline
+llm_trip_cache = TieredCache(
+    "llm_trip",
+    maxsize=int(os.environ.get('LLM_TRIP_CACHE_SIZE', 1024)),
+    ttl=int(os.environ.get('LLM_TRIP_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+)
+# Serialized itinerary documents, so GET /api/itinerary/{id} can skip Mongo. Itineraries change
+# (day regeneration), and a worker can only invalidate its own local tier and the shared one, so
+# other workers' local copies are kept for ITINERARY_LOCAL_TTL_SECONDS at most
+itinerary_cache = TieredCache(
+    "itinerary",
+    maxsize=int(os.environ.get('ITINERARY_CACHE_SIZE', 1024)),
+    ttl=int(os.environ.get('ITINERARY_CACHE_TTL_SECONDS', 3600)),
+    raw=True,
+    local_ttl=int(os.environ.get('ITINERARY_LOCAL_TTL_SECONDS', 5))
+)
+
+@traced("places.search")
+def places_search(query: str, place_type: str) -> List[Place]:
+    """Places text search, served from the Places cache when possible"""
+    key = ("search_records", query, place_type)
+    places = places_cache.get(key)
+    if places is None:
+        places_scheduler.acquire(upstream_priority.get())
+        with stage_timer("places_search"):
+            result = places_guard.call(get_gmaps().places, query=query, type=place_type)
+        places = [Place.from_result(place) for place in result.get('results', [])]
+        places_cache.set(key, places)
+    return places
+
+@traced("places.details")
+def place_details(place_id: str, fields: List[str]) -> Place:
+    """Place Details lookup, served from the Places cache when possible"""
+    key = ("details_records", place_id, tuple(fields))
+    places = places_cache.get(key)
+    if places is None:
+        places_scheduler.acquire(upstream_priority.get())
+        with stage_timer("place_details"):
+            result = places_guard.call(get_gmaps().place, place_id, fields=fields)
+        places = [Place.from_result(result.get('result', {}))]
+        places_cache.set(key, places)
+    return places[0]
+
 # Real Data Fetching Functions
+@traced("get_real_accommodations")
 def get_real_accommodations(destination: str, budget_per_night: int, is_solo_female: bool = True) -> List[Dict[str, Any]]:
     """Fetch real hotels from Google Places API with safety focus"""
-    if not GOOGLE_PLACES_ENABLED:
+    if not GOOGLE_PLACES_ENABLED or places_guard.is_open():
         return get_fallback_accommodations(destination, budget_per_night, is_solo_female)
     
     try:
         # Search for hotels in the destination
-        places_result = gmaps.places(
-            query=f"hotels in {destination}",
-            type='lodging'
-        )
-        
-        hotels = []
-        for place in places_result.get('results', [])[:5]:
+        candidates = []
+        for place in places_search(f"hotels in {destination}", 'lodging')[:5]:
             # Get detailed information
-            place_details = gmaps.place(place['place_id'], fields=[
+            details = place_details(place.place_id, [
                 'name', 'formatted_address', 'rating', 'price_level', 
                 'reviews', 'types', 'photos', 'opening_hours'
             ])
             
-            place_info = place_details.get('result', {})
-            rating = place_info.get('rating', 0)
-            
             # Filter for safety (especially for solo female travelers)
-            if is_solo_female and rating < 4.0:
+            if is_solo_female and details.rating < 4.0:
                 continue
                 
             # Estimate cost based on price level and budget
-            price_level = place_info.get('price_level', 2)
+            price_level = 2 if details.price_level is None else details.price_level
             estimated_cost = 2000 + (price_level * 1500)  # Basic estimation
             
             if estimated_cost > budget_per_night * 1.5:  # Allow some flexibility
                 continue
-                
-            hotel = {
-                "name": place_info.get('name', 'Unknown Hotel'),
-                "location": place_info.get('formatted_address', destination),
-                "cost": min(estimated_cost, budget_per_night),
-                "safety_rating": min(5, int(rating)),
-                "women_friendly": rating >= 4.0 and 'hotel' in place_info.get('types', []),
-                "amenities": get_hotel_amenities(place_info, is_solo_female),
-                "rating": rating,
-                "reviews_count": len(place_info.get('reviews', [])),
-                "type": "hotel"
-            }
-            hotels.append(hotel)
+            women_friendly = details.rating >= 4.0 and 'hotel' in details.types
+            candidates.append((women_friendly, estimated_cost, details))
             
-        # Sort by rating and women-friendliness
-        hotels.sort(key=lambda x: (x['women_friendly'], x['rating']), reverse=True)
-        return hotels[:3]
+        # Sort by rating and women-friendliness; dicts are built for the returned hotels only
+        candidates.sort(key=lambda candidate: (candidate[0], candidate[2].rating), reverse=True)
+        return [{
+            "name": details.name or 'Unknown Hotel',
+            "location": details.address or destination,
+            "cost": min(estimated_cost, budget_per_night),
+            "safety_rating": min(5, int(details.rating)),
+            "women_friendly": women_friendly,
+            "amenities": get_hotel_amenities(details, is_solo_female),
+            "rating": details.rating,
+            "reviews_count": details.reviews_count,
+            "type": "hotel"
+        } for women_friendly, estimated_cost, details in candidates[:3]]
         
     except Exception as e:
         logging.error(f"Error fetching real accommodations: {str(e)}")
         return get_fallback_accommodations(destination, budget_per_night, is_solo_female)
 
+@traced("get_real_restaurants")
 def get_real_restaurants(destination: str, meal_type: str = "restaurant", cuisine_preference: str = None) -> List[Dict[str, Any]]:
     """Fetch real restaurants from Google Places API"""
-    if not GOOGLE_PLACES_ENABLED:
+    if not GOOGLE_PLACES_ENABLED or places_guard.is_open():
         return get_fallback_restaurants(destination, meal_type, cuisine_preference)
     
     try:
@@ -151,37 +1326,26 @@ def get_real_restaurants(destination: str, meal_type: str = "restaurant", cuisin
         if cuisine_preference:
             query += f" {cuisine_preference} cuisine"
             
-        places_result = gmaps.places(query=query, type='restaurant')
-        
-        restaurants = []
-        for place in places_result.get('results', [])[:8]:
-            rating = place.get('rating', 0)
-            if rating < 3.5:  # Filter for quality
-                continue
-                
-            price_level = place.get('price_level', 2)
-            estimated_cost = 300 + (price_level * 200)  # Basic meal cost estimation
-            
-            restaurant = {
-                "name": place.get('name', 'Local Restaurant'),
-                "location": place.get('vicinity', destination),
-                "cuisine": cuisine_preference or determine_cuisine_type(place.get('name', ''), place.get('types', [])),
-                "cost": estimated_cost,
-                "rating": rating,
-                "meal": meal_type,
-                "women_safe": rating >= 4.0  # Basic safety indicator
-            }
-            restaurants.append(restaurant)
-            
-        return restaurants[:5]
+        # Filter for quality
+        places = [place for place in places_search(query, 'restaurant')[:8] if place.rating >= 3.5]
+        return [{
+            "name": place.name or 'Local Restaurant',
+            "location": place.vicinity or destination,
+            "cuisine": cuisine_preference or determine_cuisine_type(place.name or '', place.types),
+            "cost": 300 + ((2 if place.price_level is None else place.price_level) * 200),  # Basic meal cost estimation
+            "rating": place.rating,
+            "meal": meal_type,
+            "women_safe": place.rating >= 4.0  # Basic safety indicator
+        } for place in places[:5]]
         
     except Exception as e:
         logging.error(f"Error fetching real restaurants: {str(e)}")
         return get_fallback_restaurants(destination, meal_type, cuisine_preference)
 
+@traced("get_real_attractions")
 def get_real_attractions(destination: str, theme: str) -> List[Dict[str, Any]]:
     """Fetch real tourist attractions from Google Places API"""
-    if not GOOGLE_PLACES_ENABLED:
+    if not GOOGLE_PLACES_ENABLED or places_guard.is_open():
         return get_fallback_attractions(destination, theme)
     
     try:
@@ -195,47 +1359,37 @@ def get_real_attractions(destination: str, theme: str) -> List[Dict[str, Any]]:
         }
         
         query = theme_queries.get(theme, f"tourist attractions in {destination}")
-        places_result = gmaps.places(query=query, type='tourist_attraction')
-        
-        attractions = []
-        for place in places_result.get('results', [])[:10]:
-            rating = place.get('rating', 0)
-            if rating < 3.5:
-                continue
-                
-            # Estimate entry cost based on place type and rating
-            entry_cost = estimate_attraction_cost(place, theme)
-            
-            attraction = {
-                "activity": f"Visit {place.get('name', 'Local Attraction')}",
-                "description": generate_attraction_description(place, theme),
-                "location": place.get('vicinity', destination),
-                "cost": entry_cost,
-                "safety_level": "high" if rating >= 4.0 else "medium",
-                "duration": estimate_visit_duration(place, theme),
-                "time": get_recommended_visit_time(place, theme),
-                "rating": rating
-            }
-            attractions.append(attraction)
-            
-        return attractions[:6]
+        places = [place for place in places_search(query, 'tourist_attraction')[:10] if place.rating >= 3.5]
+        return [{
+            "activity": f"Visit {place.name or 'Local Attraction'}",
+            "description": generate_attraction_description(place, theme),
+            "location": place.vicinity or destination,
+            "cost": estimate_attraction_cost(place, theme),  # based on place type and rating
+            "safety_level": "high" if place.rating >= 4.0 else "medium",
+            "duration": estimate_visit_duration(place, theme),
+            "time": get_recommended_visit_time(place, theme),
+            "rating": place.rating,
+            "place_id": place.place_id,
+            "lat": place.lat,
+            "lng": place.lng
+        } for place in places[:6]]
         
     except Exception as e:
         logging.error(f"Error fetching real attractions: {str(e)}")
         return get_fallback_attractions(destination, theme)
 
 # Helper Functions
-def get_hotel_amenities(place_info: Dict, is_solo_female: bool) -> List[str]:
+def get_hotel_amenities(place_info: Place, is_solo_female: bool) -> List[str]:
     """Generate realistic amenities based on hotel info"""
     base_amenities = ["WiFi", "Room Service"]
     
     if is_solo_female:
         base_amenities.extend(["24/7 Security", "Women-Safe Environment"])
         
-    if place_info.get('rating', 0) >= 4.0:
+    if place_info.rating >= 4.0:
         base_amenities.extend(["Concierge", "Restaurant"])
         
-    if place_info.get('price_level', 0) >= 3:
+    if (place_info.price_level or 0) >= 3:
         base_amenities.extend(["Spa", "Fitness Center", "Swimming Pool"])
         
     return base_amenities
@@ -257,9 +1411,9 @@ def determine_cuisine_type(name: str, types: List[str]) -> str:
     else:
         return "Local Cuisine"
 
-def estimate_attraction_cost(place: Dict, theme: str) -> int:
+def estimate_attraction_cost(place: Place, theme: str) -> int:
     """Estimate entry cost for attractions"""
-    rating = place.get('rating', 3.0)
+    rating = place.rating
     
     theme_costs = {
         "heritage": 100 + int(rating * 50),  # Monuments usually have entry fees
@@ -271,7 +1425,7 @@ def estimate_attraction_cost(place: Dict, theme: str) -> int:
     
     return theme_costs.get(theme, 200)
 
-def estimate_visit_duration(place: Dict, theme: str) -> str:
+def estimate_visit_duration(place: Place, theme: str) -> str:
     """Estimate visit duration based on place type and theme"""
     theme_durations = {
         "heritage": "2-3 hours",
@@ -283,7 +1437,7 @@ def estimate_visit_duration(place: Dict, theme: str) -> str:
     
     return theme_durations.get(theme, "2 hours")
 
-def get_recommended_visit_time(place: Dict, theme: str) -> str:
+def get_recommended_visit_time(place: Place, theme: str) -> str:
     """Get recommended visit time based on theme"""
     theme_times = {
         "heritage": "9:00 AM",
@@ -295,10 +1449,10 @@ def get_recommended_visit_time(place: Dict, theme: str) -> str:
     
     return theme_times.get(theme, "10:00 AM")
 
-def generate_attraction_description(place: Dict, theme: str) -> str:
+def generate_attraction_description(place: Place, theme: str) -> str:
     """Generate themed description for attractions"""
-    name = place.get('name', 'attraction')
-    rating = place.get('rating', 3.0)
+    name = place.name or 'attraction'
+    rating = place.rating
     
     descriptions = {
         "heritage": f"Explore the historical significance of {name}. A well-preserved monument showcasing architectural brilliance (Rating: {rating}/5)",
@@ -313,6 +1467,7 @@ def generate_attraction_description(place: Dict, theme: str) -> str:
 # Fallback Functions (when Google Places API is not available)
 def get_fallback_accommodations(destination: str, budget_per_night: int, is_solo_female: bool) -> List[Dict[str, Any]]:
     """Fallback accommodations with realistic names"""
+    fallback_total.inc("accommodations")
     base_hotels = [
         {"name": f"Hotel Heritage {destination.split(',')[0]}", "type": "heritage hotel", "rating": 4.2},
         {"name": "Safe Haven Guest House", "type": "guesthouse", "rating": 4.5},
@@ -335,6 +1490,7 @@ def get_fallback_accommodations(destination: str, budget_per_night: int, is_solo
 
 def get_fallback_restaurants(destination: str, meal_type: str, cuisine_preference: str) -> List[Dict[str, Any]]:
     """Fallback restaurants with realistic names"""
+    fallback_total.inc("restaurants")
     base_restaurants = [
         {"name": f"Royal Kitchen {destination.split(',')[0]}", "cuisine": "North Indian"},
         {"name": "Spice Garden Restaurant", "cuisine": "Local Cuisine"},
@@ -358,6 +1514,7 @@ def get_fallback_restaurants(destination: str, meal_type: str, cuisine_preferenc
 
 def get_fallback_attractions(destination: str, theme: str) -> List[Dict[str, Any]]:
     """Fallback attractions with realistic activities"""
+    fallback_total.inc("attractions")
     theme_attractions = {
         "heritage": [
             {"activity": f"Explore {destination} Fort", "cost": 150},
@@ -400,9 +1557,232 @@ def get_fallback_attractions(destination: str, theme: str) -> List[Dict[str, Any
     
     return attractions
 
+# Travel Times and Day Routing (place-id keyed travel-time matrix, nearest-neighbour + 2-opt ordering)
+TRAVEL_MATRIX_SOURCE = os.environ.get('TRAVEL_MATRIX_SOURCE', 'estimate')  # "estimate" or "distance_matrix"
+TRAVEL_SPEED_KMH = float(os.environ.get('TRAVEL_SPEED_KMH', 18))  # door-to-door city average
+TRAVEL_ROAD_FACTOR = 1.4  # road distance over straight-line distance
+TRAVEL_TIME_TTL_DAYS = int(os.environ.get('TRAVEL_TIME_TTL_DAYS', 30))
+DISTANCE_MATRIX_BATCH = 10  # 10 x 10 = 100 elements, the per-request limit
+ROUTING_MAX_PASSES = int(os.environ.get('ROUTING_MAX_PASSES', 20))  # 2-opt passes over a day before settling
+
+travel_time_cache = TieredCache(
+    "travel_time",
+    maxsize=int(os.environ.get('TRAVEL_TIME_CACHE_SIZE', 50000)),
+    ttl=TRAVEL_TIME_TTL_DAYS * 86400
+)
+
+def estimate_travel_seconds(origin: Dict[str, Any], destination: Dict[str, Any]) -> int:
+    """Haversine distance, stretched to road distance, at city speed plus a fixed pickup overhead"""
+    lat1, lng1, lat2, lng2 = map(math.radians, (origin["lat"], origin["lng"], destination["lat"], destination["lng"]))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    km = 6371 * 2 * math.asin(math.sqrt(a)) * TRAVEL_ROAD_FACTOR
+    return int(km / TRAVEL_SPEED_KMH * 3600) + 300
+
+def fetch_distance_matrix(places: List[Dict[str, Any]]) -> Dict[tuple, int]:
+    """Driving times for every pair, in 10 x 10 Distance Matrix blocks (runs on executor threads)"""
+    seconds = {}
+    for i in range(0, len(places), DISTANCE_MATRIX_BATCH):
+        origins = places[i:i + DISTANCE_MATRIX_BATCH]
+        for j in range(0, len(places), DISTANCE_MATRIX_BATCH):
+            destinations = places[j:j + DISTANCE_MATRIX_BATCH]
+            places_scheduler.acquire(upstream_priority.get())
+            with stage_timer("distance_matrix"):
+                result = places_guard.call(
+                    get_gmaps().distance_matrix,
+                    origins=[f"place_id:{place['place_id']}" for place in origins],
+                    destinations=[f"place_id:{place['place_id']}" for place in destinations],
+                    mode="driving"
+                )
+            for origin, row in zip(origins, result.get("rows", [])):
+                for destination, element in zip(destinations, row.get("elements", [])):
+                    if element.get("status") == "OK":
+                        seconds[(origin["place_id"], destination["place_id"])] = element["duration"]["value"]
+    return seconds
+
+async def persist_travel_times(seconds: Dict[tuple, int]):
+    from pymongo import UpdateOne
+    now = datetime.now(timezone.utc)
+    try:
+        with span("mongo.travel_times.bulk_write", pairs=len(seconds)):
+            await worker.db.travel_times.bulk_write([
+                UpdateOne({"_id": f"{origin}|{destination}"}, {"$set": {"seconds": value, "updated_at": now}}, upsert=True)
+                for (origin, destination), value in seconds.items()
+            ], ordered=False)
+    except Exception as e:
+        logging.warning(f"Saving travel times failed: {e}")
+
+async def travel_time_matrix(places: List[Dict[str, Any]]) -> Dict[tuple, int]:
+    """Travel seconds for every ordered pair of places: memory, then MongoDB, then filled in bulk"""
+    pairs = [(a["place_id"], b["place_id"]) for a in places for b in places if a["place_id"] != b["place_id"]]
+    matrix, missing = {}, []
+    for pair in pairs:
+        value = travel_time_cache.get(pair)
+        if value is None:
+            missing.append(pair)
+        else:
+            matrix[pair] = value
+    if not missing:
+        return matrix
+
+    try:
+        fresh_after = datetime.now(timezone.utc) - timedelta(days=TRAVEL_TIME_TTL_DAYS)
+        with span("mongo.travel_times.find", pairs=len(missing)):
+            documents = await worker.read_db.travel_times.find(
+                {"_id": {"$in": [f"{a}|{b}" for a, b in missing]}, "updated_at": {"$gte": fresh_after}}
+            ).to_list(None)
+        for document in documents:
+            pair = tuple(document["_id"].split("|", 1))
+            matrix[pair] = document["seconds"]
+            travel_time_cache.set(pair, document["seconds"])
+    except Exception as e:
+        logging.warning(f"Loading travel times failed: {e}")
+
+    missing = [pair for pair in missing if pair not in matrix]
+    if missing:
+        by_id = {place["place_id"]: place for place in places}
+        needed = [by_id[place_id] for place_id in dict.fromkeys(place_id for pair in missing for place_id in pair)]
+        filled = {}
+        if TRAVEL_MATRIX_SOURCE == "distance_matrix" and GOOGLE_PLACES_ENABLED and not places_guard.is_open():
+            try:
+                filled = await run_in_executor(fetch_distance_matrix, needed)
+            except Exception as e:
+                logging.warning(f"Distance Matrix failed, estimating travel times: {e}")
+        for origin, destination in missing:
+            if (origin, destination) not in filled:
+                filled[(origin, destination)] = estimate_travel_seconds(by_id[origin], by_id[destination])
+        missing_pairs = set(missing)
+        filled = {pair: value for pair, value in filled.items() if pair in missing_pairs}
+        for pair, value in filled.items():
+            travel_time_cache.set(pair, value)
+        matrix.update(filled)
+        persist_in_background(persist_travel_times(filled))
+    return matrix
+
+def path_cost(order: List[int], cost) -> float:
+    return sum(cost(a, b) for a, b in zip(order, order[1:]))
+
+def order_stops(count: int, cost) -> List[int]:
+    """Open path over all stops: best nearest-neighbour tour over every start, then 2-opt"""
+    if count < 3:
+        return list(range(count))
+    best, best_length = None, None
+    for start in range(count):
+        order, unvisited = [start], set(range(count)) - {start}
+        while unvisited:
+            nearest = min(unvisited, key=lambda stop: cost(order[-1], stop))
+            order.append(nearest)
+            unvisited.remove(nearest)
+        length = path_cost(order, cost)
+        if best_length is None or length < best_length:
+            best, best_length = order, length
+
+    # Travel times can differ by direction, so a reversal is priced over the whole segment, not just its ends
+    for _ in range(ROUTING_MAX_PASSES):
+        improved = False
+        for i in range(1, count - 1):
+            for k in range(i + 1, count):
+                end = min(k + 2, count)
+                before = path_cost(best[i - 1:end], cost)
+                candidate = best[:i] + best[i:k + 1][::-1] + best[k + 1:]
+                if path_cost(candidate[i - 1:end], cost) < before - 1e-9:
+                    best = candidate
+                    improved = True
+        if not improved:
+            break
+    return best
+
+def parse_duration_hours(duration: str) -> float:
+    """Hours from a duration such as "2-3 hours" or "90 minutes" (2 when unparseable)"""
+    numbers = [float(n) for n in re.findall(r"\d+(?:\.\d+)?", duration or "")]
+    if not numbers:
+        return 2.0
+    value = sum(numbers) / len(numbers)
+    return value / 60 if "min" in duration.lower() else value
+
+def parse_clock(value: str) -> Optional[int]:
+    """Minutes after midnight for a time such as 9:00 AM"""
+    match = re.match(r"\s*(\d{1,2}):(\d{2})\s*([AaPp][Mm])", value or "")
+    if not match:
+        return None
+    hour, minute, meridiem = int(match.group(1)) % 12, int(match.group(2)), match.group(3).upper()
+    return (hour + (12 if meridiem == "PM" else 0)) * 60 + minute
+
+def format_clock(minutes: int) -> str:
+    hour, minute = divmod(minutes % (24 * 60), 60)
+    return f"{hour % 12 or 12}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+def is_located(activity: Dict[str, Any]) -> bool:
+    return bool(activity.get("place_id")) and activity.get("lat") is not None and activity.get("lng") is not None
+
+def place_name_key(name: str) -> str:
+    """Lower-cased attraction name without punctuation or a leading "Visit", for matching activities to places"""
+    key = re.sub(r"[^a-z0-9]+", " ", (name or "").lower()).strip()
+    return key[len("visit "):] if key.startswith("visit ") else key
+
+def attach_places(activities: List[Dict[str, Any]], attractions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Copy place_id and coordinates from the Places attractions onto the activities that refer to them"""
+    by_id = {attraction["place_id"]: attraction for attraction in attractions if is_located(attraction)}
+    if not by_id:
+        return activities
+    by_name = {place_name_key(attraction["activity"]): attraction for attraction in by_id.values()}
+    attached = []
+    for activity in activities:
+        place = by_id.get(activity.get("place_id")) or by_name.get(place_name_key(activity.get("activity")))
+        if place is not None:
+            activity = {**activity, "place_id": place["place_id"], "lat": place["lat"], "lng": place["lng"]}
+        attached.append(activity)
+    return attached
+
+async def route_activities(activities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Reorder the geolocated activities into a short route and re-time the day back to back.
+
+    Activities without coordinates follow the route in their original order.
+    """
+    located = [activity for activity in activities if is_located(activity)]
+    if len(located) < 2:
+        return activities
+    others = [activity for activity in activities if not is_located(activity)]
+    matrix = await travel_time_matrix(located)
+
+    def cost(origin: int, destination: int) -> int:
+        return matrix.get((located[origin]["place_id"], located[destination]["place_id"]), 0)
+
+    with stage_timer("routing"):
+        order = await asyncio.to_thread(order_stops, len(located), cost)
+        clock = min((minutes for minutes in map(parse_clock, (a.get("time") for a in activities)) if minutes is not None),
+                    default=9 * 60)
+        routed = []
+        for position, source in enumerate([located[index] for index in order] + others):
+            activity = dict(source)
+            if 0 < position < len(located):
+                travel_minutes = math.ceil(cost(order[position - 1], order[position]) / 60)
+                activity["travel_minutes_from_previous"] = travel_minutes
+                clock += travel_minutes
+            if position:
+                clock = math.ceil(clock / 15) * 15
+            activity["time"] = format_clock(clock)
+            clock += int(parse_duration_hours(activity.get("duration")) * 60)
+            routed.append(activity)
+    return routed
+
+async def route_itinerary_days(itinerary_data: Dict[str, Any], attractions: List[Dict[str, Any]] = ()) -> Dict[str, Any]:
+    """Attach the Places attractions to the activities naming them, then route every day with two or more of them;
+    returns a copy when anything changed"""
+    days = list(itinerary_data.get("days", []))
+    changed = False
+    for index, day in enumerate(days):
+        routed = await route_activities(attach_places(day.get("activities", []), attractions))
+        if routed is not day.get("activities"):
+            days[index] = {**day, "activities": routed}
+            changed = True
+    return {**itinerary_data, "days": days} if changed else itinerary_data
+
 # Initialize LLM Chat
-def get_llm_chat():
-    return LlmChat(
+def get_llm_chat(model: str = "gpt-4o-mini", provider: str = "openai"):
+    if UPSTREAM_MODE == "replay":
+        return ReplayLlmChat(llm_recordings, model)
+    from emergentintegrations.llm.chat import LlmChat
+    chat = LlmChat(
         api_key=os.environ.get('EMERGENT_LLM_KEY'),
         session_id=str(uuid.uuid4()),
         system_message="""You are Sakhi, an AI travel assistant specialized in planning trips for Indian travelers, especially solo female travelers.
@@ -414,30 +1794,157 @@ def get_llm_chat():
         - If real data is provided, use it exactly as given
         - Focus on safety, authenticity, and cultural sensitivity
         - Always provide responses in valid JSON format"""
-    ).with_model("openai", "gpt-4o-mini")
+    ).with_model(provider, model)
+    return RecordingLlmChat(chat, llm_recordings, model) if UPSTREAM_MODE == "record" else chat
+
+def llm_configured() -> bool:
+    return UPSTREAM_MODE == "replay" or bool(os.environ.get('EMERGENT_LLM_KEY'))
+
+# LLM Model Routing (complex trips start on the largest model; each tier falls back to smaller, faster ones within a deadline)
+LLM_DEADLINE_SECONDS = float(os.environ.get('LLM_DEADLINE_SECONDS', 45))
+LLM_INTERACTIVE_DEADLINE_SECONDS = float(os.environ.get('LLM_INTERACTIVE_DEADLINE_SECONDS', 15))
+LLM_COMPLEX_DURATION_DAYS = int(os.environ.get('LLM_COMPLEX_DURATION_DAYS', 7))
+LLM_COMPLEX_PREFERENCE_CHARS = int(os.environ.get('LLM_COMPLEX_PREFERENCE_CHARS', 200))
+LLM_MIN_ATTEMPT_SECONDS = float(os.environ.get('LLM_MIN_ATTEMPT_SECONDS', 1))
+# provider, USD per 1M input tokens, USD per 1M output tokens, expected seconds per generated day before any traffic
+LLM_MODEL_TABLE = {
+    "gpt-4o": ("openai", 2.50, 10.00, 2.5),
+    "gpt-4o-mini": ("openai", 0.15, 0.60, 1.5),
+    "gpt-4.1-nano": ("openai", 0.10, 0.40, 0.8),
+}
+LLM_MODEL_CHAIN = [name.strip() for name in os.environ.get('LLM_MODEL_CHAIN', 'gpt-4o,gpt-4o-mini,gpt-4.1-nano').split(',') if name.strip()]
+LLM_SMOOTHING = 0.2
+
+llm_calls_total = Counter("sanskriti_llm_calls_total", "LLM calls by model and outcome", ["model", "outcome"])
+llm_latency = Histogram("sanskriti_llm_call_duration_seconds", "LLM call latency by model", ["model"],
+                        buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 20.0, 30.0, 45.0, 60.0))
+llm_tokens_total = Counter("sanskriti_llm_tokens_total", "Estimated LLM tokens by model and direction", ["model", "direction"])
+llm_cost_usd_total = Counter("sanskriti_llm_cost_usd_total", "Estimated LLM spend in USD by model", ["model"])
+llm_fallback_total = Counter("sanskriti_llm_fallback_total", "Where LLM generation was finally served from", ["source"])
+
+class LlmUnavailableError(Exception):
+    pass
+
+class LlmModel:
+    """One model tier: its own circuit breaker plus a smoothed per-day latency estimate"""
+
+    def __init__(self, name: str):
+        self.provider, self.input_price, self.output_price, seconds_per_day = LLM_MODEL_TABLE.get(name, ("openai", 0.0, 0.0, 2.5))
+        self.name = name
+        self.guard = UpstreamGuard(
+            f"llm:{name}", float(os.environ.get('LLM_SLOW_CALL_SECONDS', 30)),
+            os.environ.get('HEDGE_LLM', 'false').lower() == 'true'
+        )
+        self.seconds_per_day = seconds_per_day
+        self.deviation = seconds_per_day / 4
+        self.lock = threading.Lock()
+
+    def expected_seconds(self, days: int) -> float:
+        """Roughly p95 latency for a response covering this many days"""
+        with self.lock:
+            return (self.seconds_per_day + 2 * self.deviation) * max(1, days)
+
+    def observe(self, latency: float, days: int):
+        per_day = latency / max(1, days)
+        with self.lock:
+            self.deviation += LLM_SMOOTHING * (abs(per_day - self.seconds_per_day) - self.deviation)
+            self.seconds_per_day += LLM_SMOOTHING * (per_day - self.seconds_per_day)
+
+    def record_usage(self, prompt: str, response: str):
+        # About four characters per token is close enough for cost tracking
+        input_tokens, output_tokens = len(prompt) / 4, len(response) / 4
+        llm_tokens_total.inc(self.name, "input", amount=input_tokens)
+        llm_tokens_total.inc(self.name, "output", amount=output_tokens)
+        llm_cost_usd_total.inc(self.name, amount=(input_tokens * self.input_price + output_tokens * self.output_price) / 1_000_000)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.guard.stats(), "expected_seconds_per_day": round(self.seconds_per_day, 2)}
+
+class ModelRouter:
+    def __init__(self, names: List[str]):
+        self.models = [LlmModel(name) for name in names]
 
+    def is_open(self) -> bool:
+        """True only when every model's circuit is open"""
+        return all(model.guard.is_open() for model in self.models)
+
+    def chain(self, days: int, preference_chars: int) -> List[LlmModel]:
+        """Models to try, best first: complex trips start at the largest model, the rest one tier down"""
+        complex_trip = days >= LLM_COMPLEX_DURATION_DAYS or preference_chars >= LLM_COMPLEX_PREFERENCE_CHARS
+        start = 0 if complex_trip else min(1, len(self.models) - 1)
+        return self.models[start:]
+
+    async def complete(self, prompt: str, days: int, preference_chars: int, deadline: float) -> str:
+        """Send the prompt down the fallback chain until a model answers before the deadline"""
+        if UPSTREAM_MODE == "replay":
+            UserMessage = ReplayMessage
+        else:
+            from emergentintegrations.llm.chat import UserMessage
+        chain = self.chain(days, preference_chars)
+        for position, model in enumerate(chain):
+            remaining = deadline - time.monotonic()
+            if remaining < LLM_MIN_ATTEMPT_SECONDS:
+                break
+            if model.guard.is_open():
+                llm_calls_total.inc(model.name, "circuit_open")
+                continue
+            # The last model always gets a try with whatever time is left
+            if position < len(chain) - 1 and model.expected_seconds(days) > remaining:
+                llm_calls_total.inc(model.name, "skipped_deadline")
+                continue
+            started = time.perf_counter()
+            try:
+                with span("llm.send_message", model=model.name, prompt_chars=len(prompt), days=days):
+                    response = await model.guard.call_async(
+                        lambda: asyncio.wait_for(
+                            get_llm_chat(model.name, model.provider).send_message(UserMessage(text=prompt)),
+                            min(LLM_TIMEOUT_SECONDS, remaining)
+                        )
+                    )
+            except asyncio.TimeoutError:
+                llm_calls_total.inc(model.name, "timeout")
+                logging.warning(f"LLM {model.name} timed out after {remaining:.1f}s")
+                continue
+            except Exception as e:
+                llm_calls_total.inc(model.name, "error")
+                logging.warning(f"LLM {model.name} failed: {e}")
+                continue
+            latency = time.perf_counter() - started
+            llm_calls_total.inc(model.name, "ok")
+            llm_latency.observe(latency, model.name)
+            model.observe(latency, days)
+            model.record_usage(prompt, response)
+            llm_fallback_total.inc("model" if position == 0 else "smaller_model")
+            return response
+        raise LlmUnavailableError("no LLM model answered before the deadline")
+
+    def stats(self) -> Dict[str, Any]:
+        return {model.name: model.stats() for model in self.models}
+
+llm_router = ModelRouter(LLM_MODEL_CHAIN)
+
+@traced("get_real_travel_data")
 async def get_real_travel_data(destination: str, budget: int, duration: int, theme: str, is_solo_female: bool) -> Dict[str, Any]:
     """Fetch all real travel data asynchronously"""
-    loop = asyncio.get_event_loop()
-    
     # Calculate budget per night for accommodation
     budget_per_night = int(budget * 0.4 / duration)  # 40% of budget for accommodation
     
     # Fetch real data concurrently
-    accommodations_task = loop.run_in_executor(
-        executor, get_real_accommodations, destination, budget_per_night, is_solo_female
+    accommodations_task = run_in_executor(
+        get_real_accommodations, destination, budget_per_night, is_solo_female
     )
-    restaurants_task = loop.run_in_executor(
-        executor, get_real_restaurants, destination, "restaurant", None
+    restaurants_task = run_in_executor(
+        get_real_restaurants, destination, "restaurant", None
     )
-    attractions_task = loop.run_in_executor(
-        executor, get_real_attractions, destination, theme
+    attractions_task = run_in_executor(
+        get_real_attractions, destination, theme
     )
     
     # Wait for all data to be fetched
     accommodations, restaurants, attractions = await asyncio.gather(
         accommodations_task, restaurants_task, attractions_task
     )
+    attractions = await route_activities(attractions)
     
     return {
         "accommodations": accommodations,
@@ -445,10 +1952,23 @@ async def get_real_travel_data(destination: str, budget: int, duration: int, the
         "attractions": attractions
     }
 
+def verified_attractions_prompt(attractions: List[Dict[str, Any]]) -> str:
+    """Prompt section listing the Places attractions to build days from, so their place ids come back for routing"""
+    located = [attraction for attraction in attractions if is_located(attraction)]
+    if not located:
+        return ""
+    lines = "\n".join(
+        f'- {attraction["activity"]} (place_id {attraction["place_id"]}, {attraction.get("location", "")}, '
+        f'{attraction.get("duration", "")})' for attraction in located
+    )
+    return f"""
+VERIFIED ATTRACTIONS (use these as activities, keeping the activity name and adding its "place_id"):
+{lines}
+"""
+
 def generate_enhanced_trip_prompt(request: TripRequest, real_data: Dict[str, Any]) -> str:
     """Generate optimized AI prompt for faster response"""
     
-    # Use fallback data directly for speed
     base_prompt = f"""Create a {request.duration}-day itinerary for {request.destination}, budget ₹{request.budget:,}, {request.theme} theme.
 
 SOLO FEMALE REQUIREMENTS:
@@ -456,7 +1976,7 @@ SOLO FEMALE REQUIREMENTS:
 - Well-lit areas and reliable transport
 {"- Period-friendly facilities (clean restrooms, pharmacies)" if request.period_friendly else ""}
 - Safety tips for each day
-
+{verified_attractions_prompt(real_data.get("attractions", []))}
 Return ONLY this JSON (no extra text):
 {{
     "days": [
@@ -618,140 +2138,1499 @@ def calculate_community_impact(itinerary_data: dict, budget: int) -> dict:
         "impact_percentage": 40
     }
 
+def parse_llm_json(response: str) -> Dict[str, Any]:
+    """Extract the JSON object from an LLM response, tolerating code fences and extra text"""
+    start = response.find('{')
+    end = response.rfind('}')
+    if start == -1 or end == -1:
+        raise ValueError("No JSON object in LLM response")
+    return json.loads(response[start:end + 1])
+
+async def generate_llm_itinerary_data(request: TripRequest, real_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Generate itinerary data with the LLM, reusing the LLM cache for identical prompts"""
+    with stage_timer("prompt_build"):
+        prompt = generate_enhanced_trip_prompt(request, real_data)
+        key = hashlib.sha256(prompt.encode()).hexdigest()
+    cached = llm_cache.get(key)
+    if cached is not None:
+        return cached
+
+    trip_key = (request.destination, request.duration, request.theme, bool(request.period_friendly))
+    try:
+        with stage_timer("llm_call"):
+            response = await llm_router.complete(
+                prompt, request.duration, len(request.special_preferences or ""),
+                time.monotonic() + LLM_DEADLINE_SECONDS
+            )
+        with stage_timer("llm_parse"):
+            itinerary_data = parse_llm_json(response)
+    except Exception:
+        similar = llm_trip_cache.get(trip_key)
+        if similar is None:
+            llm_fallback_total.inc("template")
+            raise
+        llm_fallback_total.inc("cached")
+        return similar
+    llm_cache.set(key, itinerary_data)
+    llm_trip_cache.set(trip_key, itinerary_data)
+    return itinerary_data
+
+def build_template_itinerary(request: TripRequest) -> Dict[str, Any]:
+    """Build the fast template itinerary data, reusing the template cache"""
+    key = (request.destination, request.budget, request.duration, request.theme, bool(request.period_friendly))
+    cached = template_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    itinerary_data = {
+        "days": [
+            {
+                "day": i + 1,
+                "activities": [
+                    {
+                        "time": "9:00 AM",
+                        "activity": f"Explore {request.destination} Heritage Sites",
+                        "description": f"Discover the rich cultural heritage of {request.destination}",
+                        "location": request.destination,
+                        "cost": 300 + (i * 100),
+                        "safety_level": "high", 
+                        "duration": "3-4 hours"
+                    },
+                    {
+                        "time": "2:00 PM",
+                        "activity": f"Local {request.theme.title()} Experience",
+                        "description": f"Immerse yourself in authentic {request.theme} activities",
+                        "location": request.destination,
+                        "cost": 500 + (i * 150),
+                        "safety_level": "high", 
+                        "duration": "2-3 hours"
+                    }
+                ],
+                "accommodation": {
+                    "name": f"Heritage Hotel {request.destination.split(',')[0]}",
+                    "type": "heritage hotel",
+                    "location": f"City Center, {request.destination}",
+                    "cost": int(request.budget * 0.35 / request.duration),
+                    "safety_rating": 5,
+                    "women_friendly": True,
+                    "amenities": ["WiFi", "24/7 Security", "Women-Safe Environment", "Room Service"]
+                },
+                "meals": [
+                    {
+                        "meal": "breakfast",
+                        "restaurant": f"Royal Breakfast {request.destination.split(',')[0]}",
+                        "cuisine": "Continental & Local",
+                        "cost": 400,
+                        "location": "Hotel"
+                    },
+                    {
+                        "meal": "lunch", 
+                        "restaurant": f"Traditional Kitchen {request.destination.split(',')[0]}",
+                        "cuisine": "Regional Specialties",
+                        "cost": 600,
+                        "location": "City Center"
+                    },
+                    {
+                        "meal": "dinner",
+                        "restaurant": "Women's Cooperative Restaurant", 
+                        "cuisine": "Home-style Local",
+                        "cost": 700,
+                        "location": "Near Hotel"
+                    }
+                ],
+                "estimated_cost": int(request.budget * 0.8 / request.duration),
+                "safety_tips": [
+                    "Use hotel's recommended transportation services",
+                    "Stay in well-lit, populated areas especially after sunset",
+                    "Keep emergency contacts easily accessible",
+                    "Share your daily itinerary with hotel reception" if not request.period_friendly 
+                    else "Locate clean restrooms and nearby pharmacies for comfort"
+                ]
+            } for i in range(request.duration)
+        ],
+        "total_cost": int(request.budget * 0.85),
+        "safety_score": 90,
+        "community_experiences": [
+            {
+                "activity": f"Traditional {request.theme} workshop with local artisans",
+                "host": f"Community collective in {request.destination}",
+                "cost": 800,
+                "impact": "Directly supports local families and preserves cultural traditions"
+            }
+        ]
+    }
+    
+    template_cache.set(key, itinerary_data)
+    return itinerary_data
+
+# Single-day Regeneration
+def generate_day_prompt(request: TripRequest, itinerary: Dict[str, Any], day_number: int,
+                        attractions: List[Dict[str, Any]] = ()) -> str:
+    """Prompt for one replacement day; the rest of the trip is summarised instead of resent"""
+    old_day = itinerary["days"][day_number - 1]
+    planned_elsewhere = sorted({
+        activity.get("activity") for day in itinerary["days"] if day.get("day") != day_number
+        for activity in day.get("activities", []) if activity.get("activity")
+    })
+    return f"""Replace day {day_number} of a {request.duration}-day {request.theme} trip to {request.destination}. Day budget ₹{old_day.get("estimated_cost", int(request.budget / request.duration)):,}.
+
+SOLO FEMALE REQUIREMENTS:
+- Women-safe accommodations only
+- Well-lit areas and reliable transport
+{"- Period-friendly facilities (clean restrooms, pharmacies)" if request.period_friendly else ""}
+- Safety tips for the day
+{f"- Traveler preferences: {request.special_preferences}" if request.special_preferences else ""}
+
+Other days already include (do not repeat): {", ".join(planned_elsewhere) or "nothing yet"}
+Day {day_number} currently has: {", ".join(activity.get("activity", "") for activity in old_day.get("activities", []))}
+{verified_attractions_prompt(attractions)}
+Return ONLY this JSON (no extra text):
+{{
+    "day": {day_number},
+    "activities": [
+        {{
+            "time": "9:00 AM",
+            "activity": "Visit main attraction",
+            "description": "Explore popular site",
+            "location": "{request.destination}",
+            "cost": 500,
+            "safety_level": "high",
+            "duration": "3 hours"
+        }}
+    ],
+    "accommodation": {json.dumps(old_day.get("accommodation", {}))},
+    "meals": [
+        {{
+            "meal": "lunch",
+            "restaurant": "Local Restaurant",
+            "cuisine": "Regional",
+            "cost": 400,
+            "location": "City Center"
+        }}
+    ],
+    "estimated_cost": {old_day.get("estimated_cost", 0)},
+    "safety_tips": ["Use hotel transport", "Stay in groups", "Keep emergency contacts"],
+    "community_experiences": []
+}}"""
+
+async def generate_llm_day_data(request: TripRequest, itinerary: Dict[str, Any], day_number: int,
+                                attractions: List[Dict[str, Any]] = ()):
+    """One new day from the LLM, plus any community experiences it suggests for that day"""
+    with stage_timer("prompt_build"):
+        prompt = generate_day_prompt(request, itinerary, day_number, attractions)
+    with stage_timer("llm_call"):
+        response = await llm_router.complete(
+            prompt, 1, len(request.special_preferences or ""),
+            time.monotonic() + LLM_INTERACTIVE_DEADLINE_SECONDS
+        )
+    with stage_timer("llm_parse"):
+        day_data = parse_llm_json(response)
+    return day_data, day_data.pop("community_experiences", None) or []
+
+def update_community_impact(community_impact: Dict[str, Any], day_number: int, experiences: List[dict]) -> Dict[str, Any]:
+    """Swap one day's community experiences into an existing impact summary"""
+    merged = [experience for experience in community_impact.get("community_experiences", [])
+              if experience.get("day") != day_number]
+    merged += [{**experience, "day": day_number} for experience in experiences]
+    return {
+        **community_impact,
+        "families_benefited": max(1, len(merged)),
+        "local_jobs_supported": len(merged),
+        "community_experiences": merged
+    }
+
+# Cache Warm-up (runs at startup and periodically so the first users of a destination hit warm caches)
+WARMUP_ENABLED = os.environ.get('WARMUP_ENABLED', 'true').lower() == 'true'
+WARMUP_CONFIG_FILE = Path(os.environ.get('WARMUP_CONFIG_FILE', ROOT_DIR / 'warmup.json'))
+WARMUP_TOP_N = int(os.environ.get('WARMUP_TOP_N', 20))
+WARMUP_RECENT_LIMIT = int(os.environ.get('WARMUP_RECENT_LIMIT', 1000))
+WARMUP_CONCURRENCY = int(os.environ.get('WARMUP_CONCURRENCY', 2))
+WARMUP_INTERVAL_SECONDS = int(os.environ.get('WARMUP_INTERVAL_SECONDS', 1800))
+WARMUP_LLM = os.environ.get('WARMUP_LLM', 'false').lower() == 'true'
+
+warmup_state = {
+    "ready": not WARMUP_ENABLED,
+    "runs": 0,
+    "targets": 0,
+    "warmed": 0,
+    "failed": 0,
+    "last_run_at": None,
+    "last_duration_ms": None
+}
+
+def load_configured_warmup_targets() -> List[Dict[str, Any]]:
+    """Read destination/theme pairs from the warm-up config file"""
+    if not WARMUP_CONFIG_FILE.exists():
+        return []
+    try:
+        return json.loads(WARMUP_CONFIG_FILE.read_text())
+    except Exception as e:
+        logging.warning(f"Could not read warm-up config {WARMUP_CONFIG_FILE}: {e}")
+        return []
+
+async def load_recent_warmup_targets() -> List[Dict[str, Any]]:
+    """Find the most requested trips among recent itineraries"""
+    pipeline = [
+        {"$sort": {"created_at": -1}},
+        {"$limit": WARMUP_RECENT_LIMIT},
+        {"$group": {
+            "_id": {
+                "destination": "$destination",
+                "theme": "$theme",
+                "budget": "$budget",
+                "duration": "$duration",
+                "period_friendly": "$period_friendly"
+            },
+            "count": {"$sum": 1}
+        }},
+        {"$sort": {"count": -1}},
+        {"$limit": WARMUP_TOP_N}
+    ]
+    try:
+        return [group["_id"] async for group in worker.read_db.itineraries.aggregate(pipeline)]
+    except Exception as e:
+        logging.warning(f"Could not load recent itineraries for warm-up: {e}")
+        return []
+
+async def warm_target(target: Dict[str, Any], semaphore: asyncio.Semaphore) -> bool:
+    """Pre-populate the template, Places and (optionally) LLM caches for one trip"""
+    upstream_priority.set("refresh")
+    async with semaphore:
+        try:
+            request = TripRequest(
+                destination=target["destination"],
+                theme=target.get("theme", "heritage"),
+                budget=target.get("budget", 25000),
+                duration=target.get("duration", 3),
+                period_friendly=target.get("period_friendly", False)
+            )
+            build_template_itinerary(request)
+            real_data = await get_real_travel_data(
+                request.destination, request.budget, request.duration, request.theme,
+                request.travel_mode == "solo_female"
+            )
+            if WARMUP_LLM and llm_configured():
+                await generate_llm_itinerary_data(request, real_data)
+            return True
+        except Exception as e:
+            logging.warning(f"Warm-up failed for {target}: {e}")
+            return False
+
+async def run_warmup():
+    """Run one warm-up pass over the configured and most popular trips"""
+    started = time.perf_counter()
+
+    # Establish the Mongo connection pool before traffic arrives
+    try:
+        await worker.db.command('ping')
+    except Exception as e:
+        logging.warning(f"Warm-up Mongo ping failed: {e}")
+
+    targets = {}
+    for target in load_configured_warmup_targets() + await load_recent_warmup_targets():
+        key = (target.get("destination"), target.get("theme"), target.get("budget"),
+               target.get("duration"), target.get("period_friendly"))
+        if target.get("destination") and key not in targets:
+            targets[key] = target
+    targets = list(targets.values())[:WARMUP_TOP_N]
+
+    semaphore = asyncio.Semaphore(WARMUP_CONCURRENCY)
+    results = await asyncio.gather(*(warm_target(target, semaphore) for target in targets))
+
+    warmup_state.update({
+        "ready": True,
+        "runs": warmup_state["runs"] + 1,
+        "targets": len(targets),
+        "warmed": sum(results),
+        "failed": len(results) - sum(results),
+        "last_run_at": datetime.now(timezone.utc).isoformat(),
+        "last_duration_ms": int((time.perf_counter() - started) * 1000)
+    })
+    logging.info(f"Cache warm-up warmed {sum(results)}/{len(targets)} trips in {warmup_state['last_duration_ms']}ms")
+
+async def warmup_loop():
+    """Warm the caches at startup and then every WARMUP_INTERVAL_SECONDS"""
+    while True:
+        try:
+            await run_warmup()
+        except Exception as e:
+            logging.error(f"Cache warm-up pass failed: {e}")
+            warmup_state["ready"] = True
+        await asyncio.sleep(WARMUP_INTERVAL_SECONDS)
+
+# Admission Control (AIMD concurrency limit in front of the expensive routes)
+ADMISSION_INITIAL_LIMIT = int(os.environ.get('ADMISSION_INITIAL_LIMIT', 32))
+ADMISSION_MIN_LIMIT = int(os.environ.get('ADMISSION_MIN_LIMIT', 2))
+ADMISSION_MAX_LIMIT = int(os.environ.get('ADMISSION_MAX_LIMIT', 256))
+ADMISSION_TARGET_LATENCY_MS = float(os.environ.get('ADMISSION_TARGET_LATENCY_MS', 500))
+ADMISSION_OVERLOAD_MODE = os.environ.get('ADMISSION_OVERLOAD_MODE', 'degrade')  # "degrade" or "reject"
+
+class AdaptiveConcurrencyLimiter:
+    """Additive-increase / multiplicative-decrease limit on concurrent requests, driven by observed latency"""
+
+    def __init__(self, name: str, initial: int, min_limit: int, max_limit: int, target_latency: float, backoff: float = 0.9):
+        self.name = name
+        self.limit = float(initial)
+        self.min_limit, self.max_limit = min_limit, max_limit
+        self.target_latency, self.backoff = target_latency, backoff
+        self.in_flight = 0
+        self.latency_ewma = 0.0
+        self.last_decrease = 0.0
+        self.admitted = 0
+        self.shed = 0
+
+    def try_acquire(self) -> bool:
+        if self.in_flight >= int(self.limit):
+            self.shed += 1
+            return False
+        self.in_flight += 1
+        self.admitted += 1
+        return True
+
+    def release(self, latency: float, ok: bool):
+        self.in_flight -= 1
+        self.latency_ewma = latency if not self.latency_ewma else 0.8 * self.latency_ewma + 0.2 * latency
+        now = time.monotonic()
+        if not ok or latency > self.target_latency:
+            # Back off at most once per target latency so one slow burst does not collapse the limit
+            if now - self.last_decrease > self.target_latency:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self.last_decrease = now
+        elif self.in_flight + 1 >= int(self.limit) * 0.5:
+            # Only grow while the limit is actually being used
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def retry_after(self) -> int:
+        """Seconds a shed client should wait: roughly one drain of the current window"""
+        return max(1, math.ceil(self.latency_ewma * self.in_flight / max(1, int(self.limit))))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 2),
+            "admitted": self.admitted,
+            "shed": self.shed
+        }
+
+def build_generate_limiter() -> AdaptiveConcurrencyLimiter:
+    return AdaptiveConcurrencyLimiter(
+        "generate", ADMISSION_INITIAL_LIMIT, ADMISSION_MIN_LIMIT, ADMISSION_MAX_LIMIT, ADMISSION_TARGET_LATENCY_MS / 1000
+    )
+
+generate_limiter = build_generate_limiter()
+admission_total = Counter("sanskriti_admission_total", "Admission decisions on expensive routes", ["route", "decision"])
+PENDING_WRITES_MAX = int(os.environ.get('PENDING_WRITES_MAX', 200))
+pending_writes = set()
+background_writes_dropped_total = Counter("sanskriti_background_writes_dropped_total",
+                                          "Fire-and-forget database writes dropped because too many were pending")
+
+def persist_in_background(coro) -> bool:
+    """Fire-and-forget a database write, keeping a reference so the task is not garbage collected.
+
+    At most PENDING_WRITES_MAX writes are pending; beyond that the write is dropped and False returned, so
+    overload cannot turn into an unbounded backlog. Callers must cope with a dropped write.
+    """
+    if len(pending_writes) >= PENDING_WRITES_MAX:
+        coro.close()
+        background_writes_dropped_total.inc()
+        return False
+    task = asyncio.create_task(coro)
+    pending_writes.add(task)
+    task.add_done_callback(pending_writes.discard)
+    return True
+
+# Mongo Read Routing (pool wait metrics and secondary reads with read-your-writes for new itineraries)
+# Ids this worker wrote recently are read from the primary until any secondary must have caught up
+recent_writes = TTLCache(
+    maxsize=int(os.environ.get('READ_YOUR_WRITES_SIZE', 10000)),
+    ttl=MONGO_MAX_STALENESS_SECONDS + 30
+)
+mongo_reads_total = Counter("sanskriti_mongo_reads_total", "Itinerary reads by routing decision", ["route"])
+mongo_pool_wait = Histogram("sanskriti_mongo_pool_wait_seconds", "Time spent waiting to check out a Mongo connection")
+mongo_pool_checkout_failures_total = Counter("sanskriti_mongo_pool_checkout_failures_total",
+                                             "Mongo connection checkouts that failed", ["reason"])
+mongo_pool_state = {"checked_out": 0}
+mongo_pool_lock = threading.Lock()  # pool events arrive on the driver's threads
+
+def mongo_read_preference():
+    from pymongo import read_preferences
+    modes = {
+        "primaryPreferred": read_preferences.PrimaryPreferred,
+        "secondary": read_preferences.Secondary,
+        "secondaryPreferred": read_preferences.SecondaryPreferred,
+        "nearest": read_preferences.Nearest
+    }
+    return modes[MONGO_READ_PREFERENCE](max_staleness=MONGO_MAX_STALENESS_SECONDS)
+
+def mongo_pool_listener():
+    """pymongo pool listener feeding the pool metrics (pymongo is imported lazily, like the client)"""
+    from pymongo import monitoring
+    checkout_started = threading.local()
+
+    class PoolListener(monitoring.ConnectionPoolListener):
+        # pymongo checks out connections on Motor's threads; start and finish events share a thread
+        def connection_check_out_started(self, event):
+            checkout_started.at = time.perf_counter()
+
+        def connection_checked_out(self, event):
+            mongo_pool_wait.observe(time.perf_counter() - getattr(checkout_started, "at", time.perf_counter()))
+            with mongo_pool_lock:
+                mongo_pool_state["checked_out"] += 1
+
+        def connection_check_out_failed(self, event):
+            mongo_pool_wait.observe(time.perf_counter() - getattr(checkout_started, "at", time.perf_counter()))
+            mongo_pool_checkout_failures_total.inc(str(event.reason))
+
+        def connection_checked_in(self, event):
+            with mongo_pool_lock:
+                mongo_pool_state["checked_out"] -= 1
+
+        def pool_created(self, event): pass
+        def pool_ready(self, event): pass
+        def pool_cleared(self, event): pass
+        def pool_closed(self, event): pass
+        def connection_created(self, event): pass
+        def connection_ready(self, event): pass
+        def connection_closed(self, event): pass
+
+    return PoolListener()
+
+async def find_itinerary(itinerary_id: str) -> Optional[Dict[str, Any]]:
+    """Read an itinerary, from a secondary when configured, falling back to the primary for fresh ids"""
+    query, projection = {"id": itinerary_id}, {"_id": 0}
+    if worker.read_db is worker.db or itinerary_id in recent_writes:
+        mongo_reads_total.inc("primary")
+        return await assemble_itinerary(await worker.db.itineraries.find_one(query, projection))
+    mongo_reads_total.inc("secondary")
+    itinerary = await worker.read_db.itineraries.find_one(query, projection)
+    if itinerary is None:
+        # Possibly written by another worker and not replicated yet; the primary has the final word
+        mongo_reads_total.inc("primary_fallback")
+        itinerary = await worker.db.itineraries.find_one(query, projection)
+    return await assemble_itinerary(itinerary)
+
+# Itinerary Bodies (each day is stored once per distinct content hash; itinerary records keep the list of day hashes)
+ITINERARY_DEDUP_ENABLED = os.environ.get('ITINERARY_DEDUP_ENABLED', 'true').lower() == 'true'
+BODY_FIELDS = ("days", "community_impact")
+
+itinerary_body_cache = TieredCache(
+    "itinerary_body",
+    maxsize=int(os.environ.get('ITINERARY_BODY_CACHE_SIZE', 1024)),
+    ttl=int(os.environ.get('ITINERARY_BODY_CACHE_TTL_SECONDS', 24 * 3600))
+)
+itinerary_bodies_total = Counter("sanskriti_itinerary_bodies_total", "Itinerary day body writes by result", ["result"])
+itinerary_body_bytes_deduplicated_total = Counter("sanskriti_itinerary_body_bytes_deduplicated_total",
+                                                  "Day body bytes not written because the day was already stored")
+
+def body_hash(day: Dict[str, Any]) -> Tuple[str, int]:
+    """SHA-256 of a day's canonical JSON, plus its size"""
+    canonical = json.dumps(day, sort_keys=True, separators=(",", ":"), default=str).encode()
+    return hashlib.sha256(canonical).hexdigest(), len(canonical)
+
+async def store_itinerary_days(days: List[dict]) -> List[str]:
+    """Store the days not already known to be stored, in one bulk upsert, and return every day's hash"""
+    from pymongo import UpdateOne
+    hashes, new = [], {}
+    for day in days:
+        digest, size = body_hash(day)
+        hashes.append(digest)
+        if digest in new:
+            continue
+        if itinerary_body_cache.get(digest) is not None:
+            # Cached days were read from or written to Mongo, so there is nothing to write
+            itinerary_bodies_total.inc("known")
+            itinerary_body_bytes_deduplicated_total.inc(amount=size)
+        else:
+            new[digest] = (day, size)
+    if not new:
+        return hashes
+    created_at = datetime.now(timezone.utc).isoformat()
+    with stage_timer("mongo_body_upsert"), span("mongo.itinerary_bodies.bulk_write", days=len(new)):
+        result = await worker.db.itinerary_bodies.bulk_write([
+            UpdateOne({"hash": digest}, {"$setOnInsert": {"day": day, "created_at": created_at}}, upsert=True)
+            for digest, (day, _) in new.items()
+        ], ordered=False)
+    for index, (digest, (day, size)) in enumerate(new.items()):
+        if index in result.upserted_ids:
+            itinerary_bodies_total.inc("stored")
+        else:
+            itinerary_bodies_total.inc("duplicate")
+            itinerary_body_bytes_deduplicated_total.inc(amount=size)
+        itinerary_body_cache.set(digest, day)
+    return hashes
+
+def stores_days_separately(record: Dict[str, Any]) -> bool:
+    """Whether one day of this stored record can be replaced on its own under the current storage mode"""
+    return ("day_hashes" if ITINERARY_DEDUP_ENABLED else "days") in record
+
+async def itinerary_body_update(days: List[dict], community_impact: Dict[str, Any],
+                                changed_day: Optional[int] = None) -> Dict[str, Any]:
+    """Mongo update writing an itinerary's days and community impact.
+
+    With changed_day (an index into days) only that day is written: its hash when deduplicating, the day
+    itself otherwise. Callers pass it only for records where stores_days_separately() holds.
+    """
+    if changed_day is not None:
+        if ITINERARY_DEDUP_ENABLED:
+            [digest] = await store_itinerary_days([days[changed_day]])
+            return {"$set": {f"day_hashes.{changed_day}": digest, "community_impact": community_impact}}
+        return {"$set": {f"days.{changed_day}": days[changed_day], "community_impact": community_impact}}
+    if ITINERARY_DEDUP_ENABLED:
+        return {
+            "$set": {"day_hashes": await store_itinerary_days(days), "community_impact": community_impact},
+            "$unset": {"days": "", "body_hash": ""}
+        }
+    return {"$set": {"days": days, "community_impact": community_impact}, "$unset": {"day_hashes": "", "body_hash": ""}}
+
+async def find_itinerary_bodies(query: Dict[str, Any], projection: Dict[str, Any]) -> List[Dict[str, Any]]:
+    with span("mongo.itinerary_bodies.find"):
+        # Bodies never change once written, so any replica that has one is up to date
+        bodies = await worker.read_db.itinerary_bodies.find(query, projection).to_list(None)
+        if not bodies and worker.read_db is not worker.db:
+            bodies = await worker.db.itinerary_bodies.find(query, projection).to_list(None)
+    return bodies
+
+async def assemble_itinerary(record: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Fill in the days an itinerary record points to"""
+    if record is None:
+        return None
+    if "body_hash" in record:
+        # Stored while whole bodies (days and community impact) were deduplicated together
+        digest = record.pop("body_hash")
+        bodies = await find_itinerary_bodies({"hash": digest}, {"_id": 0, "days": 1, "community_impact": 1})
+        if not bodies:
+            logging.error(f"Itinerary {record.get('id')} points to missing body {digest}")
+            return None
+        return {**record, "days": list(bodies[0]["days"]), "community_impact": bodies[0]["community_impact"]}
+    if "day_hashes" not in record:
+        return record  # stored before deduplication, or with it off
+    hashes = record.pop("day_hashes")
+    days = {digest: itinerary_body_cache.get(digest) for digest in hashes}
+    missing = [digest for digest, day in days.items() if day is None]
+    if missing:
+        for body in await find_itinerary_bodies({"hash": {"$in": missing}}, {"_id": 0, "hash": 1, "day": 1}):
+            days[body["hash"]] = body["day"]
+            itinerary_body_cache.set(body["hash"], body["day"])
+        lost = [digest for digest in missing if days[digest] is None]
+        if lost:
+            logging.error(f"Itinerary {record.get('id')} points to missing days {', '.join(lost)}")
+            return None
+    return {**record, "days": [days[digest] for digest in hashes]}
+
+async def ensure_itinerary_body_index():
+    try:
+        await worker.db.itinerary_bodies.create_index("hash", unique=True)
+    except Exception as e:
+        logging.warning(f"Could not create itinerary body index: {e}")
+
+# Rate Limiting (sliding-window counters per client and route, optionally shared across workers via MongoDB).
+# Off by default: behind a proxy every client shares the proxy's address unless RATE_LIMIT_TRUST_FORWARDED is set
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'false').lower() == 'true'
+RATE_LIMIT_STORE = os.environ.get('RATE_LIMIT_STORE', 'memory')  # "memory" or "mongo"
+RATE_LIMIT_SYNC_SECONDS = float(os.environ.get('RATE_LIMIT_SYNC_SECONDS', 0.5))
+RATE_LIMIT_TRUST_FORWARDED = os.environ.get('RATE_LIMIT_TRUST_FORWARDED', 'false').lower() == 'true'
+RATE_LIMIT_EXEMPT_PREFIXES = ("/api/health", "/metrics")
+
+# path -> (route name, requests allowed, window seconds); anything else uses "default"
+RATE_LIMITS = {
+    "/api/itinerary/generate": ("generate", int(os.environ.get('RATE_LIMIT_GENERATE_PER_MINUTE', 20)), 60),
+    "default": ("default", int(os.environ.get('RATE_LIMIT_DEFAULT_PER_MINUTE', 300)), 60)
+}
+# Routes with path parameters, matched by path suffix
+RATE_LIMIT_SUFFIXES = {
+    "/regenerate": ("regenerate_day", int(os.environ.get('RATE_LIMIT_REGENERATE_PER_MINUTE', 30)), 60)
+}
+
+class SlidingWindowRateLimiter:
+    """Sliding-window counter: previous window weighted by its remaining overlap plus the current window.
+
+    Counts live in-process; with a shared store, local increments are flushed every RATE_LIMIT_SYNC_SECONDS
+    and the cluster-wide totals read back, so a decision never waits on the database.
+    """
+
+    def __init__(self):
+        self.local: Dict[tuple, int] = {}     # (key, window_start) -> hits not yet flushed
+        self.flushing: Dict[tuple, int] = {}  # hits being written to the shared store
+        self.remote: Dict[tuple, int] = {}    # cluster-wide totals from the last sync
+
+    def _count(self, key: str, window_start: int) -> int:
+        bucket = (key, window_start)
+        return self.remote.get(bucket, 0) + self.flushing.get(bucket, 0) + self.local.get(bucket, 0)
+
+    def hit(self, key: str, limit: int, window: int, now: float) -> float:
+        """Record a hit and return 0, or return the seconds to wait if the limit is exceeded"""
+        window_start = int(now // window) * window
+        overlap = 1 - (now - window_start) / window
+        estimated = self._count(key, window_start - window) * overlap + self._count(key, window_start)
+        if estimated >= limit:
+            return max(1.0, window_start + window - now)
+        bucket = (key, window_start)
+        self.local[bucket] = self.local.get(bucket, 0) + 1
+        return 0.0
+
+    def prune(self, now: float):
+        """Drop windows that can no longer affect a decision"""
+        oldest = now - 2 * max(window for _, _, window in RATE_LIMITS.values())
+        for counts in (self.local, self.remote):
+            for bucket in [bucket for bucket in counts if bucket[1] < oldest]:
+                del counts[bucket]
+
+    async def sync_shared_store(self, collection):
+        """Flush local hits with $inc and read back the cluster-wide totals for active windows"""
+        from pymongo import UpdateOne
+        self.flushing, self.local = self.local, {}
+        if self.flushing:
+            expires_at = datetime.now(timezone.utc) + timedelta(seconds=3 * max(w for _, _, w in RATE_LIMITS.values()))
+            await collection.bulk_write([
+                UpdateOne({"_id": f"{key}|{window_start}"},
+                          {"$inc": {"count": hits}, "$setOnInsert": {"expires_at": expires_at}}, upsert=True)
+                for (key, window_start), hits in self.flushing.items()
+            ], ordered=False)
+        active = set(self.remote) | set(self.flushing) | set(self.local)
+        ids = [f"{key}|{window_start}" for key, window_start in active]
+        remote = {}
+        if ids:
+            async for doc in collection.find({"_id": {"$in": ids}}):
+                key, window_start = doc["_id"].rsplit("|", 1)
+                remote[(key, int(window_start))] = doc["count"]
+        self.remote, self.flushing = remote, {}
+
+rate_limiter = SlidingWindowRateLimiter()
+rate_limited_total = Counter("sanskriti_rate_limited_total", "Requests rejected by the rate limiter", ["route"])
+
+def client_key(scope) -> str:
+    """The client IP; the API issues no credentials, so client-chosen headers such as X-API-Key are ignored"""
+    forwarded = None
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = next((value.decode("latin-1").split(",")[0].strip()
+                          for header, value in scope["headers"] if header == b"x-forwarded-for"), None)
+    return "ip:" + (forwarded or (scope["client"][0] if scope.get("client") else "unknown"))
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware answering 429 with Retry-After once a client exceeds its route limit"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or not RATE_LIMIT_ENABLED or path.startswith(RATE_LIMIT_EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+        rule = RATE_LIMITS.get(path)
+        if rule is None:
+            rule = next((rule for suffix, rule in RATE_LIMIT_SUFFIXES.items() if path.endswith(suffix)), RATE_LIMITS["default"])
+        route, limit, window = rule
+        retry_after = rate_limiter.hit(f"{client_key(scope)}:{route}", limit, window, time.time())
+        if not retry_after:
+            await self.app(scope, receive, send)
+            return
+        rate_limited_total.inc(route)
+        response = JSONResponse(
+            status_code=429,
+            content={"detail": "Too many requests, please slow down"},
+            headers={"Retry-After": str(math.ceil(retry_after)), "X-RateLimit-Limit": f"{limit};w={window}"}
+        )
+        await response(scope, receive, send)
+
+async def rate_limit_sync_loop():
+    """Prune old windows and, in shared mode, sync counters with the other workers"""
+    if RATE_LIMIT_STORE == "mongo":
+        try:
+            await worker.db.rate_limits.create_index("expires_at", expireAfterSeconds=0)
+        except Exception as e:
+            logging.warning(f"Could not create rate limit TTL index: {e}")
+    while True:
+        await asyncio.sleep(RATE_LIMIT_SYNC_SECONDS)
+        try:
+            if RATE_LIMIT_STORE == "mongo":
+                await rate_limiter.sync_shared_store(worker.db.rate_limits)
+            rate_limiter.prune(time.time())
+        except Exception as e:
+            # Keep limiting on local counts if the shared store is unavailable
+            logging.warning(f"Rate limit sync failed: {e}")
+            rate_limiter.local.update({
+                bucket: rate_limiter.local.get(bucket, 0) + hits for bucket, hits in rate_limiter.flushing.items()
+            })
+            rate_limiter.flushing = {}
+
+# Response Compression (gzip/brotli by Accept-Encoding; cached itineraries keep their compressed bytes)
+COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', 1024))
+# Responses compressed per request favour speed; stored variants are compressed once, so favour size
+COMPRESSION_LEVELS = {
+    "br": (int(os.environ.get('BROTLI_QUALITY', 4)), int(os.environ.get('BROTLI_STORED_QUALITY', 9))),
+    "gzip": (int(os.environ.get('GZIP_LEVEL', 6)), int(os.environ.get('GZIP_STORED_LEVEL', 9)))
+}
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+response_compression_total = Counter("sanskriti_response_compression_total", "Compressed responses by encoding and source", ["encoding", "source"])
+response_bytes_saved_total = Counter("sanskriti_response_bytes_saved_total", "Response bytes saved by compression", ["encoding"])
+
+@functools.lru_cache(maxsize=256)
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Best supported content coding for an Accept-Encoding header (brotli wins ties)"""
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding.strip()] = q
+    candidates = [coding for coding in (("br", "gzip") if brotli else ("gzip",))
+                  if weights.get(coding, weights.get("*", 0)) > 0]
+    return max(candidates, key=lambda coding: weights.get(coding, weights.get("*", 0)), default=None)
+
+def compress_body(body: bytes, encoding: str, stored: bool = False) -> bytes:
+    level = COMPRESSION_LEVELS[encoding][1 if stored else 0]
+    if encoding == "br":
+        return brotli.compress(body, quality=level)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+def cached_json_response(cache: "TieredCache", key: str, body: bytes, accept_encoding: Optional[str]) -> Response:
+    """Serve a cached JSON body, reusing (or storing) its compressed variant for the negotiated encoding"""
+    encoding = None
+    if COMPRESSION_ENABLED and len(body) >= COMPRESSION_MIN_BYTES:
+        encoding = negotiate_encoding(accept_encoding or "")
+    if encoding is None:
+        return Response(content=body, media_type="application/json", headers={"Vary": "Accept-Encoding"})
+    compressed = cache.get((key, encoding))
+    if compressed is None:
+        compressed = compress_body(body, encoding, stored=True)
+        cache.set((key, encoding), compressed)
+    response_compression_total.inc(encoding, "stored")
+    response_bytes_saved_total.inc(encoding, amount=len(body) - len(compressed))
+    return Response(content=compressed, media_type="application/json",
+                    headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"})
+
+class CompressionMiddleware:
+    """Pure ASGI middleware compressing single-message JSON/text responses for clients that accept it"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = next((value.decode("latin-1") for name, value in scope["headers"] if name == b"accept-encoding"), "")
+        encoding = negotiate_encoding(accept_encoding) if accept_encoding else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def send_compressed(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if start_message is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+            initial, start_message = start_message, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=initial["headers"])
+            content_type = headers.get("content-type", "")
+            # Streaming bodies, already-encoded bodies and other media types pass through untouched
+            if (not message.get("more_body") and "content-encoding" not in headers
+                    and content_type.startswith(COMPRESSIBLE_TYPES)):
+                headers.add_vary_header("Accept-Encoding")
+                if len(body) >= COMPRESSION_MIN_BYTES:
+                    compressed = compress_body(body, encoding)
+                    response_compression_total.inc(encoding, "on_the_fly")
+                    response_bytes_saved_total.inc(encoding, amount=len(body) - len(compressed))
+                    headers["Content-Encoding"] = encoding
+                    headers["Content-Length"] = str(len(compressed))
+                    message = {**message, "body": compressed}
+            await send(initial)
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+# Progressive Enrichment (the template is served at once; the LLM version replaces it in the background)
+ENRICHMENT_ENABLED = os.environ.get('ENRICHMENT_ENABLED', 'true').lower() == 'true'
+ENRICHMENT_CONCURRENCY = int(os.environ.get('ENRICHMENT_CONCURRENCY', 8))
+ITINERARY_POLL_SECONDS = float(os.environ.get('ITINERARY_POLL_SECONDS', 1.0))
+ITINERARY_WAIT_MAX_SECONDS = float(os.environ.get('ITINERARY_WAIT_MAX_SECONDS', 30))
+
+enrichment_total = Counter("sanskriti_enrichment_total", "Background LLM enrichments by outcome", ["outcome"])
+enrichment_semaphore = None
+pending_enrichments = set()
+# Waiters for a new version of an itinerary updated by this worker (others are found by polling); the event
+# is removed when its last waiter leaves
+version_events: Dict[str, asyncio.Event] = {}
+version_waiters: Dict[str, int] = {}
+
+def enrichment_available() -> bool:
+    return ENRICHMENT_ENABLED and llm_configured() and not llm_router.is_open()
+
+def refresh_itinerary_cache(itinerary: Itinerary) -> bytes:
+    """Replace the cached body (and drop compressed variants) after an itinerary changed"""
+    for key in (itinerary.id, (itinerary.id, "gzip"), (itinerary.id, "br")):
+        itinerary_cache.delete(key)
+    body = itinerary.model_dump_json().encode()
+    itinerary_cache.set(itinerary.id, body)
+    recent_writes[itinerary.id] = True
+    event = version_events.pop(itinerary.id, None)
+    if event:
+        event.set()
+    publish_itinerary(itinerary)
+    return body
+
+def schedule_enrichment(itinerary: Itinerary, request: TripRequest):
+    task = asyncio.create_task(enrich_itinerary(itinerary, request))
+    pending_enrichments.add(task)
+    task.add_done_callback(pending_enrichments.discard)
+
+async def enrich_itinerary(itinerary: Itinerary, request: TripRequest):
+    """Build the LLM itinerary and store it as the next version, unless the template was changed meanwhile"""
+    global enrichment_semaphore
+    if enrichment_semaphore is None:
+        enrichment_semaphore = asyncio.Semaphore(ENRICHMENT_CONCURRENCY)
+    upstream_priority.set("refresh")  # interactive Places traffic goes first
+    async with enrichment_semaphore:
+        try:
+            real_data = await get_real_travel_data(
+                request.destination, request.budget, request.duration, request.theme,
+                request.travel_mode == "solo_female"
+            )
+            publish_progress(itinerary.id, "data_fetched")
+            itinerary_data = await route_itinerary_days(
+                await generate_llm_itinerary_data(request, real_data), real_data["attractions"]
+            )
+            with stage_timer("validation"):
+                days = [ItineraryDay(**day).model_dump() for day in itinerary_data.get('days', [])]
+            if len(days) != request.duration:
+                raise ValueError(f"LLM returned {len(days)} days for a {request.duration}-day trip")
+            publish_progress(itinerary.id, "days_produced", days=len(days))
+            update = {
+                "days": days,
+                "total_cost": int(itinerary_data.get('total_cost', itinerary.total_cost)),
+                "community_impact": calculate_community_impact(itinerary_data, request.budget),
+                "safety_score": int(itinerary_data.get('safety_score', itinerary.safety_score)),
+                "version": itinerary.version + 1,
+                "status": "enriched"
+            }
+        except Exception as e:
+            enrichment_total.inc("failed")
+            logging.warning(f"Enrichment failed for itinerary {itinerary.id}: {e}")
+            update = {"version": itinerary.version + 1, "status": "enrichment_failed"}
+
+    try:
+        changes = {"$set": {key: value for key, value in update.items() if key not in BODY_FIELDS}}
+        if "days" in update:
+            body_update = await itinerary_body_update(update["days"], update["community_impact"])
+            changes["$set"].update(body_update["$set"])
+            if "$unset" in body_update:
+                changes["$unset"] = body_update["$unset"]
+        with stage_timer("mongo_update"), span("mongo.itineraries.update_one", enrichment=True):
+            result = await worker.db.itineraries.update_one(
+                {"id": itinerary.id, "version": itinerary.version}, changes
+            )
+    except Exception as e:
+        logging.warning(f"Saving enrichment for itinerary {itinerary.id} failed: {e}")
+        return
+    if result.matched_count == 0:
+        enrichment_total.inc("superseded")  # e.g. a day was regenerated first
+        publish_progress(itinerary.id, "superseded")
+        return
+    if update["status"] == "enriched":
+        enrichment_total.inc("enriched")
+    publish_progress(itinerary.id, "persisted", version=update["version"])
+    refresh_itinerary_cache(Itinerary.trusted({**itinerary.model_dump(), **update}))
+    publish_progress(itinerary.id, update["status"], version=update["version"])
+
+async def wait_for_version(itinerary_id: str, after_version: int, timeout: float) -> Optional[Dict[str, Any]]:
+    """Return the itinerary once its version exceeds after_version, or None after timeout (at once for unknown ids)"""
+    deadline = time.monotonic() + timeout
+    registered = False
+    try:
+        while True:
+            with span("mongo.itineraries.find_one", wait=True):
+                itinerary = await worker.db.itineraries.find_one(
+                    {"id": itinerary_id, "version": {"$gt": after_version}}, {"_id": 0}
+                )
+            remaining = deadline - time.monotonic()
+            if itinerary or remaining <= 0:
+                return await assemble_itinerary(itinerary)
+            if not registered:
+                if not await worker.db.itineraries.count_documents({"id": itinerary_id}, limit=1):
+                    return None
+                version_waiters[itinerary_id] = version_waiters.get(itinerary_id, 0) + 1
+                registered = True
+            event = version_events.setdefault(itinerary_id, asyncio.Event())
+            try:
+                await asyncio.wait_for(event.wait(), min(remaining, ITINERARY_POLL_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        if registered:
+            version_waiters[itinerary_id] -= 1
+            if not version_waiters[itinerary_id]:
+                del version_waiters[itinerary_id]
+                version_events.pop(itinerary_id, None)
+
+# Live Itinerary Updates (one WebSocket follows several itineraries: progress events plus deltas instead of full documents)
+WS_MAX_CONNECTIONS = int(os.environ.get('WS_MAX_CONNECTIONS', 1000))
+WS_MAX_SUBSCRIPTIONS = int(os.environ.get('WS_MAX_SUBSCRIPTIONS', 20))
+WS_SEND_QUEUE_SIZE = int(os.environ.get('WS_SEND_QUEUE_SIZE', 64))
+WS_SEND_TIMEOUT_SECONDS = float(os.environ.get('WS_SEND_TIMEOUT_SECONDS', 10))
+WS_HEARTBEAT_SECONDS = float(os.environ.get('WS_HEARTBEAT_SECONDS', 20))
+WS_IDLE_TIMEOUT_SECONDS = float(os.environ.get('WS_IDLE_TIMEOUT_SECONDS', 60))
+# New versions written by this worker are pushed from refresh_itinerary_cache. Only itineraries still being
+# enriched (possibly on another worker) are checked by one query per worker every WS_POLL_SECONDS.
+WS_POLL_SECONDS = float(os.environ.get('WS_POLL_SECONDS', 5))
+WS_CLOSE_TRY_AGAIN = 1013
+
+websocket_events_total = Counter("sanskriti_websocket_events_total", "WebSocket events by type and outcome", ["type", "outcome"])
+websocket_closed_total = Counter("sanskriti_websocket_closed_total", "WebSocket connections closed by reason", ["reason"])
+# Sockets following an itinerary on this worker, and the (version, status) last published to them
+live_subscribers: Dict[str, set] = {}
+live_versions: Dict[str, Tuple[int, str]] = {}
+websocket_connections = set()
+
+def publish_progress(itinerary_id: str, stage: str, **fields):
+    """Offer a progress event to every socket on this worker following the itinerary"""
+    for connection in live_subscribers.get(itinerary_id, ()):
+        connection.offer({"type": "progress", "id": itinerary_id, "stage": stage, **fields})
+
+def publish_itinerary(itinerary: Itinerary):
+    """Hand a new version to every socket on this worker following it (nothing is serialized without one)"""
+    connections = live_subscribers.get(itinerary.id)
+    if not connections:
+        return
+    document = itinerary.model_dump(mode="json")
+    live_versions[itinerary.id] = (document["version"], document["status"])
+    for connection in connections:
+        connection.push(itinerary.id, document)
+
+def itinerary_delta(previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """Changed top-level fields, narrowed to the changed days while the day count stays the same"""
+    changes = {}
+    for key, value in current.items():
+        if key == "days" and len(value) == len(previous.get("days", ())):
+            changes.update({f"days.{index}": day for index, day in enumerate(value) if day != previous["days"][index]})
+        elif previous.get(key) != value:
+            changes[key] = value
+    return changes
+
+async def live_poll_loop():
+    """Pick up versions written by other workers, for followed itineraries whose enrichment is still pending"""
+    while True:
+        await asyncio.sleep(WS_POLL_SECONDS)
+        pending = [itinerary_id for itinerary_id, (_, status) in live_versions.items() if status == "enriching"]
+        if not pending:
+            continue
+        try:
+            with span("mongo.itineraries.find", websocket=True, ids=len(pending)):
+                records = await worker.db.itineraries.find(
+                    {"id": {"$in": pending}}, {"_id": 0, "id": 1, "version": 1}
+                ).to_list(length=None)
+            for record in records:
+                known = live_versions.get(record["id"])
+                if known and record.get("version", 1) > known[0]:
+                    itinerary = await find_itinerary(record["id"])
+                    if itinerary:
+                        publish_itinerary(Itinerary.trusted(itinerary))
+        except Exception as e:
+            logging.warning(f"Polling followed itineraries failed: {e}")
+
+class ItinerarySocket:
+    """One client connection: its subscriptions, a bounded event queue, pending versions, a writer and a heartbeat.
+
+    Progress events and heartbeats go through the bounded queue and are dropped when it is full. Versions are
+    never dropped: only the latest pending one per itinerary is kept, so while a slow client catches up the
+    intermediate versions are coalesced into one delta against the version it was last sent.
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=WS_SEND_QUEUE_SIZE)
+        self.pending: Dict[str, Dict[str, Any]] = {}  # itinerary id -> latest version not yet sent
+        self.sent: Dict[str, Dict[str, Any]] = {}     # itinerary id -> version the client has
+        self.subscriptions = set()
+        self.wakeup = asyncio.Event()
+
+    def offer(self, event: Dict[str, Any]) -> bool:
+        """Queue an event that may be dropped: progress and heartbeats are superseded by what follows"""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            websocket_events_total.inc(event["type"], "dropped")
+            return False
+        self.wakeup.set()
+        return True
+
+    def push(self, itinerary_id: str, document: Dict[str, Any]):
+        """Make document the next version to send, replacing an older one still pending"""
+        pending = self.pending.get(itinerary_id)
+        if pending is None or pending["version"] < document["version"]:
+            self.pending[itinerary_id] = document
+            self.wakeup.set()
+
+    async def run(self):
+        await self.websocket.accept()
+        tasks = [asyncio.create_task(coroutine) for coroutine in (self.read(), self.write(), self.heartbeat())]
+        reason = "shutdown"
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            reason = next(iter(done)).result()
+        except Exception as e:
+            logging.warning(f"WebSocket closed after an error: {e}")
+            reason = "error"
+        finally:
+            for task in tasks:
+                task.cancel()
+            for itinerary_id in list(self.subscriptions):
+                self.unsubscribe(itinerary_id)
+            websocket_closed_total.inc(reason)
+        if reason != "client":
+            try:
+                await self.websocket.close(code=WS_CLOSE_TRY_AGAIN if reason == "slow_consumer" else 1000, reason=reason)
+            except Exception:
+                pass  # already gone
+
+    async def read(self) -> str:
+        """Handle subscribe/unsubscribe/pong messages; a client silent for too long is disconnected"""
+        while True:
+            try:
+                message = await asyncio.wait_for(self.websocket.receive_json(), WS_IDLE_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                return "idle"
+            except WebSocketDisconnect:
+                return "client"
+            except ValueError:
+                message = None
+            if not isinstance(message, dict):
+                self.offer({"type": "error", "detail": "Messages must be JSON objects"})
+                continue
+            op, itinerary_id = message.get("op"), str(message.get("id", ""))
+            if op == "subscribe" and itinerary_id:
+                after_version = message.get("after_version", 0)
+                if not isinstance(after_version, int) or isinstance(after_version, bool):
+                    self.offer({"type": "error", "id": itinerary_id, "detail": "after_version must be an integer"})
+                elif itinerary_id not in self.subscriptions and len(self.subscriptions) >= WS_MAX_SUBSCRIPTIONS:
+                    self.offer({"type": "error", "id": itinerary_id, "detail": "Too many subscriptions"})
+                else:
+                    await self.subscribe(itinerary_id, after_version)
+            elif op == "unsubscribe" and itinerary_id:
+                self.unsubscribe(itinerary_id)
+            elif op != "pong":
+                self.offer({"type": "error", "detail": f"Unknown op: {op}"})
+
+    def next_event(self) -> Optional[Dict[str, Any]]:
+        if not self.queue.empty():
+            return self.queue.get_nowait()
+        while self.pending:
+            itinerary_id = next(iter(self.pending))
+            document = self.pending.pop(itinerary_id)
+            previous = self.sent.get(itinerary_id)
+            if previous is None:
+                self.sent[itinerary_id] = document
+                return {"type": "itinerary", "id": itinerary_id, "version": document["version"], "itinerary": document}
+            # A stale version is skipped without replacing the client's base, so later deltas still apply to it
+            if document["version"] > previous["version"]:
+                self.sent[itinerary_id] = document
+                return {"type": "delta", "id": itinerary_id, "version": document["version"],
+                        "changes": itinerary_delta(previous, document)}
+        return None
+
+    async def write(self) -> str:
+        """Send events and versions in order; a client that cannot take one within the timeout is disconnected"""
+        while True:
+            event = self.next_event()
+            if event is None:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+            try:
+                await asyncio.wait_for(self.websocket.send_text(json.dumps(event)), WS_SEND_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                websocket_events_total.inc(event["type"], "dropped")
+                return "slow_consumer"
+            websocket_events_total.inc(event["type"], "sent")
+
+    async def heartbeat(self) -> str:
+        while True:
+            await asyncio.sleep(WS_HEARTBEAT_SECONDS)
+            self.offer({"type": "ping", "ts": round(time.time(), 3)})
+
+    async def subscribe(self, itinerary_id: str, after_version: int):
+        """Follow an itinerary: the client gets it whole unless it already has after_version, then deltas"""
+        # Registered before the read, so a version written meanwhile is pushed rather than missed
+        self.subscriptions.add(itinerary_id)
+        live_subscribers.setdefault(itinerary_id, set()).add(self)
+        self.sent.pop(itinerary_id, None)
+        try:
+            with span("mongo.itineraries.find_one", websocket=True):
+                itinerary = await find_itinerary(itinerary_id)
+        except Exception as e:
+            logging.warning(f"Loading itinerary {itinerary_id} for a WebSocket failed: {e}")
+            itinerary = None
+        if itinerary_id not in self.subscriptions:
+            return  # unsubscribed meanwhile
+        if not itinerary:
+            self.unsubscribe(itinerary_id)
+            self.offer({"type": "error", "id": itinerary_id, "detail": "Itinerary not found"})
+            return
+        document = Itinerary.trusted(itinerary).model_dump(mode="json")
+        known = live_versions.get(itinerary_id)
+        if known is None or known[0] < document["version"]:
+            live_versions[itinerary_id] = (document["version"], document["status"])
+        if document["version"] <= after_version and itinerary_id not in self.pending:
+            self.sent[itinerary_id] = document
+        else:
+            self.push(itinerary_id, document)
+
+    def unsubscribe(self, itinerary_id: str):
+        self.subscriptions.discard(itinerary_id)
+        self.pending.pop(itinerary_id, None)
+        self.sent.pop(itinerary_id, None)
+        listeners = live_subscribers.get(itinerary_id)
+        if listeners is not None:
+            listeners.discard(self)
+            if not listeners:
+                del live_subscribers[itinerary_id]
+                live_versions.pop(itinerary_id, None)
+
+# Health Checks (results are cached briefly so heavy probe polling costs almost nothing)
+HEALTH_CACHE_SECONDS = float(os.environ.get('HEALTH_CACHE_SECONDS', 2))
+HEALTH_PROBE_TIMEOUT_SECONDS = float(os.environ.get('HEALTH_PROBE_TIMEOUT_SECONDS', 1))
+HEALTH_MAX_LOOP_LAG_MS = float(os.environ.get('HEALTH_MAX_LOOP_LAG_MS', 500))
+HEALTH_MAX_EXECUTOR_QUEUE = int(os.environ.get('HEALTH_MAX_EXECUTOR_QUEUE', 50))
+LOOP_LAG_INTERVAL_SECONDS = 0.5
+
+loop_lag_state = {"lag_ms": 0.0, "max_lag_ms": 0.0}
+readiness_state = {"checked_at": 0.0, "result": None, "task": None}
+
+async def monitor_event_loop_lag():
+    """Measure how late the event loop wakes up from a fixed sleep"""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(LOOP_LAG_INTERVAL_SECONDS)
+        lag_ms = max(0.0, (time.perf_counter() - started - LOOP_LAG_INTERVAL_SECONDS) * 1000)
+        loop_lag_state["lag_ms"] = round(lag_ms, 2)
+        loop_lag_state["max_lag_ms"] = round(max(loop_lag_state["max_lag_ms"], lag_ms), 2)
+
+def executor_queue_depth() -> int:
+    """Number of external API calls waiting for a free executor thread"""
+    return worker._executor._work_queue.qsize() if worker._executor else 0
+
+async def probe_mongo() -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(worker.db.command('ping'), HEALTH_PROBE_TIMEOUT_SECONDS)
+        return {"ok": True, "rtt_ms": round((time.perf_counter() - started) * 1000, 2),
+                "read_preference": MONGO_READ_PREFERENCE, "checked_out": mongo_pool_state["checked_out"]}
+    except Exception as e:
+        return {"ok": False, "error": str(e)[:200]}
+
+async def probe_places() -> Dict[str, Any]:
+    """Cheap reachability probe (TCP connect, no quota used) for the Places API host"""
+    if not GOOGLE_PLACES_ENABLED:
+        return {"ok": True, "enabled": False, "mode": "fallback"}
+    if places_guard.is_open():
+        return {"ok": False, "enabled": True, "mode": "fallback", **places_guard.stats()}
+    places_url = urlparse(GOOGLE_PLACES_BASE_URL)
+    started = time.perf_counter()
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(places_url.hostname, places_url.port or (443 if places_url.scheme == "https" else 80)),
+            HEALTH_PROBE_TIMEOUT_SECONDS
+        )
+        writer.close()
+        return {"ok": True, "enabled": True, "rtt_ms": round((time.perf_counter() - started) * 1000, 2), **places_guard.stats()}
+    except Exception as e:
+        return {"ok": False, "enabled": True, "error": str(e)[:200] or type(e).__name__}
+
+async def run_readiness_checks() -> Dict[str, Any]:
+    mongo, places = await asyncio.gather(probe_mongo(), probe_places())
+    queue_depth = executor_queue_depth()
+    checks = {
+        "warmup": {"ok": warmup_state["ready"], **warmup_state},
+        "mongo": mongo,
+        # Places and LLM outages degrade to the fallback/template path instead of failing readiness
+        "places": places,
+        "llm": {"ok": not llm_router.is_open(), "key_present": bool(os.environ.get('EMERGENT_LLM_KEY')), "models": llm_router.stats()},
+        "executor": {"ok": queue_depth <= HEALTH_MAX_EXECUTOR_QUEUE, "queue_depth": queue_depth},
+        "admission": {"ok": True, **generate_limiter.stats()},
+        "event_loop": {"ok": loop_lag_state["lag_ms"] <= HEALTH_MAX_LOOP_LAG_MS, **loop_lag_state}
+    }
+    required = ("warmup", "mongo", "executor", "event_loop")
+    result = {
+        "ready": all(checks[name]["ok"] for name in required),
+        "degraded": not (checks["places"]["ok"] and checks["llm"]["ok"] and checks["llm"]["key_present"]),
+        "checks": checks,
+        "cache_sizes": {
+            "places": len(places_cache),
+            "template": len(template_cache),
+            "llm": len(llm_cache),
+            "itinerary": len(itinerary_cache),
+            "itinerary_body": len(itinerary_body_cache)
+        },
+        "shared_cache": worker.shared_cache.stats() if worker.shared_cache else None,
+        "checked_at": datetime.now(timezone.utc).isoformat()
+    }
+    readiness_state.update({"checked_at": time.monotonic(), "result": result, "task": None})
+    return result
+
+async def check_readiness() -> Dict[str, Any]:
+    """Return the cached readiness result, running at most one set of probes at a time"""
+    if readiness_state["result"] and time.monotonic() - readiness_state["checked_at"] < HEALTH_CACHE_SECONDS:
+        return readiness_state["result"]
+    if readiness_state["task"] is None:
+        readiness_state["task"] = asyncio.ensure_future(run_readiness_checks())
+    task = readiness_state["task"]
+    try:
+        return await asyncio.shield(task)
+    except Exception as e:
+        # A failed run is reported as not ready; the next probe starts a fresh one
+        if readiness_state["task"] is task:
+            readiness_state["task"] = None
+        logging.warning(f"Readiness checks failed: {e}")
+        return {"ready": False, "degraded": True, "checks": {}, "error": str(e)[:200] or type(e).__name__,
+                "checked_at": datetime.now(timezone.utc).isoformat()}
+
 # API Routes
 @api_router.get("/")
 async def root():
     return {"message": "Welcome to Sanskriti - AI Travel Planner for India"}
 
+@api_router.get("/health/live")
+async def health_live():
+    """Liveness: the process and its event loop are responsive (no dependency checks)"""
+    return {"status": "alive", "event_loop": loop_lag_state}
+
+@api_router.get("/health/ready")
+async def health_ready():
+    """Readiness for load balancers: 503 until warmed up and Mongo, executor and event loop are healthy"""
+    result = await check_readiness()
+    return JSONResponse(status_code=200 if result["ready"] else 503, content={
+        "status": ("degraded" if result["degraded"] else "ready") if result["ready"] else "not_ready",
+        **result
+    })
+
+# Itinerary routes return pre-serialized bodies so FastAPI does not validate the response model again
 @api_router.post("/itinerary/generate", response_model=Itinerary)
 async def generate_itinerary(request: TripRequest):
+    if not generate_limiter.try_acquire():
+        if ADMISSION_OVERLOAD_MODE == "reject":
+            admission_total.inc("generate", "rejected")
+            raise HTTPException(
+                status_code=503,
+                detail="Itinerary generation is overloaded, please retry shortly",
+                headers={"Retry-After": str(generate_limiter.retry_after())}
+            )
+        # Degrade instead of queueing: serve the template path and write to the database in the background
+        admission_total.inc("generate", "degraded")
+        response = await create_itinerary(request, degraded=True)
+        response.headers["X-Sanskriti-Degraded"] = "overload"
+        return response
+
+    admission_total.inc("generate", "admitted")
+    started = time.perf_counter()
+    ok = False
+    try:
+        response = await create_itinerary(request, enrich=enrichment_available())
+        ok = True
+        return response
+    finally:
+        generate_limiter.release(time.perf_counter() - started, ok)
+
+async def create_itinerary(request: TripRequest, degraded: bool = False, enrich: bool = False) -> Response:
     try:
         # Use optimized approach - skip external API calls for speed
         logging.info(f"Generating fast itinerary for {request.destination}")
         
         # Use fallback data directly for much faster response
-        itinerary_data = {
-            "days": [
-                {
-                    "day": i + 1,
-                    "activities": [
-                        {
-                            "time": "9:00 AM",
-                            "activity": f"Explore {request.destination} Heritage Sites",
-                            "description": f"Discover the rich cultural heritage of {request.destination}",
-                            "location": request.destination,
-                            "cost": 300 + (i * 100),
-                            "safety_level": "high", 
-                            "duration": "3-4 hours"
-                        },
-                        {
-                            "time": "2:00 PM",
-                            "activity": f"Local {request.theme.title()} Experience",
-                            "description": f"Immerse yourself in authentic {request.theme} activities",
-                            "location": request.destination,
-                            "cost": 500 + (i * 150),
-                            "safety_level": "high", 
-                            "duration": "2-3 hours"
-                        }
-                    ],
-                    "accommodation": {
-                        "name": f"Heritage Hotel {request.destination.split(',')[0]}",
-                        "type": "heritage hotel",
-                        "location": f"City Center, {request.destination}",
-                        "cost": int(request.budget * 0.35 / request.duration),
-                        "safety_rating": 5,
-                        "women_friendly": True,
-                        "amenities": ["WiFi", "24/7 Security", "Women-Safe Environment", "Room Service"]
-                    },
-                    "meals": [
-                        {
-                            "meal": "breakfast",
-                            "restaurant": f"Royal Breakfast {request.destination.split(',')[0]}",
-                            "cuisine": "Continental & Local",
-                            "cost": 400,
-                            "location": "Hotel"
-                        },
-                        {
-                            "meal": "lunch", 
-                            "restaurant": f"Traditional Kitchen {request.destination.split(',')[0]}",
-                            "cuisine": "Regional Specialties",
-                            "cost": 600,
-                            "location": "City Center"
-                        },
-                        {
-                            "meal": "dinner",
-                            "restaurant": "Women's Cooperative Restaurant", 
-                            "cuisine": "Home-style Local",
-                            "cost": 700,
-                            "location": "Near Hotel"
-                        }
-                    ],
-                    "estimated_cost": int(request.budget * 0.8 / request.duration),
-                    "safety_tips": [
-                        "Use hotel's recommended transportation services",
-                        "Stay in well-lit, populated areas especially after sunset",
-                        "Keep emergency contacts easily accessible",
-                        "Share your daily itinerary with hotel reception" if not request.period_friendly 
-                        else "Locate clean restrooms and nearby pharmacies for comfort"
-                    ]
-                } for i in range(request.duration)
-            ],
-            "total_cost": int(request.budget * 0.85),
-            "safety_score": 90,
-            "community_experiences": [
-                {
-                    "activity": f"Traditional {request.theme} workshop with local artisans",
-                    "host": f"Community collective in {request.destination}",
-                    "cost": 800,
-                    "impact": "Directly supports local families and preserves cultural traditions"
-                }
-            ]
-        }
+        with stage_timer("template_build"):
+            itinerary_data = build_template_itinerary(request)
         
         # Calculate community impact
         community_impact = calculate_community_impact(itinerary_data, request.budget)
         
         # Create itinerary object
-        itinerary = Itinerary(
-            destination=request.destination,
-            budget=request.budget,
-            duration=request.duration,
-            theme=request.theme,
-            travel_mode=request.travel_mode,
-            period_friendly=request.period_friendly or False,
-            days=[ItineraryDay(**day) for day in itinerary_data.get('days', [])],
-            total_cost=itinerary_data.get('total_cost', request.budget),
-            community_impact=community_impact,
-            safety_score=itinerary_data.get('safety_score', 90)
-        )
+        with stage_timer("validation"):
+            itinerary = Itinerary.trusted(dict(
+                destination=request.destination,
+                budget=request.budget,
+                duration=request.duration,
+                theme=request.theme,
+                travel_mode=request.travel_mode,
+                period_friendly=request.period_friendly or False,
+                days=itinerary_data.get('days', []),
+                total_cost=itinerary_data.get('total_cost', request.budget),
+                community_impact=community_impact,
+                safety_score=itinerary_data.get('safety_score', 90),
+                status="template"
+            ))
         
-        # Save to database (async, non-blocking)
-        try:
-            itinerary_dict = itinerary.dict()
-            itinerary_dict['created_at'] = itinerary_dict['created_at'].isoformat()
-            await db.itineraries.insert_one(itinerary_dict)
-        except Exception as db_error:
-            logging.warning(f"Database save failed: {db_error}")
-            # Continue without failing the request
+        itinerary_dict = itinerary.model_dump()
+        itinerary_dict['created_at'] = itinerary_dict['created_at'].isoformat()
+        if degraded:
+            # Under overload the enrichment is shed and the write deferred to the bounded background set; when
+            # that is full too, the itinerary is returned as "unsaved" so clients do not follow an unstored id
+            if not persist_in_background(save_itinerary(itinerary_dict)):
+                itinerary.status = "unsaved"
+            with stage_timer("serialization"):
+                body = itinerary.model_dump_json().encode()
+            logging.info(f"Fast itinerary created with {len(itinerary.days)} days (degraded, {itinerary.status})")
+            return Response(content=body, media_type="application/json")
+
+        # The record is stored as "enriching" so readers wait for the LLM version, but the response only says so
+        # once the save succeeded and the enrichment is scheduled; an unsaved template is never enriched
+        if enrich:
+            itinerary_dict['status'] = "enriching"
+        saved = await save_itinerary(itinerary_dict)
+        if saved and enrich:
+            schedule_enrichment(itinerary, request)
+            itinerary.status = "enriching"
+        with stage_timer("serialization"):
+            body = itinerary.model_dump_json().encode()
+        if saved:
+            itinerary_cache.set(itinerary.id, body)
         
         logging.info(f"Fast itinerary created with {len(itinerary.days)} days")
-        return itinerary
+        return Response(content=body, media_type="application/json")
         
     except Exception as e:
+        errors_total.inc("generate")
         logging.error(f"Error generating itinerary: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error generating itinerary: {str(e)}")
 
+async def save_itinerary(itinerary_dict: Dict[str, Any]):
+    try:
+        if ITINERARY_DEDUP_ENABLED:
+            day_hashes = await store_itinerary_days(itinerary_dict["days"])
+            itinerary_dict = {key: value for key, value in itinerary_dict.items() if key != "days"}
+            itinerary_dict["day_hashes"] = day_hashes
+        with stage_timer("mongo_insert"), span("mongo.itineraries.insert_one"):
+            await worker.db.itineraries.insert_one(itinerary_dict)
+        recent_writes[itinerary_dict["id"]] = True
+        return True
+    except Exception as db_error:
+        logging.warning(f"Database save failed: {db_error}")
+        # Continue without failing the request
+        return False
+
 @api_router.get("/itinerary/{itinerary_id}", response_model=Itinerary)
-async def get_itinerary(itinerary_id: str):
-    itinerary = await db.itineraries.find_one({"id": itinerary_id})
+async def get_itinerary(itinerary_id: str, accept_encoding: Optional[str] = Header(None)):
+    cached = itinerary_cache.get(itinerary_id)
+    if cached is not None:
+        return cached_json_response(itinerary_cache, itinerary_id, cached, accept_encoding)
+
+    with span("mongo.itineraries.find_one"):
+        itinerary = await find_itinerary(itinerary_id)
     if not itinerary:
         raise HTTPException(status_code=404, detail="Itinerary not found")
-    
-    # Parse datetime
-    if isinstance(itinerary['created_at'], str):
-        itinerary['created_at'] = datetime.fromisoformat(itinerary['created_at'])
-    
-    return Itinerary(**itinerary)
+
+    body = Itinerary.trusted(itinerary).model_dump_json().encode()
+    itinerary_cache.set(itinerary_id, body)
+    return cached_json_response(itinerary_cache, itinerary_id, body, accept_encoding)
+
+@api_router.get("/itinerary/{itinerary_id}/updates", response_model=Itinerary)
+async def get_itinerary_update(itinerary_id: str, after_version: int = 1, timeout: float = 25):
+    """Long poll: respond once the itinerary has a version newer than after_version (204 on timeout)"""
+    itinerary = await wait_for_version(itinerary_id, after_version, max(0.0, min(timeout, ITINERARY_WAIT_MAX_SECONDS)))
+    if not itinerary:
+        if not await worker.db.itineraries.count_documents({"id": itinerary_id}, limit=1):
+            raise HTTPException(status_code=404, detail="Itinerary not found")
+        return Response(status_code=204)
+    return Response(content=Itinerary.trusted(itinerary).model_dump_json(), media_type="application/json")
+
+@api_router.websocket("/itinerary/live")
+async def itinerary_live(websocket: WebSocket):
+    """Multiplexed progress events and version deltas for the itineraries this connection subscribes to"""
+    if len(websocket_connections) >= WS_MAX_CONNECTIONS:
+        websocket_closed_total.inc("rejected")
+        await websocket.close(code=WS_CLOSE_TRY_AGAIN)
+        return
+    connection = ItinerarySocket(websocket)
+    websocket_connections.add(connection)
+    try:
+        await connection.run()
+    finally:
+        websocket_connections.discard(connection)
+
+REGENERATE_MAX_ATTEMPTS = 3  # version-guarded writes of a regenerated day before answering 409
+
+@api_router.post("/itinerary/{itinerary_id}/days/{day_number}/regenerate", response_model=Itinerary)
+async def regenerate_itinerary_day(itinerary_id: str, day_number: int, request: Optional[DayRegenerationRequest] = None):
+    """Rebuild one day, then update the stored itinerary in place with a targeted, version-guarded $set"""
+    with span("mongo.itineraries.find_one"):
+        record = await worker.db.itineraries.find_one({"id": itinerary_id}, {"_id": 0})
+    in_place = record is not None and stores_days_separately(record)
+    itinerary = await assemble_itinerary(record)
+    if not itinerary:
+        raise HTTPException(status_code=404, detail="Itinerary not found")
+    if not 1 <= day_number <= len(itinerary["days"]):
+        raise HTTPException(status_code=404, detail="Day not found")
+
+    trip = TripRequest(
+        destination=itinerary["destination"],
+        budget=itinerary["budget"],
+        duration=itinerary["duration"],
+        theme=itinerary["theme"],
+        travel_mode=itinerary["travel_mode"],
+        period_friendly=itinerary["period_friendly"],
+        special_preferences=request.special_preferences if request else ""
+    )
+    day, experiences = None, []
+    attractions = []
+    if llm_configured() and not llm_router.is_open():
+        try:
+            attractions = await run_in_executor(get_real_attractions, trip.destination, trip.theme)
+            day_data, experiences = await generate_llm_day_data(trip, itinerary, day_number, attractions=attractions)
+            with stage_timer("validation"):
+                day = ItineraryDay(**{**day_data, "day": day_number}).model_dump()
+        except Exception as e:
+            experiences = []
+            llm_fallback_total.inc("template")
+            logging.warning(f"LLM day regeneration failed, using the template day: {e}")
+    if day is None:
+        fallback_total.inc("day_template")
+        day = {**build_template_itinerary(trip)["days"][day_number - 1], "day": day_number}
+    day["activities"] = await route_activities(attach_places(day["activities"], attractions))
+
+    # Only the changed day (or, when deduplicating, its hash) and the two derived totals are written back; a record
+    # stored in another layout gets all its days written once. The write is guarded by the version it was built from;
+    # if another write landed while the day was generated, the day is applied again on top of the itinerary as stored now.
+    for attempt in range(REGENERATE_MAX_ATTEMPTS):
+        if attempt:
+            with span("mongo.itineraries.find_one", retry=attempt):
+                record = await worker.db.itineraries.find_one({"id": itinerary_id}, {"_id": 0})
+            in_place = record is not None and stores_days_separately(record)
+            itinerary = await assemble_itinerary(record)
+            if not itinerary:
+                raise HTTPException(status_code=404, detail="Itinerary not found")
+        cost_delta = day["estimated_cost"] - itinerary["days"][day_number - 1].get("estimated_cost", 0)
+        community_impact = update_community_impact(itinerary["community_impact"], day_number, experiences)
+        itinerary["days"][day_number - 1] = day
+        changes = await itinerary_body_update(itinerary["days"], community_impact,
+                                              changed_day=day_number - 1 if in_place else None)
+        if itinerary.get("status") == "enriching":
+            changes["$set"]["status"] = itinerary["status"] = "template"  # a pending enrichment would overwrite this edit
+        stored_version = itinerary.get("version")
+        changes["$set"]["version"] = (stored_version or 1) + 1
+        changes["$inc"] = {"total_cost": cost_delta}
+        with stage_timer("mongo_update"), span("mongo.itineraries.update_one", day=day_number):
+            result = await worker.db.itineraries.update_one({"id": itinerary_id, "version": stored_version}, changes)
+        if result.matched_count:
+            break
+    else:
+        raise HTTPException(status_code=409, detail="The itinerary kept changing while the day was regenerated, please retry")
+
+    itinerary["total_cost"] += cost_delta
+    itinerary["community_impact"] = community_impact
+    itinerary["version"] = changes["$set"]["version"]
+    body = refresh_itinerary_cache(Itinerary.trusted(itinerary))
+    return Response(content=body, media_type="application/json")
 
 @api_router.get("/community/hosts", response_model=List[CommunityHost])
 async def get_community_hosts():
@@ -777,16 +3656,76 @@ async def get_community_hosts():
     
     return [CommunityHost(**host) for host in mock_hosts]
 
-# Include the router in the main app
-app.include_router(api_router)
+@api_router.get("/admin/profile", include_in_schema=False)
+async def profile(seconds: float = 10, interval_ms: float = 5, x_admin_token: Optional[str] = Header(None)):
+    """Sample all thread stacks for N seconds under live load; returns collapsed stacks for flame graphs"""
+    if not admin_authorized(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    if not profiler_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    try:
+        seconds = max(0.1, min(seconds, PROFILE_MAX_SECONDS))
+        stacks = await asyncio.to_thread(sample_stacks, seconds, max(interval_ms, 1) / 1000)
+    finally:
+        profiler_lock.release()
+    folded = "\n".join(f"{stack} {count}" for stack, count in sorted(stacks.items(), key=lambda item: -item[1]))
+    return PlainTextResponse(folded + "\n")
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+@api_router.get("/admin/quota", include_in_schema=False)
+async def quota_stats(x_admin_token: Optional[str] = Header(None)):
+    """Places quota consumption per priority class"""
+    if not admin_authorized(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    return places_scheduler.stats()
+
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+def build_worker_state():
+    """Worker-local schedulers, limiters and cache tiers, rebuilt in each worker's lifespan.
+
+    The module-level instances only serve code that runs without a lifespan (benchmarks, scripts);
+    a worker forked from a process that already used them starts from clean state.
+    """
+    global places_scheduler, rate_limiter, generate_limiter
+    places_scheduler = build_places_scheduler()
+    rate_limiter = SlidingWindowRateLimiter()
+    generate_limiter = build_generate_limiter()
+    for cache in TieredCache.instances:
+        cache.reset_local()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await worker.start()
+    try:
+        yield
+    finally:
+        await worker.stop()
+
+def create_app() -> FastAPI:
+    """Build the ASGI app; no clients are created until a worker starts or first needs them"""
+    # Create the main app without a prefix
+    app = FastAPI(lifespan=lifespan)
+
+    # Include the router in the main app
+    app.include_router(api_router)
+    app.add_api_route("/metrics", metrics, methods=["GET"], include_in_schema=False)
+
+    app.add_middleware(CompressionMiddleware)
+    app.add_middleware(MetricsMiddleware)
+    app.add_middleware(TracingMiddleware)
+    app.add_middleware(RateLimitMiddleware)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    return app
+
+app = create_app()
 
 # Configure logging
 logging.basicConfig(
@@ -794,7 +3733,3 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
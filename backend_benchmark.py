@@ -0,0 +1,962 @@
+import asyncio
+import gzip
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import statistics
+import sys
+import threading
+import time
+import zlib
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List
+
+# Benchmarks run in-process against backend/server.py, without a live Mongo
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+os.environ.setdefault("WARMUP_ENABLED", "false")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")  # bench_rate_limit turns it back on for itself
+
+import httpx
+from pydantic import BaseModel
+import server
+
+
+class InMemoryCollection:
+    """Minimal async stand-in for a Motor collection (insert/find/update by equality filters)"""
+    latency = 0.0  # simulated round trip, in seconds
+
+    def __init__(self):
+        self.documents = []
+
+    async def _round_trip(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _matches(self, document, query):
+        for key, condition in (query or {}).items():
+            value = document.get(key)
+            if isinstance(condition, dict):
+                if "$gt" in condition and (value is None or value <= condition["$gt"]):
+                    return False
+                if "$in" in condition and value not in condition["$in"]:
+                    return False
+                if "$gte" in condition and (value is None or value < condition["$gte"]):
+                    return False
+            elif value != condition:
+                return False
+        return True
+
+    async def insert_one(self, document):
+        await self._round_trip()
+        self.documents.append(dict(document))
+
+    async def find_one(self, query=None, projection=None):
+        await self._round_trip()
+        for document in self.documents:
+            if self._matches(document, query):
+                return dict(document)
+        return None
+
+    @staticmethod
+    def _apply(document, update, inserting=False):
+        """$set, $inc, $unset and $setOnInsert, including dotted paths such as "days.2" """
+        for operator, fields in update.items():
+            if operator == "$setOnInsert" and not inserting:
+                continue
+            for path, value in fields.items():
+                if operator == "$unset":
+                    document.pop(path, None)
+                    continue
+                *parents, last = path.split(".")
+                target = document
+                for part in parents:
+                    target = target[int(part)] if isinstance(target, list) else target.setdefault(part, {})
+                key = int(last) if isinstance(target, list) else last
+                if operator == "$inc":
+                    value = (target[key] if isinstance(target, list) else target.get(key, 0)) + value
+                target[key] = value
+
+    async def update_one(self, query, update, upsert=False):
+        await self._round_trip()
+        for document in self.documents:
+            if self._matches(document, query):
+                self._apply(document, update)
+                return SimpleNamespace(matched_count=1, upserted_id=None)
+        if upsert:
+            document = dict(query)
+            self._apply(document, update, inserting=True)
+            self.documents.append(document)
+            return SimpleNamespace(matched_count=0, upserted_id=len(self.documents))
+        return SimpleNamespace(matched_count=0, upserted_id=None)
+
+    async def create_index(self, keys, **options):
+        return keys
+
+    def find(self, query=None, projection=None):
+        return InMemoryCursor(self, query)
+
+    async def bulk_write(self, requests, ordered=True):
+        upserted_ids = {}
+        for index, request in enumerate(requests):  # pymongo UpdateOne
+            result = await self.update_one(request._filter, request._doc, upsert=request._upsert)
+            if result.upserted_id is not None:
+                upserted_ids[index] = result.upserted_id
+        return SimpleNamespace(upserted_ids=upserted_ids)
+
+    async def count_documents(self, query, limit=None):
+        await self._round_trip()
+        count = sum(1 for document in self.documents if self._matches(document, query))
+        return min(count, limit) if limit else count
+
+
+class InMemoryCursor:
+    def __init__(self, collection, query):
+        self.collection, self.query = collection, query
+
+    async def to_list(self, length=None):
+        await self.collection._round_trip()
+        matches = [dict(document) for document in self.collection.documents
+                   if self.collection._matches(document, self.query)]
+        return matches[:length] if length else matches
+
+
+class InMemoryDatabase:
+    def __init__(self):
+        self.collections = {}
+
+    def __getattr__(self, name):
+        return self.collections.setdefault(name, InMemoryCollection())
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+    async def command(self, name):
+        return {"ok": 1.0}
+
+
+TRIP = {
+    "destination": "Jaipur, Rajasthan",
+    "budget": 25000,
+    "duration": 3,
+    "theme": "heritage",
+    "travel_mode": "solo_female",
+    "period_friendly": True
+}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def time_per_call(fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations
+
+
+async def time_generate_requests(http, iterations):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        response = await http.post("/api/itinerary/generate", json=TRIP)
+        samples.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.text
+    return samples
+
+
+def bench_metrics(iterations=2000, rounds=5):
+    """Instrumentation overhead on the generate fast path (target: < 1%)"""
+    server.worker.db = InMemoryDatabase()
+
+    async def run():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            await time_generate_requests(http, 200)  # warm caches and code paths
+            on, off = [], []
+            for _ in range(rounds):
+                server.METRICS_ENABLED = False
+                off.extend(await time_generate_requests(http, iterations))
+                server.METRICS_ENABLED = True
+                on.extend(await time_generate_requests(http, iterations))
+            return on, off
+
+    on, off = asyncio.run(run())
+
+    # Direct cost of the instrumentation one generate request performs:
+    # middleware timing, four stage timers and one cache counter
+    def instrumentation():
+        started = time.perf_counter()
+        for stage in ("template_build", "validation", "serialization", "mongo_insert"):
+            with server.stage_timer(stage):
+                pass
+        server.cache_requests_total.inc("template", "hit")
+        server.request_latency.observe(time.perf_counter() - started, "POST", "generate_itinerary")
+
+    instrumentation_cost = time_per_call(instrumentation, iterations * rounds)
+    baseline = statistics.median(off)
+    return {
+        "requests_per_mode": len(on),
+        "p50_ms_metrics_off": round(baseline * 1000, 4),
+        "p50_ms_metrics_on": round(statistics.median(on) * 1000, 4),
+        "p99_ms_metrics_off": round(percentile(off, 99) * 1000, 4),
+        "p99_ms_metrics_on": round(percentile(on, 99) * 1000, 4),
+        "instrumentation_us_per_request": round(instrumentation_cost * 1e6, 3),
+        "instrumentation_overhead_pct": round(instrumentation_cost / baseline * 100, 3),
+        "passed": instrumentation_cost / baseline < 0.01
+    }
+
+
+class FakeGmaps:
+    """Stand-in for googlemaps.Client with a fixed per-call latency"""
+
+    def __init__(self, latency=0.005):
+        self.latency = latency
+        self.calls = 0
+
+    def places(self, query=None, type=None):
+        self.calls += 1
+        time.sleep(self.latency)
+        return {"status": "OK", "results": []}
+
+
+def bench_quota(duration=3.0, rate=50):
+    """Places quota scheduler: interactive calls are not starved by refresh/batch load, end to end through the executors"""
+    # Small background shares, so refresh and batch callers run out of budget and sit out their max_wait
+    classes = {**server.QUOTA_CLASSES,
+               "refresh": {**server.QUOTA_CLASSES["refresh"], "share": 0.01, "max_wait": 1.0},
+               "batch": {**server.QUOTA_CLASSES["batch"], "share": 0.01, "max_wait": 1.0}}
+    scheduler = server.QuotaScheduler(rate, burst=5, classes=classes)
+    gmaps = FakeGmaps()
+    waits = {name: [] for name in classes}
+    latencies = []
+    deadline = time.perf_counter() + duration
+
+    def call(name):
+        started = time.perf_counter()
+        scheduler.acquire(name)
+        waits[name].append(time.perf_counter() - started)
+        gmaps.places(query="hotels in Jaipur", type="lodging")
+
+    async def caller(name, pause):
+        # Callers queue on the executors exactly like get_real_travel_data and the enrichment do
+        server.upstream_priority.set(name)
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                await server.run_in_executor(call, name)
+                if name == "interactive":
+                    latencies.append(time.perf_counter() - started)
+            except server.QuotaTimeoutError:
+                pass
+            await asyncio.sleep(pause)
+
+    async def run():
+        # Background classes try to use the whole quota; interactive traffic arrives at ~40% of it
+        callers = [caller("batch", 0) for _ in range(4)]
+        callers += [caller("refresh", 0) for _ in range(4)]
+        callers += [caller("interactive", 1 / (rate * 0.4) * 2) for _ in range(2)]
+        await asyncio.gather(*callers)
+        await server.worker.stop()
+
+    asyncio.run(run())
+    stats = scheduler.stats()["classes"]
+    interactive_p99 = percentile(waits["interactive"], 99) if waits["interactive"] else None
+    latency_p99 = percentile(latencies, 99) if latencies else None
+    return {
+        "upstream_calls": gmaps.calls,
+        "calls_per_second": round(gmaps.calls / duration, 1),
+        **{f"{name}_granted": stats[name]["granted"] for name in stats},
+        **{f"{name}_timeouts": stats[name]["timeouts"] for name in stats},
+        "interactive_wait_p99_ms": round(interactive_p99 * 1000, 2) if interactive_p99 is not None else None,
+        "interactive_latency_p99_ms": round(latency_p99 * 1000, 2) if latency_p99 is not None else None,
+        "passed": stats["interactive"]["timeouts"] == 0 and latency_p99 is not None and latency_p99 < 0.25
+    }
+
+
+def bench_rate_limit(iterations=200000, clients=10000):
+    """Rate-limit decision and middleware cost per request (target: a few microseconds)"""
+    limiter = server.SlidingWindowRateLimiter()
+    keys = [f"ip:10.0.{i // 256}.{i % 256}:generate" for i in range(clients)]
+    now = time.time()
+    started = time.perf_counter()
+    for i in range(iterations):
+        limiter.hit(keys[i % clients], 1_000_000, 60, now)
+    hit_cost = (time.perf_counter() - started) / iterations
+
+    async def inner_app(scope, receive, send):
+        pass
+
+    server.RATE_LIMIT_ENABLED = True
+    middleware = server.RateLimitMiddleware(inner_app)
+    scope = {"type": "http", "path": "/api/itinerary/generate", "client": ("10.0.0.1", 5000),
+             "headers": [(b"host", b"bench"), (b"content-type", b"application/json")]}
+    server.RATE_LIMITS["/api/itinerary/generate"] = ("generate", 1_000_000_000, 60)
+
+    async def run(app):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            await app(scope, None, None)
+        return (time.perf_counter() - started) / iterations
+
+    bare, wrapped = asyncio.run(run(inner_app)), asyncio.run(run(middleware))
+    server.RATE_LIMIT_ENABLED = os.environ["RATE_LIMIT_ENABLED"].lower() == "true"
+    return {
+        "hit_us": round(hit_cost * 1e6, 3),
+        "middleware_overhead_us": round((wrapped - bare) * 1e6, 3),
+        "tracked_windows": len(limiter.local),
+        "passed": wrapped - bare < 20e-6
+    }
+
+
+def shared_cache_reader(path, keys, results):
+    """Worker process: read keys another process wrote into the shared segment"""
+    cache = server.SharedCache(path, 16 * 1024 * 1024, server.SHARED_CACHE_INDEX_SLOTS)
+    started = time.perf_counter()
+    hits = sum(1 for key in keys if cache.get(key) is not None)
+    results.put((hits, (time.perf_counter() - started) / len(keys)))
+    cache.close()
+
+
+def bench_shared_cache(entries=2000, workers=4):
+    """Shared cache tier: one copy per host, every worker sees every entry"""
+    value = json.dumps(server.build_template_itinerary(server.TripRequest(**TRIP))).encode()
+    keys = [f"template:bench-{i}" for i in range(entries)]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "shared-cache")
+        cache = server.SharedCache(path, 16 * 1024 * 1024, server.SHARED_CACHE_INDEX_SLOTS)
+        started = time.perf_counter()
+        for key in keys:
+            cache.set(key, value, 60)
+        set_cost = (time.perf_counter() - started) / entries
+
+        results = multiprocessing.get_context("spawn").Queue()
+        readers = [multiprocessing.get_context("spawn").Process(target=shared_cache_reader, args=(path, keys, results))
+                   for _ in range(workers)]
+        for reader in readers:
+            reader.start()
+        outcomes = [results.get(timeout=60) for _ in readers]
+        for reader in readers:
+            reader.join()
+        stats = cache.stats()
+        cache.close()
+
+    hit_rate = min(hits for hits, _ in outcomes) / entries
+    return {
+        "value_bytes": len(value),
+        "set_us": round(set_cost * 1e6, 2),
+        "cross_process_get_us": round(max(cost for _, cost in outcomes) * 1e6, 2),
+        "reader_processes": workers,
+        "cross_process_hit_rate": hit_rate,
+        "segment_bytes": stats["size_bytes"],
+        "segment_used_bytes": stats["used_bytes"],
+        "passed": hit_rate == 1.0
+    }
+
+
+def bench_compression(iterations=500):
+    """14-day itinerary bandwidth and repeat-read cost with precompressed variants"""
+    server.worker.db = InMemoryDatabase()
+    trip = {**TRIP, "duration": 14, "budget": 90000}
+
+    async def run():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            created = await http.post("/api/itinerary/generate", json=trip)
+            path = f"/api/itinerary/{created.json()['id']}"
+            results = {}
+            for encoding in ("identity", "gzip", "br"):
+                headers = {"Accept-Encoding": encoding}
+                await http.get(path, headers=headers)  # stores the compressed variant
+                samples = []
+                for _ in range(iterations):
+                    started = time.perf_counter()
+                    response = await http.get(path, headers=headers)
+                    samples.append(time.perf_counter() - started)
+                results[encoding] = (int(response.headers["content-length"]), statistics.median(samples), percentile(samples, 99))
+            return len(created.content), results
+
+    body_bytes, results = asyncio.run(run())
+    body = json.dumps(server.build_template_itinerary(server.TripRequest(**trip))).encode()
+    on_the_fly = {encoding: time_per_call(lambda: server.compress_body(body, encoding), 50)
+                  for encoding in server.COMPRESSION_LEVELS if encoding != "br" or server.brotli}
+    report = {"json_bytes": body_bytes}
+    for encoding, (size, p50, p99) in results.items():
+        report[f"{encoding}_bytes"] = size
+        report[f"{encoding}_get_p50_ms"] = round(p50 * 1000, 3)
+        report[f"{encoding}_get_p99_ms"] = round(p99 * 1000, 3)
+    for encoding, cost in on_the_fly.items():
+        report[f"{encoding}_on_the_fly_compress_ms"] = round(cost * 1000, 3)
+    report["passed"] = results["gzip"][0] < body_bytes / 4
+    return report
+
+
+# Jaipur sights, listed in a deliberately zig-zag order
+SIGHTS = [
+    ("amber_fort", 26.9855, 75.8513), ("hawa_mahal", 26.9239, 75.8267), ("jal_mahal", 26.9535, 75.8462),
+    ("city_palace", 26.9258, 75.8237), ("nahargarh", 26.9373, 75.8155), ("albert_hall", 26.9116, 75.8195),
+    ("jantar_mantar", 26.9248, 75.8246), ("birla_mandir", 26.8921, 75.8155)
+]
+
+
+def bench_routing(iterations=200):
+    """Route-aware day: travel-time matrix lookups plus nearest-neighbour/2-opt ordering (target: a few ms)"""
+    server.worker.db = InMemoryDatabase()
+    activities = [{"activity": f"Visit {name}", "place_id": name, "lat": lat, "lng": lng,
+                   "time": "9:00 AM", "duration": "1-2 hours"} for name, lat, lng in SIGHTS]
+
+    def route_seconds(stops):
+        return sum(server.estimate_travel_seconds(a, b) for a, b in zip(stops, stops[1:]))
+
+    async def run():
+        started = time.perf_counter()
+        await server.route_activities(activities)  # cold: fills the matrix and persists it
+        cold = time.perf_counter() - started
+        await asyncio.sleep(0)  # let the background write finish
+        started = time.perf_counter()
+        for _ in range(iterations):
+            routed = await server.route_activities(activities)
+        return cold, (time.perf_counter() - started) / iterations, routed
+
+    cold, warm, routed = asyncio.run(run())
+    stored = len(server.worker.db.travel_times.documents)
+    return {
+        "stops": len(activities),
+        "cold_ms": round(cold * 1000, 3),
+        "warm_ms": round(warm * 1000, 3),
+        "pairs_stored_in_mongo": stored,
+        "travel_minutes_listed_order": round(route_seconds(activities) / 60),
+        "travel_minutes_routed": round(route_seconds(routed) / 60),
+        "day_ends_at": routed[-1]["time"],
+        "passed": warm < 0.005 and route_seconds(routed) < route_seconds(activities)
+    }
+
+
+class FakeModelChat:
+    """Stand-in for LlmChat whose latency grows with the number of days requested"""
+
+    def __init__(self, name, seconds_per_day, days, served):
+        self.name, self.seconds_per_day, self.days, self.served = name, seconds_per_day, days, served
+
+    async def send_message(self, message):
+        await asyncio.sleep(self.seconds_per_day * self.days * random.uniform(0.8, 1.3))
+        self.served[self.name] = self.served.get(self.name, 0) + 1
+        return json.dumps({"days": [{"day": day} for day in range(1, self.days + 1)]})
+
+
+def bench_llm_routing(requests=300, deadline=0.25):
+    """Model routing under a p95 deadline while the mid-size model degrades (time scaled 1:100)"""
+    server.LLM_MIN_ATTEMPT_SECONDS = 0.01
+    router = server.ModelRouter(["gpt-4o", "gpt-4o-mini", "gpt-4.1-nano"])
+    speeds = {"gpt-4o": 0.025, "gpt-4o-mini": 0.015, "gpt-4.1-nano": 0.008}
+    for model in router.models:
+        model.seconds_per_day, model.deviation = speeds[model.name], speeds[model.name] / 4
+    served, latencies, failures = {}, [], 0
+    trip = {"days": 1}
+
+    async def run():
+        nonlocal failures
+        for index in range(requests):
+            trip["days"] = random.choice([2, 3, 3, 5, 7, 10, 14])
+            preference_chars = 300 if index % 5 == 0 else 20
+            if index == requests // 3:
+                speeds["gpt-4o-mini"] = 0.06  # the mid-size model slows to 4x
+            started = time.perf_counter()
+            try:
+                await router.complete("p" * 4000, trip["days"], preference_chars, time.monotonic() + deadline)
+            except server.LlmUnavailableError:
+                failures += 1
+            latencies.append(time.perf_counter() - started)
+
+    original_chat = server.get_llm_chat
+    server.get_llm_chat = lambda name, provider="openai": FakeModelChat(name, speeds[name], trip["days"], served)
+    random.seed(7)
+    try:
+        asyncio.run(run())
+    finally:
+        server.get_llm_chat = original_chat
+    p95 = percentile(latencies, 95)
+    return {
+        "requests": requests,
+        "deadline_ms": deadline * 1000,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(p95 * 1000, 1),
+        "served_by": served,
+        "fell_through_to_cache_or_template": failures,
+        "estimated_cost_usd": {name: round(value, 4) for (name,), value in server.llm_cost_usd_total.values.items()},
+        "passed": p95 <= deadline and failures / requests < 0.05
+    }
+
+class LegacyDay(BaseModel):
+    """ItineraryDay as it was before activities, meals and accommodation were typed"""
+    day: int
+    activities: List[dict]
+    accommodation: dict
+    meals: List[dict]
+    estimated_cost: int
+    safety_tips: List[str]
+
+
+class LegacyItinerary(server.Itinerary):
+    days: List[LegacyDay]
+
+
+def bench_models(iterations=200):
+    """Validation and serialization per 30-day itinerary: untyped days vs typed models with the trusted path"""
+    request = server.TripRequest(**{**TRIP, "duration": 30, "budget": 150000})
+    template = server.build_template_itinerary(request)
+    document = {
+        "id": "bench", "destination": request.destination, "budget": request.budget, "duration": 30,
+        "theme": request.theme, "travel_mode": request.travel_mode, "period_friendly": True,
+        "days": template["days"], "total_cost": template["total_cost"],
+        "community_impact": server.calculate_community_impact(template, request.budget),
+        "safety_score": 90, "created_at": "2026-10-19T08:00:00+00:00", "version": 1, "status": "template"
+    }
+
+    def legacy_response():
+        # What FastAPI did for response_model=Itinerary: dump, validate again, then encode
+        itinerary = LegacyItinerary(**document)
+        checked = LegacyItinerary.model_validate(itinerary.model_dump())
+        return json.dumps(checked.model_dump(mode="json")).encode()
+
+    legacy = LegacyItinerary(**document)
+    trusted = server.Itinerary.trusted(document)
+    costs = {
+        "before_validate": time_per_call(lambda: LegacyItinerary(**document), iterations),
+        "before_serialize": time_per_call(legacy.model_dump_json, iterations),
+        "before_response": time_per_call(legacy_response, iterations),
+        "after_full_validate": time_per_call(lambda: server.Itinerary(**document), iterations),
+        "after_trusted_validate": time_per_call(lambda: server.Itinerary.trusted(document), iterations),
+        "after_serialize": time_per_call(trusted.model_dump_json, iterations),
+        "after_response": time_per_call(lambda: server.Itinerary.trusted(document).model_dump_json().encode(), iterations)
+    }
+    same = json.loads(server.Itinerary.trusted(document).model_dump_json()) == json.loads(legacy.model_dump_json())
+    return {
+        **{f"{name}_ms": round(cost * 1000, 3) for name, cost in costs.items()},
+        "response_speedup": round(costs["before_response"] / costs["after_response"], 1),
+        "same_json": same,
+        "passed": same and costs["after_response"] < costs["before_response"] / 2
+    }
+
+def places_search_payload(query, results=20):
+    """A Places text search response with the fields Google returns for each result"""
+    rng = random.Random(query)
+    return {"html_attributions": [], "status": "OK", "next_page_token": "token-" + "x" * 300, "results": [{
+        "business_status": "OPERATIONAL",
+        "formatted_address": f"{rng.randint(1, 200)}, Main Road, {query.split(' in ')[-1]}, Rajasthan 302001, India",
+        "geometry": {"location": {"lat": 26.9 + rng.random() / 10, "lng": 75.8 + rng.random() / 10},
+                     "viewport": {"northeast": {"lat": 26.95, "lng": 75.85}, "southwest": {"lat": 26.91, "lng": 75.81}}},
+        "icon": "https://maps.gstatic.com/mapfiles/place_api/icons/v1/png_71/generic_business-71.png",
+        "icon_background_color": "#7B9EB0",
+        "icon_mask_base_uri": "https://maps.gstatic.com/mapfiles/place_api/icons/v2/generic_pinlet",
+        "name": f"{query.split(' in ')[0].title()} {i + 1}",
+        "opening_hours": {"open_now": True},
+        "photos": [{"height": 3024, "width": 4032, "photo_reference": "Aap_uE" + "x" * 400,
+                    "html_attributions": ['<a href="https://maps.google.com/maps/contrib/1">A Google User</a>']}],
+        "place_id": f"ChIJ{zlib.crc32(query.encode()):010d}{i:02d}",
+        "plus_code": {"compound_code": "WRGF+5Q Jaipur, Rajasthan", "global_code": "7JRQWRGF+5Q"},
+        "price_level": rng.randint(1, 4),
+        "rating": round(rng.uniform(3.2, 4.9), 1),
+        "reference": f"ChIJ{zlib.crc32(query.encode()):010d}{i:02d}",
+        "types": ["lodging", "point_of_interest", "establishment"],
+        "user_ratings_total": rng.randint(10, 5000)
+    } for i in range(results)]}
+
+
+def place_details_payload(place_id):
+    """A Place Details response for the fields get_real_accommodations asks for"""
+    rng = random.Random(place_id)
+    return {"html_attributions": [], "status": "OK", "result": {
+        "name": f"Hotel {place_id[-6:]}",
+        "formatted_address": "12, Station Road, Jaipur, Rajasthan 302006, India",
+        "rating": round(rng.uniform(3.5, 4.9), 1),
+        "price_level": rng.randint(1, 3),
+        "types": ["lodging", "hotel", "point_of_interest", "establishment"],
+        "opening_hours": {"open_now": True, "weekday_text": [f"Day {day}: Open 24 hours" for day in range(7)]},
+        "photos": [{"height": 3024, "width": 4032, "photo_reference": "Aap_uE" + "x" * 400,
+                    "html_attributions": []} for _ in range(10)],
+        "reviews": [{"author_name": "Traveller", "rating": 5, "relative_time_description": "a month ago",
+                     "text": "Safe and clean, helpful staff, well lit street. " * 8, "time": 1700000000}
+                    for _ in range(5)]
+    }}
+
+
+def bench_places_memory(destinations=50):
+    """Places cache memory per destination: raw API results vs compact place records"""
+    import tracemalloc
+
+    def destination_payloads(destination):
+        # What get_real_travel_data fetches per destination: three searches plus details for five hotels
+        payloads = {}
+        for query in (f"hotels in {destination}", f"restaurant in {destination}",
+                      f"historical places monuments in {destination}"):
+            payloads[query] = places_search_payload(query)
+        for place in payloads[f"hotels in {destination}"]["results"][:5]:
+            payloads[place["place_id"]] = place_details_payload(place["place_id"])
+        return payloads
+
+    def to_records(payload):
+        if "results" in payload:
+            return [server.Place.from_result(place) for place in payload["results"]]
+        return [server.Place.from_result(payload["result"])]
+
+    def measure(compact):
+        encoded = json.dumps([destination_payloads(f"City {index}") for index in range(destinations)])
+        tracemalloc.start()
+        decoded = json.loads(encoded)  # freshly decoded responses, as the upstream call returns them
+        held = [{key: to_records(payload) for key, payload in payloads.items()} for payloads in decoded] if compact else decoded
+        del decoded
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        shared_bytes = sum(len(json.dumps(value, separators=(",", ":"))) for entries in held for value in entries.values())
+        return current / destinations, shared_bytes / destinations
+
+    raw_memory, raw_shared = measure(compact=False)
+    compact_memory, compact_shared = measure(compact=True)
+    return {
+        "destinations": destinations,
+        "raw_kb_per_destination": round(raw_memory / 1024, 1),
+        "records_kb_per_destination": round(compact_memory / 1024, 1),
+        "raw_shared_cache_kb_per_destination": round(raw_shared / 1024, 1),
+        "records_shared_cache_kb_per_destination": round(compact_shared / 1024, 1),
+        "memory_reduction": round(raw_memory / compact_memory, 1),
+        "passed": compact_memory < raw_memory / 5
+    }
+
+def bench_dedup(itineraries=300, distinct_trips=30):
+    """Itinerary storage with content-addressed bodies: 300 itineraries over 30 distinct trips"""
+    destinations = ["Jaipur, Rajasthan", "Goa", "Varanasi", "Udaipur, Rajasthan", "Rishikesh"]
+    trips = [{**TRIP, "destination": destinations[index % 5], "theme": ["heritage", "spiritual", "culinary"][index // 5 % 3],
+              "duration": 3 + index // 15} for index in range(distinct_trips)]
+
+    def stored_bytes(database):
+        return sum(len(json.dumps(document, default=str)) for collection in database.collections.values()
+                   for document in collection.documents)
+
+    async def run(dedup):
+        server.ITINERARY_DEDUP_ENABLED = dedup
+        server.worker.db = database = InMemoryDatabase()
+        for cache in (server.template_cache, server.itinerary_body_cache):
+            cache.local.clear()
+        writes = {"count": 0, "bytes": 0}
+        for collection in ("itineraries", "itinerary_bodies"):
+            target = getattr(database, collection)
+            insert_one, update_one = target.insert_one, target.update_one
+
+            async def counted_insert(document, insert_one=insert_one):
+                writes["count"] += 1
+                writes["bytes"] += len(json.dumps(document, default=str))
+                return await insert_one(document)
+
+            async def counted_update(query, update, upsert=False, update_one=update_one):
+                writes["count"] += 1
+                writes["bytes"] += len(json.dumps([query, update], default=str))
+                return await update_one(query, update, upsert=upsert)
+
+            target.insert_one, target.update_one = counted_insert, counted_update
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            started = time.perf_counter()
+            for index in range(itineraries):
+                response = await http.post("/api/itinerary/generate", json=trips[index % distinct_trips])
+                assert response.status_code == 200, response.text
+            elapsed = time.perf_counter() - started
+            # Reassembly from the stored record and body must give back the generated document
+            server.itinerary_cache.local.clear()
+            stored = await http.get(f"/api/itinerary/{response.json()['id']}")
+            assert stored.json() == response.json()
+        return stored_bytes(database), writes, elapsed / itineraries
+
+    enrichment, server.ENRICHMENT_ENABLED = server.ENRICHMENT_ENABLED, False
+    original = server.ITINERARY_DEDUP_ENABLED
+    try:
+        plain_bytes, plain_writes, plain_latency = asyncio.run(run(False))
+        dedup_bytes, dedup_writes, dedup_latency = asyncio.run(run(True))
+    finally:
+        server.ITINERARY_DEDUP_ENABLED, server.ENRICHMENT_ENABLED = original, enrichment
+    return {
+        "duplicate_rate": 1 - distinct_trips / itineraries,
+        "stored_kb_before": round(plain_bytes / 1024, 1),
+        "stored_kb_after": round(dedup_bytes / 1024, 1),
+        "write_ops_before": plain_writes["count"],
+        "write_ops_after": dedup_writes["count"],
+        "written_kb_before": round(plain_writes["bytes"] / 1024, 1),
+        "written_kb_after": round(dedup_writes["bytes"] / 1024, 1),
+        "generate_ms_before": round(plain_latency * 1000, 3),
+        "generate_ms_after": round(dedup_latency * 1000, 3),
+        "passed": dedup_bytes < plain_bytes / 3 and dedup_writes["bytes"] < plain_writes["bytes"] / 3
+    }
+
+class FakePlacesClient:
+    """googlemaps.Client stand-in returning full-size Places payloads after a fixed latency"""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def places(self, query=None, type=None):
+        time.sleep(self.latency)
+        return places_search_payload(query)
+
+    def place(self, place_id, fields=None):
+        time.sleep(self.latency)
+        return place_details_payload(place_id)
+
+
+class FakeItineraryChat:
+    """LlmChat stand-in answering with a full itinerary for the trip in the prompt"""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    async def send_message(self, message):
+        await asyncio.sleep(self.latency)
+        days = int(message.text.split("Generate ")[1].split(" days")[0])
+        return json.dumps(server.build_template_itinerary(server.TripRequest(**{**TRIP, "duration": days})))
+
+
+def bench_replay(trips=4, places_latency=0.05, llm_latency=0.3):
+    """Full real-data pipeline (Places + LLM) recorded once, then replayed offline and deterministically"""
+    requests = [server.TripRequest(**{**TRIP, "destination": destination, "duration": 3 + index})
+                for index, destination in enumerate(["Jaipur, Rajasthan", "Goa", "Varanasi", "Udaipur, Rajasthan"][:trips])]
+    directory = Path(tempfile.mkdtemp())
+    saved = {name: getattr(server, name) for name in (
+        "UPSTREAM_MODE", "GOOGLE_PLACES_ENABLED", "REPLAY_LATENCY_SCALE", "places_recordings", "llm_recordings",
+        "get_gmaps", "get_llm_chat", "places_scheduler")}
+    server.worker.db = InMemoryDatabase()
+    server.GOOGLE_PLACES_ENABLED = True
+    # Keep the Places quota out of the timings
+    server.places_scheduler = server.QuotaScheduler(10000, burst=10000, classes=server.QUOTA_CLASSES)
+    for name in ("places", "llm"):
+        recordings = server.UpstreamRecordings(name)
+        recordings.path = directory / f"{name}.jsonl.gz"
+        setattr(server, f"{name}_recordings", recordings)
+
+    async def pipeline():
+        for cache in (server.places_cache, server.llm_cache, server.llm_trip_cache, server.travel_time_cache):
+            cache.local.clear()
+        started = time.perf_counter()
+        results = []
+        for request in requests:
+            real_data = await server.get_real_travel_data(request.destination, request.budget, request.duration,
+                                                          request.theme, True)
+            results.append((real_data, await server.generate_llm_itinerary_data(request, real_data)))
+        return time.perf_counter() - started, json.dumps(results, sort_keys=True)
+
+    try:
+        server.UPSTREAM_MODE = "record"
+        recording_client = server.RecordingClient(FakePlacesClient(places_latency), server.places_recordings)
+        server.get_gmaps = lambda: recording_client
+        server.get_llm_chat = lambda model="gpt-4o-mini", provider="openai": server.RecordingLlmChat(
+            FakeItineraryChat(llm_latency), server.llm_recordings, model)
+        recorded_seconds, recorded = asyncio.run(pipeline())
+
+        server.UPSTREAM_MODE = "replay"
+        server.get_gmaps, server.get_llm_chat = saved["get_gmaps"], saved["get_llm_chat"]
+        server.get_gmaps.cache_clear()
+        replayed_seconds, replayed = asyncio.run(pipeline())
+        server.REPLAY_LATENCY_SCALE = 0
+        instant_seconds, instant = asyncio.run(pipeline())
+    finally:
+        for name, value in saved.items():
+            setattr(server, name, value)
+        server.get_gmaps.cache_clear()
+    store_bytes = sum(path.stat().st_size for path in directory.iterdir())
+    raw_bytes = sum(len(gzip.open(path).read()) for path in directory.iterdir())
+    misses = sum(count for (upstream, result), count in server.upstream_recordings_total.values.items() if result == "miss")
+    return {
+        "trips": trips,
+        "recorded_kb": round(raw_bytes / 1024, 1),
+        "store_kb": round(store_bytes / 1024, 1),
+        "record_s": round(recorded_seconds, 3),
+        "replay_recorded_latency_s": round(replayed_seconds, 3),
+        "replay_no_latency_s": round(instant_seconds, 3),
+        "replay_misses": misses,
+        "deterministic": recorded == replayed == instant,
+        "passed": recorded == replayed == instant and misses == 0
+    }
+
+class FakeWebSocket:
+    """Starlette WebSocket stand-in recording what is sent; a send_delay makes it a slow consumer"""
+
+    def __init__(self, send_delay=0.0):
+        self.send_delay = send_delay
+        self.incoming = asyncio.Queue()
+        self.sent = []
+        self.close_code = None
+
+    async def accept(self):
+        pass
+
+    async def receive_json(self):
+        message = await self.incoming.get()
+        if message is None:
+            raise server.WebSocketDisconnect(1000)
+        return message
+
+    async def send_text(self, text):
+        await asyncio.sleep(self.send_delay)
+        self.sent.append(text)
+
+    async def close(self, code=1000, reason=None):
+        self.close_code = code
+
+
+class EnrichedChat(FakeItineraryChat):
+    """FakeItineraryChat whose activities differ from the template, as a real enrichment's would"""
+
+    async def send_message(self, message):
+        if "Generate " not in message.text:  # a single-day regeneration prompt
+            await asyncio.sleep(self.latency)
+            day = server.build_template_itinerary(server.TripRequest(**TRIP))["days"][1]
+            for activity in day["activities"]:
+                activity["description"] = f"Regenerated: {activity['description']}"
+            return json.dumps(day)
+        itinerary = json.loads(await super().send_message(message))
+        for day in itinerary["days"]:
+            for activity in day["activities"]:
+                activity["description"] = f"Enriched: {activity['description']}"
+        return json.dumps(itinerary)
+
+
+def apply_delta(itinerary, changes):
+    for key, value in changes.items():
+        if key.startswith("days."):
+            itinerary["days"][int(key[5:])] = value
+        else:
+            itinerary[key] = value
+
+
+def bench_live_updates(itineraries=20, slow_events=200):
+    """One WebSocket following 20 itineraries through enrichment and a day edit, versus full-document long polls"""
+    saved = {name: getattr(server, name) for name in (
+        "ENRICHMENT_ENABLED", "get_llm_chat", "refresh_itinerary_cache", "WS_SEND_TIMEOUT_SECONDS", "WS_SEND_QUEUE_SIZE")}
+    saved_key = os.environ.get("EMERGENT_LLM_KEY")
+    full_bytes = []
+
+    def counted_refresh(itinerary):
+        body = saved["refresh_itinerary_cache"](itinerary)
+        full_bytes.append(len(body))  # what a long-poll client re-downloads for this version
+        return body
+
+    async def follow():
+        server.worker.db = InMemoryDatabase()
+        websocket = FakeWebSocket()
+        connection = server.ItinerarySocket(websocket)
+        running = asyncio.create_task(connection.run())
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            started = time.perf_counter()
+            generated = {}
+            for index in range(itineraries):
+                response = await http.post("/api/itinerary/generate", json={**TRIP, "duration": 3 + index % 3})
+                generated[response.json()["id"]] = response.json()
+                websocket.incoming.put_nowait({"op": "subscribe", "id": response.json()["id"], "after_version": 1})
+            while server.pending_enrichments:
+                await asyncio.sleep(0.01)
+            for itinerary_id in generated:
+                await http.post(f"/api/itinerary/{itinerary_id}/days/2/regenerate")
+            deadline = time.monotonic() + 30
+            while time.monotonic() < deadline:
+                versions = {event["id"]: event["version"] for event in map(json.loads, websocket.sent) if "version" in event}
+                if sum(version == 3 for version in versions.values()) == itineraries:
+                    break
+                await asyncio.sleep(0.01)
+            elapsed = time.perf_counter() - started
+            websocket.incoming.put_nowait(None)
+            await running
+            server.itinerary_cache.local.clear()
+            final = {itinerary_id: (await http.get(f"/api/itinerary/{itinerary_id}")).json() for itinerary_id in generated}
+        events = [json.loads(text) for text in websocket.sent]
+        for event in events:
+            if event["type"] == "itinerary":  # subscribed after the version was written: sent whole
+                generated[event["id"]] = event["itinerary"]
+            elif event["type"] == "delta":
+                apply_delta(generated[event["id"]], event["changes"])
+        return events, websocket.sent, generated == final, elapsed
+
+    async def slow_consumer():
+        server.WS_SEND_TIMEOUT_SECONDS, server.WS_SEND_QUEUE_SIZE = 0.05, 16
+        websocket = FakeWebSocket(send_delay=1)
+        connection = server.ItinerarySocket(websocket)
+        running = asyncio.create_task(connection.run())
+        await asyncio.sleep(0)
+        started = time.perf_counter()
+        dropped = sum(not connection.offer({"type": "progress", "id": "slow", "stage": "data_fetched"})
+                      for _ in range(slow_events))
+        await running
+        return dropped, connection.queue.qsize(), websocket.close_code, time.perf_counter() - started
+
+    try:
+        os.environ["EMERGENT_LLM_KEY"] = "bench"
+        server.ENRICHMENT_ENABLED = True
+        server.get_llm_chat = lambda *model: EnrichedChat(0.02)
+        server.refresh_itinerary_cache = counted_refresh
+        events, sent, consistent, elapsed = asyncio.run(follow())
+        dropped, queued, close_code, close_seconds = asyncio.run(slow_consumer())
+    finally:
+        for name, value in saved.items():
+            setattr(server, name, value)
+        if saved_key is None:
+            os.environ.pop("EMERGENT_LLM_KEY", None)
+        else:
+            os.environ["EMERGENT_LLM_KEY"] = saved_key
+    # Enrichment replaces every day, so its delta is close to the full document; day edits are where deltas pay off
+    delta_bytes = {version: sum(len(text) for text, event in zip(sent, events)
+                                if event["type"] in ("itinerary", "delta") and event["version"] == version)
+                   for version in (2, 3)}
+    enrichment_bytes, edit_bytes = sum(full_bytes[:itineraries]), sum(full_bytes[itineraries:])
+    return {
+        "itineraries": itineraries,
+        "versions_pushed": len(full_bytes),
+        "progress_events": sum(event["type"] == "progress" for event in events),
+        "enrichment_long_poll_kb": round(enrichment_bytes / 1024, 1),
+        "enrichment_pushed_kb": round(delta_bytes[2] / 1024, 1),
+        "edit_long_poll_kb": round(edit_bytes / 1024, 1),
+        "edit_delta_kb": round(delta_bytes[3] / 1024, 1),
+        "deltas_reproduce_documents": consistent,
+        "follow_s": round(elapsed, 3),
+        "slow_consumer_dropped": dropped,
+        "slow_consumer_max_queued": queued,
+        "slow_consumer_close_code": close_code,
+        "slow_consumer_closed_after_s": round(close_seconds, 3),
+        "passed": consistent and delta_bytes[2] <= enrichment_bytes and delta_bytes[3] < edit_bytes / 2 and dropped > 0
+                  and queued <= 16 and close_code == server.WS_CLOSE_TRY_AGAIN
+    }
+
+BENCHMARKS = {
+    "metrics": bench_metrics,
+    "quota": bench_quota,
+    "rate_limit": bench_rate_limit,
+    "shared_cache": bench_shared_cache,
+    "compression": bench_compression,
+    "routing": bench_routing,
+    "llm_routing": bench_llm_routing,
+    "models": bench_models,
+    "places_memory": bench_places_memory,
+    "dedup": bench_dedup,
+    "replay": bench_replay,
+    "live_updates": bench_live_updates
+}
+
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    print("🚀 Sanskriti backend micro-benchmarks")
+    results = {}
+    for name in names:
+        print(f"\n⏱️  {name}: {BENCHMARKS[name].__doc__}")
+        results[name] = BENCHMARKS[name]()
+        for key, value in results[name].items():
+            print(f"   {key}: {value}")
+        print("✅ Passed" if results[name].get("passed", True) else "❌ Failed")
+
+    Path("bench_output.json").write_text(json.dumps(results, indent=2))
+    return 0 if all(result.get("passed", True) for result in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -56,6 +56,15 @@ class SanskritiAPITester:
             200
         )
 
+    def test_health_endpoints(self):
+        """Test liveness and readiness probes"""
+        self.run_test("Liveness Probe", "GET", "health/live", 200)
+        success, response = self.run_test("Readiness Probe", "GET", "health/ready", 200)
+        if success and isinstance(response, dict):
+            for check, result in response.get('checks', {}).items():
+                print(f"   {check}: {'✅' if result.get('ok') else '❌'} {result}")
+        return success, response
+
     def test_community_hosts(self):
         """Test community hosts endpoint"""
         return self.run_test(
@@ -190,6 +199,36 @@ class SanskritiAPITester:
             200
         )
 
+    def test_itinerary_updates(self, itinerary_id):
+        """Test the long-poll endpoint for newer itinerary versions"""
+        success, response = self.run_test(
+            "Itinerary Updates (long poll)",
+            "GET",
+            f"itinerary/{itinerary_id}/updates?after_version=0&timeout=5",
+            200
+        )
+        if success and isinstance(response, dict):
+            print(f"   Version {response.get('version')}, status: {response.get('status')}")
+        return success, response
+
+    def test_day_regeneration(self, itinerary_id):
+        """Test regenerating a single day of an existing itinerary"""
+        success, response = self.run_test(
+            "Regenerate Day 1",
+            "POST",
+            f"itinerary/{itinerary_id}/days/1/regenerate",
+            200,
+            data={"special_preferences": "vegetarian food"}
+        )
+        if success and isinstance(response, dict):
+            days = response.get('days', [])
+            if days and days[0].get('day') == 1 and response.get('id') == itinerary_id:
+                print(f"   Day 1 now has {len(days[0].get('activities', []))} activities, total cost ₹{response.get('total_cost')}")
+            else:
+                print(f"❌ Regenerated itinerary is missing day 1 or has a different id")
+                return False, response
+        return success, response
+
     def test_ai_content_quality(self):
         """Test AI content quality with different themes and scenarios"""
         test_scenarios = [
@@ -280,6 +319,9 @@ def main():
     # Test 2: Community hosts
     tester.test_community_hosts()
     
+    # Test 2b: Health probes
+    tester.test_health_endpoints()
+    
     # Test 3: CRITICAL - Valid itinerary generation (main functionality)
     print(f"\n{'='*60}")
     print(f"🔥 CRITICAL TEST: AI ITINERARY GENERATION")
@@ -293,6 +335,8 @@ def main():
     # Test 4: Retrieve generated itinerary (if we got an ID)
     if itinerary_id:
         tester.test_itinerary_retrieval(itinerary_id)
+        tester.test_itinerary_updates(itinerary_id)
+        tester.test_day_regeneration(itinerary_id)
     else:
         print("\n⚠️  Skipping itinerary retrieval test - no valid ID from generation")
     
@@ -1,6 +1,7 @@
 import AIAdvisor from "./components/AIAdvisor";
 import WeatherInfo from "./components/WeatherInfo";
 import useAdaptiveBudget from "./hooks/useAdaptiveBudget";
+import useLiveItinerary from "./hooks/useLiveItinerary";
 import React, { useState, useEffect } from "react";
 import "./App.css";
 import { BrowserRouter, Routes, Route } from "react-router-dom";
@@ -125,6 +126,8 @@ const TripPlanner = () => {
 
   const [itinerary, setItinerary] = useState(null);
   const [loading, setLoading] = useState(false);
+  // The template itinerary is shown at once; enrichment and edits arrive as deltas over the live socket
+  useLiveItinerary(BACKEND_URL, itinerary, setItinerary);
 
   const indianDestinations = [
     "Jaipur, Rajasthan", "Goa", "Kerala", "Rishikesh, Uttarakhand",
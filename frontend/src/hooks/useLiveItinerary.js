@@ -0,0 +1,52 @@
+import { useEffect, useState } from "react";
+
+/**
+ * Custom hook: follows an itinerary over the backend's live WebSocket while it is being enriched.
+ * Applies version deltas (and the background enrichment) as they arrive instead of polling.
+ * Template and "unsaved" itineraries (served under overload) get no enrichment, so they are not followed.
+ */
+export default function useLiveItinerary(backendUrl, itinerary, setItinerary) {
+  const [stage, setStage] = useState(null);
+  const itineraryId = itinerary?.id;
+  const enriching = itinerary?.status === "enriching";
+
+  useEffect(() => {
+    if (!itineraryId || !enriching) return;
+
+    const base = backendUrl || window.location.origin;
+    const socket = new WebSocket(`${base.replace(/^http/, "ws")}/api/itinerary/live`);
+
+    socket.onopen = () => {
+      socket.send(JSON.stringify({ op: "subscribe", id: itineraryId, after_version: itinerary.version }));
+    };
+
+    socket.onmessage = (message) => {
+      const event = JSON.parse(message.data);
+      if (event.type === "ping") {
+        socket.send(JSON.stringify({ op: "pong" }));
+      } else if (event.type === "progress") {
+        setStage(event.stage);
+      } else if (event.type === "itinerary") {
+        setItinerary(event.itinerary);
+      } else if (event.type === "delta") {
+        setItinerary((current) => {
+          const updated = { ...current, days: [...current.days] };
+          Object.entries(event.changes).forEach(([key, value]) => {
+            if (key.startsWith("days.")) {
+              updated.days[Number(key.slice(5))] = value;
+            } else {
+              updated[key] = value;
+            }
+          });
+          return updated;
+        });
+      }
+    };
+
+    return () => socket.close();
+    // Reconnect only when following a different itinerary, not on every applied delta or status change
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [backendUrl, itineraryId]);
+
+  return stage;
+}
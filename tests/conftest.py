@@ -0,0 +1,51 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Tests run in-process against backend/server.py, with the benchmark's in-memory Mongo stand-in
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("WARMUP_ENABLED", "false")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "sanskriti_test")
+
+from fastapi.testclient import TestClient
+
+import server
+from backend_benchmark import InMemoryDatabase
+
+
+@pytest.fixture
+def trip():
+    return {"destination": "Goa", "budget": 30000, "duration": 3, "theme": "culinary"}
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """A fresh in-memory database, with the LLM and background enrichment off so itineraries come from templates"""
+    database = InMemoryDatabase()
+    server.worker.db = database
+    monkeypatch.delenv("EMERGENT_LLM_KEY", raising=False)
+    monkeypatch.setattr(server, "ENRICHMENT_ENABLED", False)
+    return database
+
+
+@pytest.fixture
+def client(db):
+    with TestClient(server.app) as test_client:
+        yield test_client
+    for cache in server.TieredCache.instances:
+        cache.reset_local()
+
+
+@pytest.fixture
+def uncached():
+    """Call to forget this worker's cached itineraries, so the next read goes to the database"""
+    def clear():
+        server.itinerary_cache.local.clear()
+        server.itinerary_body_cache.local.clear()
+    return clear
@@ -0,0 +1,81 @@
+import asyncio
+import time
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def overloaded(monkeypatch):
+    """Admission control with no room left, so every generate takes the overload path"""
+    monkeypatch.setattr(server, "generate_limiter", server.AdaptiveConcurrencyLimiter("generate", 0, 0, 1, 1))
+
+
+def test_adaptive_limiter_sheds_and_backs_off():
+    limiter = server.AdaptiveConcurrencyLimiter("test", 2, 1, 10, target_latency=0.1)
+    assert limiter.try_acquire() and limiter.try_acquire()
+    assert not limiter.try_acquire()
+    assert limiter.stats()["shed"] == 1
+    limiter.release(1.0, True)
+    assert limiter.limit < 2
+    assert limiter.retry_after() >= 1
+    limiter.release(0.01, True)
+    assert limiter.in_flight == 0
+
+
+def test_adaptive_limiter_grows_only_while_used():
+    limiter = server.AdaptiveConcurrencyLimiter("test", 4, 1, 10, target_latency=1)
+    for _ in range(20):
+        limiter.try_acquire()
+        limiter.release(0.01, True)  # one request in flight out of a limit of 4
+    assert limiter.limit == 4
+    for _ in range(4):
+        limiter.try_acquire()
+    limiter.release(0.01, True)
+    assert limiter.limit > 4
+
+
+def test_degraded_itineraries_are_stored_in_the_background(client, db, trip, overloaded, monkeypatch):
+    monkeypatch.setattr(server, "ADMISSION_OVERLOAD_MODE", "degrade")
+    response = client.post("/api/itinerary/generate", json=trip)
+    assert response.status_code == 200
+    assert response.headers["X-Sanskriti-Degraded"] == "overload"
+    itinerary = response.json()
+    assert itinerary["status"] == "template"
+    deadline = time.monotonic() + 2
+    while not db.itineraries.documents and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert client.get(f"/api/itinerary/{itinerary['id']}").json() == itinerary
+
+
+def test_degraded_itineraries_are_marked_unsaved_when_writes_back_up(client, db, trip, overloaded, monkeypatch):
+    monkeypatch.setattr(server, "ADMISSION_OVERLOAD_MODE", "degrade")
+    monkeypatch.setattr(server, "PENDING_WRITES_MAX", 0)
+    response = client.post("/api/itinerary/generate", json=trip)
+    assert response.status_code == 200
+    assert response.json()["status"] == "unsaved"
+    time.sleep(0.05)
+    assert db.itineraries.documents == []
+
+
+def test_overload_is_rejected_in_reject_mode(client, trip, overloaded, monkeypatch):
+    monkeypatch.setattr(server, "ADMISSION_OVERLOAD_MODE", "reject")
+    response = client.post("/api/itinerary/generate", json=trip)
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_background_writes_are_bounded(monkeypatch):
+    monkeypatch.setattr(server, "PENDING_WRITES_MAX", 2)
+
+    async def write():
+        await asyncio.sleep(0.01)
+
+    async def main():
+        accepted = [server.persist_in_background(write()) for _ in range(4)]
+        await asyncio.gather(*server.pending_writes)
+        return accepted
+
+    assert asyncio.run(main()) == [True, True, False, False]
+    assert server.pending_writes == set()
@@ -0,0 +1,31 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+import server
+
+BACKEND = Path(server.__file__).parent
+
+
+def test_importing_server_builds_no_clients():
+    script = (
+        "import sys, server\n"
+        "assert server.worker.client is None and server.worker._db is None\n"
+        "assert server.worker._executor is None and server.worker._hedge_executor is None\n"
+        "assert 'motor' not in sys.modules and 'googlemaps' not in sys.modules\n"
+    )
+    env = {"MONGO_URL": "mongodb://localhost:1", "DB_NAME": "test", "WARMUP_ENABLED": "false", "PATH": ""}
+    result = subprocess.run([sys.executable, "-c", script], cwd=BACKEND, env={**env, "PYTHONPATH": ":".join(sys.path)},
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+
+
+def test_create_app_builds_an_independent_app(db):
+    app = server.create_app()
+    assert app is not server.app
+    with TestClient(app) as client:
+        assert client.get("/api/health/live").status_code == 200
+        assert client.get("/metrics").status_code == 200
+    assert server.worker._executor is None  # the lifespan shut the pools down again
@@ -0,0 +1,42 @@
+import gzip
+
+import pytest
+
+import server
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip", "gzip"),
+    ("gzip;q=0.5, br", "br" if server.brotli else "gzip"),
+    ("br;q=0.2, gzip;q=0.8", "gzip"),
+    ("gzip;q=0", None),
+    ("identity", None),
+    ("*", "br" if server.brotli else "gzip"),
+    ("gzip;q=oops", None),
+])
+def test_negotiate_encoding(header, expected):
+    assert server.negotiate_encoding(header) == expected
+
+
+def test_itinerary_reads_reuse_the_stored_compressed_variant(client, trip):
+    itinerary_id = client.post("/api/itinerary/generate", json=trip).json()["id"]
+    response = client.get(f"/api/itinerary/{itinerary_id}", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json()["id"] == itinerary_id
+    stored = server.itinerary_cache.get((itinerary_id, "gzip"))
+    assert gzip.decompress(stored) == server.itinerary_cache.get(itinerary_id)
+    assert client.get(f"/api/itinerary/{itinerary_id}", headers={"Accept-Encoding": "identity"}).json()["id"] == itinerary_id
+
+
+def test_small_responses_are_not_compressed(client):
+    response = client.get("/api/health/live", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+def test_generate_responses_are_compressed_on_the_fly(client, trip):
+    response = client.post("/api/itinerary/generate", json=trip, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert int(response.headers["content-length"]) < len(response.content)
@@ -0,0 +1,104 @@
+import pytest
+
+import server
+
+
+def test_body_hash_ignores_key_order():
+    assert server.body_hash({"day": 1, "title": "Arrival"}) == server.body_hash({"title": "Arrival", "day": 1})
+    assert server.body_hash({"day": 1})[0] != server.body_hash({"day": 2})[0]
+
+
+def test_generate_stores_each_day_once(client, db, trip, uncached):
+    created = [client.post("/api/itinerary/generate", json=trip).json() for _ in range(3)]
+    assert len(db.itineraries.documents) == 3
+    assert len(db.itinerary_bodies.documents) == trip["duration"]
+    assert all("days" not in record and len(record["day_hashes"]) == trip["duration"]
+               for record in db.itineraries.documents)
+    uncached()
+    assert client.get(f"/api/itinerary/{created[0]['id']}").json() == created[0]
+
+
+def test_regenerating_a_day_writes_only_that_day(client, db, trip, uncached, monkeypatch):
+    created = client.post("/api/itinerary/generate", json=trip).json()
+    hashes_before = list(db.itineraries.documents[0]["day_hashes"])
+    monkeypatch.setenv("EMERGENT_LLM_KEY", "test-key")
+
+    async def new_day(request, itinerary, day_number, attractions=()):
+        return {**itinerary["days"][day_number - 1], "safety_tips": ["Carry a local SIM"]}, []
+
+    monkeypatch.setattr(server, "generate_llm_day_data", new_day)
+    updates = []
+    update_one = db.itineraries.update_one
+
+    async def recorded_update(query, changes, **kwargs):
+        updates.append(changes)
+        return await update_one(query, changes, **kwargs)
+
+    db.itineraries.update_one = recorded_update
+    regenerated = client.post(f"/api/itinerary/{created['id']}/days/2/regenerate").json()
+    assert regenerated["days"][1]["safety_tips"] == ["Carry a local SIM"]
+    assert set(updates[0]["$set"]) == {"day_hashes.1", "community_impact", "version"}
+    assert len(db.itinerary_bodies.documents) == trip["duration"] + 1  # only the new day was written
+    day_hashes = db.itineraries.documents[0]["day_hashes"]
+    assert (day_hashes[0], day_hashes[2]) == (hashes_before[0], hashes_before[2]) and day_hashes[1] != hashes_before[1]
+    uncached()
+    server.itinerary_body_cache.reset_local()
+    assert client.get(f"/api/itinerary/{created['id']}").json() == regenerated
+
+
+def test_records_stored_before_deduplication_still_load(client, db, trip, uncached):
+    created = client.post("/api/itinerary/generate", json=trip).json()
+    db.itineraries.documents.append({**created, "id": "legacy"})
+    assert client.get("/api/itinerary/legacy").json()["days"] == created["days"]
+    regenerated = client.post("/api/itinerary/legacy/days/1/regenerate").json()
+    record = next(record for record in db.itineraries.documents if record["id"] == "legacy")
+    assert "days" not in record and len(record["day_hashes"]) == trip["duration"]
+    uncached()
+    assert client.get("/api/itinerary/legacy").json() == regenerated
+    assert regenerated["version"] == created["version"] + 1
+
+
+def test_records_with_a_whole_body_still_load(client, db, trip, uncached):
+    created = client.post("/api/itinerary/generate", json=trip).json()
+    db.itinerary_bodies.documents.append(
+        {"hash": "whole", "days": created["days"], "community_impact": created["community_impact"]}
+    )
+    record = {key: value for key, value in created.items() if key not in server.BODY_FIELDS}
+    db.itineraries.documents.append({**record, "id": "whole-body", "body_hash": "whole"})
+    assert client.get("/api/itinerary/whole-body").json()["days"] == created["days"]
+    regenerated = client.post("/api/itinerary/whole-body/days/3/regenerate").json()
+    uncached()
+    assert client.get("/api/itinerary/whole-body").json() == regenerated
+
+
+def test_missing_days_read_as_not_found(client, db, trip, uncached):
+    created = client.post("/api/itinerary/generate", json=trip).json()
+    db.itinerary_bodies.documents.clear()
+    server.itinerary_body_cache.reset_local()
+    uncached()
+    assert client.get(f"/api/itinerary/{created['id']}").status_code == 404
+
+
+@pytest.mark.parametrize("dedup", [True, False])
+def test_regenerate_keeps_an_enrichment_written_meanwhile(client, db, trip, uncached, monkeypatch, dedup):
+    monkeypatch.setattr(server, "ITINERARY_DEDUP_ENABLED", dedup)
+    monkeypatch.setenv("EMERGENT_LLM_KEY", "test-key")
+    created = client.post("/api/itinerary/generate", json=trip).json()
+
+    async def enrich_while_generating(request, itinerary, day_number, attractions=()):
+        stored = await server.assemble_itinerary(await db.itineraries.find_one({"id": created["id"]}))
+        days = [{**day, "notes": "enriched"} for day in stored["days"]]
+        community_impact = {**stored["community_impact"], "women_entrepreneurs_supported": 99}
+        changes = await server.itinerary_body_update(days, community_impact)
+        changes["$set"].update(version=stored["version"] + 1, status="enriched", safety_score=11)
+        await db.itineraries.update_one({"id": created["id"]}, changes)
+        raise RuntimeError("LLM unavailable")
+
+    monkeypatch.setattr(server, "generate_llm_day_data", enrich_while_generating)
+    regenerated = client.post(f"/api/itinerary/{created['id']}/days/2/regenerate").json()
+    assert regenerated["version"] == created["version"] + 2
+    assert (regenerated["status"], regenerated["safety_score"]) == ("enriched", 11)
+    assert [day.get("notes") for day in regenerated["days"]] == ["enriched", None, "enriched"]
+    assert regenerated["community_impact"]["women_entrepreneurs_supported"] == 99
+    uncached()
+    assert client.get(f"/api/itinerary/{created['id']}").json() == regenerated
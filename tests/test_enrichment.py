@@ -0,0 +1,62 @@
+import pytest
+
+import server
+
+
+@pytest.fixture
+def enrichment(monkeypatch):
+    """Enrichment on, with an LLM that never answers so the itinerary stays enriching"""
+    monkeypatch.setattr(server, "ENRICHMENT_ENABLED", True)
+    monkeypatch.setenv("EMERGENT_LLM_KEY", "test-key")
+    scheduled = []
+    monkeypatch.setattr(server, "schedule_enrichment", lambda itinerary, request: scheduled.append(itinerary.id))
+    return scheduled
+
+
+def test_enriching_itineraries_are_stored_before_they_say_so(client, db, trip, enrichment, uncached):
+    created = client.post("/api/itinerary/generate", json=trip).json()
+    assert created["status"] == "enriching"
+    assert enrichment == [created["id"]]
+    assert db.itineraries.documents[0]["status"] == "enriching"
+    uncached()
+    assert client.get(f"/api/itinerary/{created['id']}").json()["status"] == "enriching"
+
+
+def test_unsaved_itineraries_are_not_reported_as_enriching(client, db, trip, enrichment):
+    async def failing_insert(document):
+        raise RuntimeError("primary unavailable")
+
+    db.itineraries.insert_one = failing_insert
+    created = client.post("/api/itinerary/generate", json=trip).json()
+    assert created["status"] == "template"
+    assert enrichment == []
+    assert client.get(f"/api/itinerary/{created['id']}").status_code == 404
+
+
+def test_updates_for_unknown_ids_answer_404_at_once(client):
+    for index in range(5):
+        response = client.get(f"/api/itinerary/unknown-{index}/updates", params={"timeout": 5})
+        assert response.status_code == 404
+        assert response.elapsed.total_seconds() < 1
+    assert server.version_events == {}
+    assert server.version_waiters == {}
+
+
+def test_updates_time_out_without_leaking_waiters(client, trip, monkeypatch):
+    monkeypatch.setattr(server, "ITINERARY_POLL_SECONDS", 0.05)
+    created = client.post("/api/itinerary/generate", json=trip).json()
+    response = client.get(f"/api/itinerary/{created['id']}/updates",
+                          params={"after_version": created["version"], "timeout": 0.2})
+    assert response.status_code == 204
+    assert server.version_events == {}
+    assert server.version_waiters == {}
+
+
+def test_updates_return_a_newer_version(client, trip):
+    created = client.post("/api/itinerary/generate", json=trip).json()
+    client.post(f"/api/itinerary/{created['id']}/days/1/regenerate")
+    response = client.get(f"/api/itinerary/{created['id']}/updates",
+                          params={"after_version": created["version"], "timeout": 1})
+    assert response.status_code == 200
+    assert response.json()["version"] == created["version"] + 1
+
@@ -0,0 +1,66 @@
+import pytest
+
+import server
+
+
+@pytest.fixture
+def readiness_state(monkeypatch):
+    state = {"checked_at": 0.0, "result": None, "task": None}
+    monkeypatch.setattr(server, "readiness_state", state)
+    return state
+
+
+def test_liveness(client):
+    response = client.get("/api/health/live")
+    assert response.status_code == 200
+    assert response.json()["status"] == "alive"
+
+
+def test_readiness_reports_each_check(client, readiness_state):
+    response = client.get("/api/health/ready")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["ready"]
+    assert {"warmup", "mongo", "places", "llm", "executor", "admission", "event_loop"} <= set(body["checks"])
+    assert body["status"] == "degraded"  # no Places or LLM key in the tests
+
+
+def test_readiness_fails_while_mongo_is_down(client, readiness_state, monkeypatch):
+    async def mongo_down():
+        return {"ok": False, "error": "timed out"}
+
+    monkeypatch.setattr(server, "probe_mongo", mongo_down)
+    response = client.get("/api/health/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "not_ready"
+
+
+def test_readiness_results_are_cached(client, readiness_state, monkeypatch):
+    client.get("/api/health/ready")
+    calls = []
+
+    async def counted_probe():
+        calls.append(1)
+        return {"ok": True}
+
+    monkeypatch.setattr(server, "probe_mongo", counted_probe)
+    for _ in range(5):
+        client.get("/api/health/ready")
+    assert calls == []
+
+
+def test_readiness_recovers_after_a_failed_probe(client, readiness_state, monkeypatch):
+    probe_mongo = server.probe_mongo
+
+    async def broken_probe():
+        raise RuntimeError("probe bug")
+
+    monkeypatch.setattr(server, "probe_mongo", broken_probe)
+    response = client.get("/api/health/ready")
+    assert response.status_code == 503
+    assert response.json()["error"] == "probe bug"
+    assert readiness_state["task"] is None
+    monkeypatch.setattr(server, "probe_mongo", probe_mongo)
+    response = client.get("/api/health/ready")
+    assert response.status_code == 200
+    assert response.json()["checks"]["mongo"]["ok"]
@@ -0,0 +1,121 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from backend_benchmark import apply_delta
+
+
+@pytest.fixture
+def live_client(db, monkeypatch):
+    monkeypatch.setattr(server, "WS_POLL_SECONDS", 0.05)
+    with TestClient(server.app) as test_client:
+        yield test_client
+
+
+def wait_until_followed(itinerary_id):
+    """Block until a subscription has loaded the itinerary, so a write made next is pushed to it"""
+    deadline = time.monotonic() + 5
+    while itinerary_id not in server.live_versions and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_subscriber_gets_the_itinerary_then_deltas(live_client, trip):
+    created = live_client.post("/api/itinerary/generate", json=trip).json()
+    with live_client.websocket_connect("/api/itinerary/live") as socket:
+        socket.send_json({"op": "subscribe", "id": created["id"]})
+        snapshot = socket.receive_json()
+        assert snapshot["type"] == "itinerary"
+        assert snapshot["itinerary"]["id"] == created["id"]
+
+        regenerated = live_client.post(f"/api/itinerary/{created['id']}/days/2/regenerate").json()
+        delta = socket.receive_json()
+        assert (delta["type"], delta["version"]) == ("delta", regenerated["version"])
+        assert "days.0" not in delta["changes"]
+        apply_delta(snapshot["itinerary"], delta["changes"])
+        assert snapshot["itinerary"]["days"] == regenerated["days"]
+
+
+def test_subscriber_up_to_date_gets_only_newer_versions(live_client, trip):
+    created = live_client.post("/api/itinerary/generate", json=trip).json()
+    with live_client.websocket_connect("/api/itinerary/live") as socket:
+        socket.send_json({"op": "subscribe", "id": created["id"], "after_version": created["version"]})
+        wait_until_followed(created["id"])
+        live_client.post(f"/api/itinerary/{created['id']}/days/1/regenerate")
+        event = socket.receive_json()
+        assert (event["type"], event["version"]) == ("delta", created["version"] + 1)
+
+
+@pytest.mark.parametrize("after_version", ["1", 1.5, True, None])
+def test_subscribe_rejects_a_non_integer_after_version(live_client, trip, after_version):
+    created = live_client.post("/api/itinerary/generate", json=trip).json()
+    with live_client.websocket_connect("/api/itinerary/live") as socket:
+        socket.send_json({"op": "subscribe", "id": created["id"], "after_version": after_version})
+        assert socket.receive_json() == {"type": "error", "id": created["id"],
+                                         "detail": "after_version must be an integer"}
+        socket.send_json({"op": "subscribe", "id": created["id"]})
+        assert socket.receive_json()["type"] == "itinerary"
+
+
+def test_subscribe_to_an_unknown_itinerary(live_client):
+    with live_client.websocket_connect("/api/itinerary/live") as socket:
+        socket.send_json({"op": "subscribe", "id": "unknown"})
+        assert socket.receive_json() == {"type": "error", "id": "unknown", "detail": "Itinerary not found"}
+        assert "unknown" not in server.live_subscribers
+
+
+def test_malformed_messages_get_an_error(live_client):
+    with live_client.websocket_connect("/api/itinerary/live") as socket:
+        socket.send_text("not json")
+        assert socket.receive_json()["detail"] == "Messages must be JSON objects"
+        socket.send_json({"op": "shout"})
+        assert socket.receive_json()["detail"] == "Unknown op: shout"
+
+
+def test_versions_written_by_another_worker_are_polled(live_client, db, trip):
+    created = live_client.post("/api/itinerary/generate", json=trip).json()
+    record = db.itineraries.documents[0]
+    record["status"] = "enriching"  # as if another worker were still enriching it
+    with live_client.websocket_connect("/api/itinerary/live") as socket:
+        socket.send_json({"op": "subscribe", "id": created["id"], "after_version": 1})
+        wait_until_followed(created["id"])
+        record.update(version=2, status="enriched", safety_score=1)
+        event = socket.receive_json()
+        assert (event["type"], event["version"]) == ("delta", 2)
+        assert event["changes"]["safety_score"] == 1
+
+
+def test_slow_consumer_gets_the_latest_version_coalesced():
+    socket = server.ItinerarySocket(websocket=None)
+    first, second, third = ({"id": "a", "version": version, "safety_score": version} for version in (1, 2, 3))
+    socket.push("a", first)
+    assert socket.next_event()["type"] == "itinerary"
+    socket.push("a", second)
+    socket.push("a", third)
+    event = socket.next_event()
+    assert (event["type"], event["version"], event["changes"]) == ("delta", 3, {"version": 3, "safety_score": 3})
+    assert socket.next_event() is None
+
+
+def test_itinerary_delta_narrows_to_changed_days():
+    previous = {"days": [{"day": 1}, {"day": 2}], "status": "template"}
+    current = {"days": [{"day": 1}, {"day": 2, "notes": "x"}], "status": "enriched"}
+    assert server.itinerary_delta(previous, current) == {"days.1": {"day": 2, "notes": "x"}, "status": "enriched"}
+    current["days"].append({"day": 3})
+    assert server.itinerary_delta(previous, current)["days"] == current["days"]
+
+
+def test_stale_versions_do_not_replace_the_clients_base():
+    socket = server.ItinerarySocket(websocket=None)
+    client_copy = None
+    for version, safety_score in ((3, 5), (2, 1), (4, 1)):  # version 2 arrives late, from a slower read
+        socket.push("a", {"id": "a", "version": version, "safety_score": safety_score})
+        event = socket.next_event()
+        if event is None:
+            continue
+        if event["type"] == "itinerary":
+            client_copy = dict(event["itinerary"])
+        else:
+            apply_delta(client_copy, event["changes"])
+    assert client_copy == {"id": "a", "version": 4, "safety_score": 1}
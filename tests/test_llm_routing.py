@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+import pytest
+
+import server
+
+
+class FakeChat:
+    def __init__(self, name, outcomes):
+        self.name, self.outcomes = name, outcomes
+
+    async def send_message(self, message):
+        self.outcomes["calls"].append(self.name)
+        outcome = self.outcomes.get(self.name, "ok")
+        if outcome == "error":
+            raise RuntimeError("upstream 500")
+        return f'{{"model": "{self.name}"}}'
+
+
+@pytest.fixture
+def outcomes(monkeypatch):
+    outcomes = {"calls": []}
+    monkeypatch.setattr(server, "UPSTREAM_MODE", "replay")
+    monkeypatch.setattr(server, "get_llm_chat", lambda model, provider: FakeChat(model, outcomes))
+    return outcomes
+
+
+def complete(router, days=3, preference_chars=0, seconds=30):
+    return asyncio.run(router.complete("prompt", days, preference_chars, time.monotonic() + seconds))
+
+
+def test_complex_trips_start_at_the_largest_model():
+    router = server.ModelRouter(["large", "medium", "small"])
+    assert [model.name for model in router.chain(server.LLM_COMPLEX_DURATION_DAYS, 0)] == ["large", "medium", "small"]
+    assert [model.name for model in router.chain(2, server.LLM_COMPLEX_PREFERENCE_CHARS)][0] == "large"
+    assert [model.name for model in router.chain(2, 0)] == ["medium", "small"]
+    assert [model.name for model in server.ModelRouter(["only"]).chain(2, 0)] == ["only"]
+
+
+def test_failed_models_fall_back_down_the_chain(outcomes):
+    outcomes["medium"] = "error"
+    router = server.ModelRouter(["large", "medium", "small"])
+    assert complete(router) == '{"model": "small"}'
+    assert outcomes["calls"] == ["medium", "small"]
+
+
+def test_models_too_slow_for_the_deadline_are_skipped(outcomes):
+    router = server.ModelRouter(["large", "small"])
+    router.models[0].seconds_per_day = 100
+    assert complete(router, days=server.LLM_COMPLEX_DURATION_DAYS) == '{"model": "small"}'
+    assert outcomes["calls"] == ["small"]
+
+
+def test_models_with_an_open_circuit_are_skipped(outcomes):
+    router = server.ModelRouter(["large", "small"])
+    router.models[0].guard.state, router.models[0].guard.opened_at = "open", time.monotonic()
+    assert complete(router, days=server.LLM_COMPLEX_DURATION_DAYS) == '{"model": "small"}'
+    assert not router.is_open()
+
+
+def test_unavailable_when_no_model_answers(outcomes):
+    outcomes["small"] = "error"
+    router = server.ModelRouter(["small"])
+    with pytest.raises(server.LlmUnavailableError):
+        complete(router)
+    with pytest.raises(server.LlmUnavailableError):
+        complete(router, seconds=0)
+    assert outcomes["calls"] == ["small"]
+
+
+def test_latency_estimates_follow_observations():
+    model = server.LlmModel("unknown-model")
+    before = model.expected_seconds(2)
+    for _ in range(50):
+        model.observe(20.0, 2)
+    assert model.expected_seconds(2) > before
+    assert model.seconds_per_day == pytest.approx(10.0, rel=0.05)
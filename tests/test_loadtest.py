@@ -0,0 +1,69 @@
+import asyncio
+
+import httpx
+import pytest
+
+import backend_loadtest
+import server
+
+
+@pytest.fixture
+def fake_server():
+    servers = []
+
+    def start(handler):
+        httpd = backend_loadtest.start_fake_server(handler, 0)
+        servers.append(httpd)
+        return f"http://127.0.0.1:{httpd.server_address[1]}"
+
+    yield start
+    for httpd in servers:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_percentile():
+    assert backend_loadtest.percentile([], 50) is None
+    samples = list(range(1, 101))
+    assert backend_loadtest.percentile(samples, 50) == 51
+    assert backend_loadtest.percentile(samples, 99) == 100
+
+
+def test_summarize_separates_errors_from_shedding():
+    summary = backend_loadtest.summarize([0.1] * 8 + [0.3, 0.5], errors=1, shed=2, degraded=3, elapsed=2)
+    assert summary["requests"] == 10
+    assert summary["error_rate"] == 0.1
+    assert (summary["throughput_rps"], summary["goodput_rps"]) == (5.0, 3.5)
+    assert summary["p50_ms"] == 100.0
+
+
+def test_fake_places_answers_deterministically(fake_server, monkeypatch):
+    monkeypatch.setattr(backend_loadtest.FakePlacesHandler, "latency", 0)
+    url = fake_server(backend_loadtest.FakePlacesHandler)
+    params = {"query": "temples in Goa"}
+    first = httpx.get(f"{url}/maps/api/place/textsearch/json", params=params).json()
+    second = httpx.get(f"{url}/maps/api/place/textsearch/json", params=params).json()
+    assert first == second
+    assert first["status"] == "OK" and len(first["results"]) == 20
+
+
+def test_fake_llm_returns_the_requested_days(fake_server, monkeypatch):
+    monkeypatch.setattr(backend_loadtest.FakeLlmHandler, "latency", 0)
+    monkeypatch.setattr(backend_loadtest.FakeLlmHandler, "tokens_per_second", 1e9)
+    chat = backend_loadtest.FakeLlmChat(fake_server(backend_loadtest.FakeLlmHandler))
+    response = asyncio.run(chat.send_message(server.ReplayMessage("Create a 4-day itinerary for Goa")))
+    assert len(server.parse_llm_json(response)["days"]) == 4
+
+
+def test_closed_loop_against_the_app(client):
+    recorder = backend_loadtest.LoadRecorder()
+
+    async def drive():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            await backend_loadtest.run_closed_loop(http, recorder, backend_loadtest.DEFAULT_PROFILES, 4, 0.3)
+
+    asyncio.run(drive())
+    assert sum(len(samples) for samples in recorder.samples.values()) > 0
+    assert recorder.errors == {}
+    assert recorder.itinerary_ids
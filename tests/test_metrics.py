@@ -0,0 +1,67 @@
+import pytest
+
+import server
+
+
+def sample(text, series):
+    """Value of one series in a Prometheus text exposition, 0 when it is absent"""
+    for line in text.splitlines():
+        if line.startswith(series + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_metrics_expose_stage_histograms(client, trip):
+    before = client.get("/metrics").text
+    assert client.post("/api/itinerary/generate", json=trip).status_code == 200
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert "# TYPE sanskriti_stage_duration_seconds histogram" in text
+    for stage in ("template_build", "validation", "serialization", "mongo_insert"):
+        series = f'sanskriti_stage_duration_seconds_count{{stage="{stage}"}}'
+        assert sample(text, series) == sample(before, series) + 1
+        assert f'sanskriti_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}}' in text
+    assert sample(text, 'sanskriti_http_request_duration_seconds_count{method="POST",route="generate_itinerary"}') >= 1
+
+
+def test_metrics_count_cache_lookups_and_fallbacks(client, trip):
+    series = 'sanskriti_cache_requests_total{cache="template",result="hit"}'
+    before = sample(client.get("/metrics").text, series)
+    client.post("/api/itinerary/generate", json=trip)
+    client.post("/api/itinerary/generate", json=trip)  # the same trip is served from the template cache
+    assert sample(client.get("/metrics").text, series) >= before + 1
+
+    series = 'sanskriti_fallback_total{kind="attractions"}'
+    before = sample(client.get("/metrics").text, series)
+    server.get_fallback_attractions(trip["destination"], trip["theme"])
+    assert sample(client.get("/metrics").text, series) == before + 1
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = server.Histogram("test_seconds", "Test latency", ["stage"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, "a")
+    text = "\n".join(histogram.collect())
+    assert sample(text, 'test_seconds_bucket{stage="a",le="0.1"}') == 1
+    assert sample(text, 'test_seconds_bucket{stage="a",le="1.0"}') == 3
+    assert sample(text, 'test_seconds_bucket{stage="a",le="+Inf"}') == 4
+    assert sample(text, 'test_seconds_sum{stage="a"}') == pytest.approx(6.05)
+    assert sample(text, 'test_seconds_count{stage="a"}') == 4
+
+
+def test_stage_timer_counts_errors():
+    before = server.errors_total.values.get(("test_stage",), 0)
+    with pytest.raises(ValueError):
+        with server.stage_timer("test_stage"):
+            raise ValueError("boom")
+    assert server.errors_total.values[("test_stage",)] == before + 1
+    assert server.stage_latency.series[("test_stage",)][2] >= 1
+
+
+def test_metrics_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(server, "METRICS_ENABLED", False)
+    counter = server.Counter("test_total", "Test counter", ["kind"])
+    counter.inc("a")
+    assert counter.values == {}
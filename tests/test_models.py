@@ -0,0 +1,55 @@
+import pydantic
+import pytest
+
+import server
+
+DAY = {
+    "day": 1,
+    "activities": [{"time": "9:00 AM", "activity": "Visit Fort Aguada", "cost": "250", "place_id": "p1"}],
+    "accommodation": {"name": "Safe Stay", "safety_rating": 4.5, "check_in": "2 PM"},
+    "meals": [{"meal": "lunch", "restaurant": "Thali House"}],
+    "estimated_cost": 4000,
+    "safety_tips": ["Keep emergency contacts"]
+}
+
+
+def itinerary(days):
+    return {"destination": "Goa", "budget": 30000, "duration": len(days), "theme": "culinary",
+            "travel_mode": "solo_female", "period_friendly": False, "days": days, "total_cost": 20000,
+            "community_impact": {}, "safety_score": 90}
+
+
+def test_llm_days_are_validated_and_coerced():
+    day = server.ItineraryDay(**DAY).model_dump()
+    assert day["activities"][0]["cost"] == 250
+    assert day["activities"][0]["place_id"] == "p1"  # routing fields are kept
+    assert day["accommodation"]["check_in"] == "2 PM"
+    assert day["meals"][0]["cuisine"] == ""
+
+
+@pytest.mark.parametrize("broken", [
+    {"activities": [{"time": "9:00 AM"}]},
+    {"accommodation": {"type": "hotel"}},
+    {"meals": [{"meal": "lunch"}]},
+    {"estimated_cost": "a lot"},
+])
+def test_malformed_llm_days_are_rejected(broken):
+    with pytest.raises(pydantic.ValidationError):
+        server.ItineraryDay(**{**DAY, **broken})
+
+
+def test_trusted_itineraries_skip_day_validation():
+    days = [{"day": 1, "activities": [{"note": "stored before the schema changed"}]}]
+    trusted = server.Itinerary.trusted(itinerary(days))
+    assert isinstance(trusted, server.Itinerary)
+    assert trusted.days == days
+    assert server.Itinerary.model_validate_json(
+        server.Itinerary.trusted(itinerary([DAY])).model_dump_json()
+    ).days[0].activities[0].activity == "Visit Fort Aguada"
+    with pytest.raises(pydantic.ValidationError):
+        server.Itinerary(**itinerary(days))
+
+
+def test_trusted_itineraries_still_check_the_top_level():
+    with pytest.raises(pydantic.ValidationError):
+        server.Itinerary.trusted({**itinerary([DAY]), "budget": "plenty"})
@@ -0,0 +1,43 @@
+import json
+
+import server
+
+RESULT = {
+    "place_id": "p1", "name": "Fort Aguada", "vicinity": "Candolim", "rating": 4.5, "price_level": 1,
+    "types": ["tourist_attraction", "point_of_interest"], "geometry": {"location": {"lat": 15.49, "lng": 73.77}},
+    "reviews": [{"text": "Lovely"}] * 3, "photos": [{"photo_reference": "dropped"}]
+}
+
+
+def test_place_records_keep_only_the_fields_used():
+    place = server.Place.from_result(RESULT)
+    assert (place.place_id, place.name, place.vicinity, place.rating) == ("p1", "Fort Aguada", "Candolim", 4.5)
+    assert place.types == ("tourist_attraction", "point_of_interest")
+    assert (place.lat, place.lng, place.reviews_count) == (15.49, 73.77, 3)
+
+
+def test_partial_results_get_defaults():
+    place = server.Place.from_result({"name": "Somewhere"})
+    assert (place.place_id, place.rating, place.types, place.lat, place.reviews_count) == (None, 0, (), None, 0)
+
+
+def test_places_survive_the_shared_cache_encoding():
+    places = [server.Place.from_result(RESULT), server.Place.from_result({"name": "Somewhere"})]
+    assert server.decode_places(json.loads(json.dumps(places))) == places
+
+
+def test_places_search_is_served_from_the_cache(monkeypatch):
+    calls = []
+
+    class FakeGmaps:
+        def places(self, query, type=None):
+            calls.append(query)
+            return {"status": "OK", "results": [RESULT]}
+
+    monkeypatch.setattr(server, "get_gmaps", lambda: FakeGmaps())
+    server.places_cache.reset_local()
+    query = "historical places monuments in Goa"
+    first = server.places_search(query, "tourist_attraction")
+    assert server.places_search(query, "tourist_attraction") == first == [server.Place.from_result(RESULT)]
+    assert calls == [query]
+    server.places_cache.reset_local()
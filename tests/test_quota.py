@@ -0,0 +1,88 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    monkeypatch.setattr(server, "QUOTA_BUDGET_WINDOW_SECONDS", 1.0)
+    return server.QuotaScheduler(10, 100, {
+        "interactive": {"priority": 0, "share": 1.0, "max_wait": 2},
+        "batch": {"priority": 1, "share": 0.2, "max_wait": 3},
+    })
+
+
+def test_quota_scheduler_holds_lower_priority_while_higher_priority_waits(scheduler):
+    scheduler.waiting["interactive"] = 1
+    assert not scheduler.try_acquire("batch")
+    scheduler.waiting["interactive"] = 0
+    assert scheduler.try_acquire("batch")
+
+
+def test_quota_scheduler_sleeps_until_the_budget_window_frees_up(scheduler):
+    waits = []
+    wait = scheduler.cond.wait
+
+    def counted(timeout=None):
+        waits.append(timeout)
+        return wait(timeout)
+
+    scheduler.cond.wait = counted
+    started = time.monotonic()
+    for _ in range(3):
+        scheduler.acquire("batch")  # a budget of 2 grants per window
+    assert 0.9 < time.monotonic() - started < 1.5
+    # One sleep until the oldest grant leaves the window, not a spin of millisecond waits
+    assert len(waits) <= 2
+    assert max(waits) > 0.5
+
+
+def test_quota_scheduler_times_out():
+    scheduler = server.QuotaScheduler(1, 1, {"batch": {"priority": 0, "share": 1.0, "max_wait": 0.05}})
+    scheduler.acquire("batch")
+    with pytest.raises(server.QuotaTimeoutError):
+        scheduler.acquire("batch")
+    assert scheduler.timeouts["batch"] == 1
+
+
+def test_quota_scheduler_is_thread_safe():
+    scheduler = server.QuotaScheduler(1000, 100, {"interactive": {"priority": 0, "share": 1.0, "max_wait": 2}})
+    threads = [threading.Thread(target=scheduler.acquire, args=("interactive",)) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert scheduler.granted["interactive"] == 20
+
+
+def test_background_quota_waits_do_not_hold_interactive_threads(monkeypatch):
+    monkeypatch.setattr(server, "EXECUTOR_WORKERS", 1)
+    monkeypatch.setattr(server, "BACKGROUND_EXECUTOR_WORKERS", 1)
+    released = threading.Event()
+
+    def quota_wait():
+        released.wait(2)  # a refresh call queued for quota
+        return threading.current_thread().name
+
+    async def refresh():
+        server.upstream_priority.set("refresh")
+        return await server.run_in_executor(quota_wait)
+
+    async def main():
+        waiting = asyncio.create_task(refresh())
+        await asyncio.sleep(0.05)
+        started = time.monotonic()
+        await asyncio.wait_for(server.run_in_executor(time.sleep, 0), 1)
+        interactive_seconds = time.monotonic() - started
+        released.set()
+        thread_name = await waiting
+        await server.worker.stop()
+        return interactive_seconds, thread_name
+
+    interactive_seconds, thread_name = asyncio.run(main())
+    assert interactive_seconds < 0.5
+    assert thread_name.startswith("background")
@@ -0,0 +1,42 @@
+import server
+
+
+def test_sliding_window_rate_limiter_weights_the_previous_window():
+    limiter = server.SlidingWindowRateLimiter()
+    assert all(limiter.hit("ip:1", 10, 60, 59.0) == 0 for _ in range(10))
+    assert limiter.hit("ip:1", 10, 60, 59.5) > 0
+    assert limiter.hit("ip:2", 10, 60, 59.5) == 0
+    # Halfway through the next window, half of the previous window's hits still count
+    assert sum(limiter.hit("ip:1", 10, 60, 90.0) == 0 for _ in range(10)) == 5
+
+
+def scope(*headers, client=("10.0.0.1", 1234)):
+    return {"type": "http", "client": client, "headers": [(name.encode(), value.encode()) for name, value in headers]}
+
+
+def test_client_key_ignores_api_keys(monkeypatch):
+    monkeypatch.setattr(server, "RATE_LIMIT_TRUST_FORWARDED", False)
+    assert server.client_key(scope(("x-api-key", "a"))) == server.client_key(scope(("x-api-key", "b"))) == "ip:10.0.0.1"
+    assert server.client_key(scope(("x-forwarded-for", "1.2.3.4"))) == "ip:10.0.0.1"
+    assert server.client_key(scope(client=None)) == "ip:unknown"
+
+
+def test_client_key_uses_the_first_forwarded_hop_when_trusted(monkeypatch):
+    monkeypatch.setattr(server, "RATE_LIMIT_TRUST_FORWARDED", True)
+    assert server.client_key(scope(("x-forwarded-for", "1.2.3.4, 10.0.0.9"))) == "ip:1.2.3.4"
+    assert server.client_key(scope()) == "ip:10.0.0.1"
+
+
+def test_forwarded_clients_are_limited_separately(client, monkeypatch):
+    monkeypatch.setattr(server, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(server, "RATE_LIMIT_TRUST_FORWARDED", True)
+    monkeypatch.setattr(server, "RATE_LIMITS", {**server.RATE_LIMITS, "default": ("default", 2, 60)})
+    monkeypatch.setattr(server, "rate_limiter", server.SlidingWindowRateLimiter())
+    first, second = {"X-Forwarded-For": "1.2.3.4"}, {"X-Forwarded-For": "5.6.7.8"}
+    assert [client.get("/api/", headers=first).status_code for _ in range(2)] == [200, 200]
+    response = client.get("/api/", headers=first)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert client.get("/api/", headers=second).status_code == 200
+    assert client.get("/api/health/live", headers=first).status_code == 200
+
@@ -0,0 +1,48 @@
+import asyncio
+import copy
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from backend_benchmark import InMemoryDatabase
+
+
+@pytest.fixture
+def secondary(db, monkeypatch):
+    """A read replica that has not caught up with anything yet"""
+    replica = InMemoryDatabase()
+    monkeypatch.setattr(server.worker, "_read_db", replica)
+    return replica
+
+
+def test_invalid_read_preference_fails_startup(db, monkeypatch):
+    monkeypatch.setattr(server, "MONGO_READ_PREFERENCE", "secundary")
+    with pytest.raises(ValueError, match="MONGO_READ_PREFERENCE"):
+        with TestClient(server.app):
+            pass
+
+
+def test_fresh_itineraries_are_read_from_the_primary(client, db, secondary, trip, uncached):
+    itinerary_id = client.post("/api/itinerary/generate", json=trip).json()["id"]
+    uncached()
+    assert client.get(f"/api/itinerary/{itinerary_id}").status_code == 200
+    assert itinerary_id in server.recent_writes
+
+
+def test_secondary_misses_fall_back_to_the_primary(client, db, secondary, trip):
+    itinerary_id = client.post("/api/itinerary/generate", json=trip).json()["id"]
+    server.recent_writes.pop(itinerary_id)  # as if another worker had written it
+    before = server.mongo_reads_total.values.get(("primary_fallback",), 0)
+    itinerary = asyncio.run(server.find_itinerary(itinerary_id))
+    assert itinerary["id"] == itinerary_id
+    assert server.mongo_reads_total.values[("primary_fallback",)] == before + 1
+
+
+def test_replicated_itineraries_are_read_from_the_secondary(client, db, secondary, trip):
+    itinerary_id = client.post("/api/itinerary/generate", json=trip).json()["id"]
+    server.recent_writes.pop(itinerary_id)
+    for name in ("itineraries", "itinerary_bodies"):
+        getattr(secondary, name).documents = copy.deepcopy(getattr(db, name).documents)
+    db.itineraries.documents = []  # a primary read would now miss
+    assert asyncio.run(server.find_itinerary(itinerary_id))["id"] == itinerary_id
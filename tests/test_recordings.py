@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+import server
+
+
+class FakeGmaps:
+    def __init__(self):
+        self.calls = 0
+
+    def places(self, query, type=None):
+        self.calls += 1
+        return {"results": [{"name": query, "place_id": "p1"}], "status": "OK"}
+
+
+def test_recordings_replay_what_was_recorded(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "REPLAY_LATENCY_MS", 0)
+    recordings = server.UpstreamRecordings("places")
+    recordings.path = tmp_path / "places.jsonl.gz"
+    gmaps = FakeGmaps()
+    recorded = server.RecordingClient(gmaps, recordings).places("temples in Goa", type="tourist_attraction")
+
+    replaying = server.UpstreamRecordings("places")
+    replaying.path = recordings.path
+    replay = server.ReplayClient(replaying)
+    assert replay.places("temples in Goa", type="tourist_attraction") == recorded
+    assert gmaps.calls == 1
+    with pytest.raises(server.ReplayMissError):
+        replay.places("temples in Goa", type="lodging")
+
+
+def test_recordings_keep_the_latest_response(tmp_path):
+    recordings = server.UpstreamRecordings("llm")
+    recordings.path = tmp_path / "llm.jsonl.gz"
+    recordings.record(["gpt-4o", "prompt"], "first", 0.5)
+    recordings.record(["gpt-4o", "prompt"], "second", 0.5)
+    response, delay = recordings.replay(["gpt-4o", "prompt"])
+    assert response == "second"
+    assert delay >= 0
+
+
+def test_recordings_miss_without_a_file(tmp_path):
+    recordings = server.UpstreamRecordings("llm")
+    recordings.path = tmp_path / "missing.jsonl.gz"
+    with pytest.raises(server.ReplayMissError):
+        recordings.replay(["gpt-4o", "prompt"])
+
+
+def test_llm_responses_replay_per_model_and_prompt(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "REPLAY_LATENCY_MS", "0")
+
+    class FakeChat:
+        async def send_message(self, message):
+            return f"answer to {message.text}"
+
+    recordings = server.UpstreamRecordings("llm")
+    recordings.path = tmp_path / "llm.jsonl.gz"
+    recording = server.RecordingLlmChat(FakeChat(), recordings, "gpt-4o")
+    recorded = asyncio.run(recording.send_message(server.ReplayMessage("plan Goa")))
+
+    replaying = server.UpstreamRecordings("llm")
+    replaying.path = recordings.path
+    assert asyncio.run(server.ReplayLlmChat(replaying, "gpt-4o").send_message(server.ReplayMessage("plan Goa"))) == recorded
+    with pytest.raises(server.ReplayMissError):
+        asyncio.run(server.ReplayLlmChat(replaying, "gpt-4o-mini").send_message(server.ReplayMessage("plan Goa")))
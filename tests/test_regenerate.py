@@ -0,0 +1,36 @@
+import server
+
+
+def test_regenerate_rebuilds_only_the_requested_day(client, trip, uncached):
+    created = client.post("/api/itinerary/generate", json=trip).json()
+    response = client.post(f"/api/itinerary/{created['id']}/days/2/regenerate")
+    assert response.status_code == 200
+    regenerated = response.json()
+    assert regenerated["version"] == created["version"] + 1
+    assert regenerated["days"][0] == created["days"][0] and regenerated["days"][2] == created["days"][2]
+    assert regenerated["days"][1]["day"] == 2
+    uncached()
+    assert client.get(f"/api/itinerary/{created['id']}").json() == regenerated
+
+
+def test_regenerate_answers_409_when_the_itinerary_keeps_changing(client, db, trip):
+    created = client.post("/api/itinerary/generate", json=trip).json()
+    update_one = db.itineraries.update_one
+    guarded_writes = []
+
+    async def racing_update(query, changes, **kwargs):
+        if "version" in query:
+            guarded_writes.append(query["version"])
+            await update_one({"id": query["id"]}, {"$inc": {"version": 1}})
+        return await update_one(query, changes, **kwargs)
+
+    db.itineraries.update_one = racing_update
+    response = client.post(f"/api/itinerary/{created['id']}/days/1/regenerate")
+    assert response.status_code == 409
+    assert len(guarded_writes) == server.REGENERATE_MAX_ATTEMPTS
+
+
+def test_regenerate_rejects_unknown_days(client, trip):
+    created = client.post("/api/itinerary/generate", json=trip).json()
+    assert client.post(f"/api/itinerary/{created['id']}/days/9/regenerate").status_code == 404
+    assert client.post("/api/itinerary/unknown/days/1/regenerate").status_code == 404
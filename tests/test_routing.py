@@ -0,0 +1,136 @@
+import asyncio
+import json
+import random
+import time
+
+import pytest
+
+import server
+
+
+def matrix_cost(matrix):
+    return lambda origin, destination: matrix[origin][destination]
+
+
+@pytest.mark.parametrize("count", [0, 1, 2])
+def test_order_stops_keeps_short_days(count):
+    assert server.order_stops(count, lambda origin, destination: 1) == list(range(count))
+
+
+def test_order_stops_follows_a_line():
+    positions = [0, 7, 2, 9, 4]
+    cost = lambda origin, destination: abs(positions[origin] - positions[destination])
+    assert server.path_cost(server.order_stops(len(positions), cost), cost) == 9
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_order_stops_terminates_on_asymmetric_matrices(seed):
+    # Travel times differ by direction; pricing a reversal by its ends alone looped forever on some (seeds 41, 51)
+    rng = random.Random(seed)
+    count = rng.randint(4, 8)
+    matrix = [[rng.randint(1, 100) for _ in range(count)] for _ in range(count)]
+    cost = matrix_cost(matrix)
+    order = server.order_stops(count, cost)
+    assert sorted(order) == list(range(count))
+
+
+def test_order_stops_never_worsens_the_nearest_neighbour_tour(monkeypatch):
+    rng = random.Random(7)
+    count = 7
+    matrix = [[rng.randint(1, 100) for _ in range(count)] for _ in range(count)]
+    cost = matrix_cost(matrix)
+    monkeypatch.setattr(server, "ROUTING_MAX_PASSES", 0)
+    greedy = server.path_cost(server.order_stops(count, cost), cost)
+    monkeypatch.undo()
+    assert server.path_cost(server.order_stops(count, cost), cost) <= greedy
+
+
+# Three attractions on a line running north from Panaji; the LLM lists them out of order
+ATTRACTIONS = [
+    {"activity": f"Visit {name}", "location": "Goa", "duration": "1 hour", "time": "9:00 AM",
+     "place_id": place_id, "lat": lat, "lng": 73.8}
+    for name, place_id, lat in (("Fort Aguada", "p-north", 15.60), ("Old Market", "p-south", 15.40),
+                                ("Miramar Beach", "p-middle", 15.50))
+]
+
+
+def llm_day(names):
+    return {
+        "day": 1,
+        "activities": [{"time": "9:00 AM", "activity": name, "description": "", "location": "Goa", "cost": 100,
+                        "safety_level": "high", "duration": "1 hour"} for name in names],
+        "accommodation": {"name": "Hotel", "type": "hotel", "location": "Goa", "cost": 3000,
+                          "safety_rating": 5, "women_friendly": True, "amenities": []},
+        "meals": [],
+        "estimated_cost": 5000,
+        "safety_tips": []
+    }
+
+
+def routed_names(activities):
+    return [activity["activity"] for activity in activities]
+
+
+def test_attach_places_matches_by_place_id_or_name():
+    activities = [{"activity": "Fort Aguada"}, {"activity": "Lunch", "place_id": "p-south"}, {"activity": "Spa"}]
+    attached = server.attach_places(activities, ATTRACTIONS)
+    assert [activity.get("place_id") for activity in attached] == ["p-north", "p-south", None]
+    assert attached[0]["lat"] == 15.60
+    assert server.attach_places(activities, []) is activities
+
+
+def test_route_activities_keeps_unlocated_activities_after_the_route(db):
+    activities = server.attach_places(
+        [{"activity": "Spa", "duration": "1 hour"}] + [dict(a, activity=a["activity"][6:]) for a in ATTRACTIONS],
+        ATTRACTIONS
+    )
+    routed = asyncio.run(server.route_activities(activities))
+    assert routed_names(routed) in (["Fort Aguada", "Miramar Beach", "Old Market", "Spa"],
+                                     ["Old Market", "Miramar Beach", "Fort Aguada", "Spa"])
+    assert "travel_minutes_from_previous" not in routed[0] and "travel_minutes_from_previous" not in routed[3]
+    assert all(activity["travel_minutes_from_previous"] > 0 for activity in routed[1:3])
+
+
+def test_enriched_itineraries_come_back_routed(client, db, trip, monkeypatch):
+    monkeypatch.setattr(server, "ENRICHMENT_ENABLED", True)
+    monkeypatch.setenv("EMERGENT_LLM_KEY", "test-key")
+    monkeypatch.setattr(server, "get_real_attractions", lambda destination, theme: [dict(a) for a in ATTRACTIONS])
+    prompts = []
+
+    async def complete(prompt, days, preference_chars, deadline):
+        prompts.append(prompt)
+        names = ["Miramar Beach", "Visit Fort Aguada", "Old Market"]
+        return json.dumps({"days": [{**llm_day(names), "day": day + 1} for day in range(days)], "total_cost": 20000})
+
+    monkeypatch.setattr(server.llm_router, "complete", complete)
+    created = client.post("/api/itinerary/generate", json=trip).json()
+    assert created["status"] == "enriching"
+    deadline = time.monotonic() + 5
+    itinerary = created
+    while itinerary["status"] == "enriching" and time.monotonic() < deadline:
+        time.sleep(0.02)
+        itinerary = client.get(f"/api/itinerary/{created['id']}").json()
+
+    assert itinerary["status"] == "enriched"
+    assert "place_id p-north" in prompts[0]
+    for day in itinerary["days"]:
+        assert routed_names(day["activities"]) in (["Visit Fort Aguada", "Miramar Beach", "Old Market"],
+                                                   ["Old Market", "Miramar Beach", "Visit Fort Aguada"])
+        assert [activity.get("travel_minutes_from_previous") for activity in day["activities"]][0] is None
+        assert all(activity["travel_minutes_from_previous"] > 0 for activity in day["activities"][1:])
+
+
+def test_regenerated_days_are_routed(client, db, trip, monkeypatch):
+    created = client.post("/api/itinerary/generate", json=trip).json()
+    monkeypatch.setenv("EMERGENT_LLM_KEY", "test-key")
+    monkeypatch.setattr(server, "get_real_attractions", lambda destination, theme: [dict(a) for a in ATTRACTIONS])
+
+    async def complete(prompt, days, preference_chars, deadline):
+        assert "place_id p-middle" in prompt
+        return json.dumps(llm_day(["Miramar Beach", "Fort Aguada", "Old Market"]))
+
+    monkeypatch.setattr(server.llm_router, "complete", complete)
+    day = client.post(f"/api/itinerary/{created['id']}/days/2/regenerate").json()["days"][1]
+    assert routed_names(day["activities"]) in (["Fort Aguada", "Miramar Beach", "Old Market"],
+                                               ["Old Market", "Miramar Beach", "Fort Aguada"])
+    assert day["activities"][1]["travel_minutes_from_previous"] > 0
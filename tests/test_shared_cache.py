@@ -0,0 +1,97 @@
+import multiprocessing
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def shared_cache(tmp_path):
+    cache = server.SharedCache(str(tmp_path / "cache"), data_size=64 * 1024, index_slots=256)
+    yield cache
+    cache.close()
+
+
+def read_from_another_process(path, key, results):
+    cache = server.SharedCache(path, data_size=64 * 1024, index_slots=256)
+    results.put(cache.get(key))
+    cache.close()
+
+
+def test_shared_cache_round_trip(shared_cache):
+    assert shared_cache.get("missing") is None
+    assert shared_cache.set("key", b"value", ttl=60)
+    assert shared_cache.get("key") == b"value"
+    shared_cache.set("key", b"newer", ttl=60)
+    assert shared_cache.get("key") == b"newer"
+    shared_cache.delete("key")
+    assert shared_cache.get("key") is None
+
+
+def test_shared_cache_expires_entries(shared_cache):
+    shared_cache.set("key", b"value", ttl=-1)
+    assert shared_cache.get("key") is None
+
+
+def test_shared_cache_rejects_oversized_entries(shared_cache):
+    assert not shared_cache.set("key", bytes(8 * 1024), ttl=60)
+    assert shared_cache.get("key") is None
+
+
+def test_shared_cache_wrapped_entries_read_as_misses(shared_cache):
+    shared_cache.set("first", b"x" * 1000, ttl=60)
+    for index in range(200):
+        shared_cache.set(f"filler-{index}", b"y" * 1000, ttl=60)
+    assert shared_cache.stats()["wraps"] >= 1
+    assert shared_cache.get("first") is None
+    assert shared_cache.get("filler-199") == b"y" * 1000
+
+
+def test_shared_cache_is_shared_between_processes(shared_cache):
+    shared_cache.set("key", b"value", ttl=60)
+    results = multiprocessing.get_context("fork").Queue()
+    reader = multiprocessing.get_context("fork").Process(
+        target=read_from_another_process, args=(shared_cache.path, "key", results)
+    )
+    reader.start()
+    reader.join(10)
+    assert results.get(timeout=1) == b"value"
+
+
+def test_shared_cache_resets_a_different_layout(tmp_path):
+    path = str(tmp_path / "cache")
+    cache = server.SharedCache(path, data_size=64 * 1024, index_slots=256)
+    cache.set("key", b"value", ttl=60)
+    cache.close()
+    resized = server.SharedCache(path, data_size=64 * 1024, index_slots=512)
+    assert resized.get("key") is None
+    resized.close()
+
+
+
+def test_tiered_cache_fills_the_local_tier_from_the_shared_one(shared_cache, monkeypatch):
+    monkeypatch.setattr(server.worker, "shared_cache", shared_cache)
+    cache = server.TieredCache("test_tiered", maxsize=64, ttl=60)
+    cache.set(("Goa", 3), {"days": 3})
+    cache.reset_local()  # as another worker sees it
+    assert cache.get(("Goa", 3)) == {"days": 3}
+    assert ("Goa", 3) in cache.local
+    cache.delete(("Goa", 3))
+    cache.reset_local()
+    assert cache.get(("Goa", 3)) is None
+    server.TieredCache.instances.remove(cache)
+
+
+def test_worker_state_splits_the_places_quota(monkeypatch):
+    monkeypatch.setattr(server, "PLACES_QPS", 40)
+    monkeypatch.setattr(server, "PLACES_BURST", 8)
+    monkeypatch.setattr(server, "PLACES_QUOTA_WORKERS", 4)
+    scheduler, limiter = server.places_scheduler, server.rate_limiter
+    monkeypatch.setattr(server, "places_scheduler", scheduler)
+    monkeypatch.setattr(server, "rate_limiter", limiter)
+    monkeypatch.setattr(server, "generate_limiter", server.generate_limiter)
+    server.template_cache.set(("inherited",), {"days": 1})
+    server.build_worker_state()
+    assert server.places_scheduler is not scheduler and server.rate_limiter is not limiter
+    assert (server.places_scheduler.rate, server.places_scheduler.burst) == (10, 2)
+    assert server.template_cache.get(("inherited",)) is None
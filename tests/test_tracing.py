@@ -0,0 +1,78 @@
+import time
+
+import pytest
+
+import server
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture(autouse=True)
+def no_sampling(monkeypatch):
+    monkeypatch.setattr(server, "TRACE_SAMPLE_RATE", 0)
+
+
+def test_valid_traceparent_continues_the_trace():
+    root = server.start_request_span("request", f"00-{TRACE_ID}-{PARENT_ID}-01")
+    assert (root.trace_id, root.parent_id) == (TRACE_ID, PARENT_ID)
+
+
+def test_unsampled_traceparent_is_not_traced():
+    assert server.start_request_span("request", f"00-{TRACE_ID}-{PARENT_ID}-00") is None
+
+
+@pytest.mark.parametrize("traceparent", [
+    "",
+    "garbage",
+    "00-abc-def-01",
+    f"00-{TRACE_ID.upper()}-{PARENT_ID}-01",
+    f"00-{'0' * 32}-{PARENT_ID}-01",
+    f"00-{TRACE_ID}-{'0' * 16}-01",
+    f"ff-{TRACE_ID}-{PARENT_ID}-01",
+    f"00-{TRACE_ID}-{PARENT_ID}-zz",
+    f"00-{TRACE_ID}-{PARENT_ID}-01-extra",
+])
+def test_malformed_traceparent_starts_a_new_trace(traceparent, monkeypatch):
+    assert server.start_request_span("request", traceparent) is None
+    monkeypatch.setattr(server, "TRACE_SAMPLE_RATE", 1)
+    root = server.start_request_span("request", traceparent)
+    assert root.trace_id != TRACE_ID
+    assert len(root.trace_id) == 32
+
+
+def test_malformed_traceparent_does_not_fail_the_request(client):
+    response = client.get("/api/", headers={"traceparent": "00-not-a-trace-01"})
+    assert response.status_code == 200
+
+
+def test_hedged_attempts_join_the_request_trace(monkeypatch):
+    exported = []
+    monkeypatch.setattr(server, "export_span", exported.append)
+    guard = server.UpstreamGuard("test", 5, True)
+    guard.p95 = 0.01
+
+    def search():
+        with server.span("places.search"):
+            time.sleep(0.2)  # slower than the hedge delay
+        return "ok"
+
+    with server.span("request", trace_id=TRACE_ID):
+        assert guard.call(search) == "ok"
+    time.sleep(0.3)  # the losing attempt finishes in the background
+    attempts = [record for record in exported if record["name"] == "places.search"]
+    assert len(attempts) == 2
+    assert {record["traceId"] for record in attempts} == {TRACE_ID}
+
+
+@pytest.mark.parametrize("token, status", [(None, 403), ("wrong", 403), ("s3cret", 200)])
+def test_admin_routes_need_the_admin_token(client, monkeypatch, token, status):
+    monkeypatch.setattr(server, "ADMIN_TOKEN", "s3cret")
+    headers = {"X-Admin-Token": token} if token else {}
+    assert client.get("/api/admin/quota", headers=headers).status_code == status
+
+
+def test_admin_routes_are_closed_without_a_configured_token(client, monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_TOKEN", None)
+    assert client.get("/api/admin/quota", headers={"X-Admin-Token": ""}).status_code == 403
+    assert not server.admin_authorized(None)
@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+import server
+
+
+
+
+def test_upstream_guard_opens_on_errors_and_closes_after_a_probe(monkeypatch):
+    monkeypatch.setattr(server, "CIRCUIT_COOLDOWN_SECONDS", 0.05)
+    guard = server.UpstreamGuard("test", 5, False)
+    for _ in range(server.CIRCUIT_MIN_CALLS):
+        guard.record(0.01, False)
+    assert guard.is_open()
+    assert not guard.allow()
+    time.sleep(0.06)
+    assert guard.allow()  # the half-open probe
+    assert not guard.allow()
+    guard.record(0.01, True)
+    assert guard.state == "closed"
+
+
+def test_upstream_guard_opens_on_slow_calls():
+    guard = server.UpstreamGuard("test", 0.1, False)
+    for _ in range(server.CIRCUIT_MIN_CALLS):
+        guard.record(0.5, True)
+    assert guard.state == "open"
+
+
+def test_upstream_guard_call_raises_while_open():
+    guard = server.UpstreamGuard("test", 5, False)
+    guard.state, guard.opened_at = "open", time.monotonic()
+    with pytest.raises(server.CircuitOpenError):
+        guard.call(lambda: None)
+
+
+def test_upstream_guard_p95_follows_a_window_of_any_length(monkeypatch):
+    monkeypatch.setattr(server, "CIRCUIT_WINDOW_SECONDS", 0.05)
+    guard = server.UpstreamGuard("test", 5, True)
+    # The window holds a few dozen calls, rarely a multiple of 20
+    for index in range(400):
+        guard.record(0.1 if index < 200 else 0.3, True)
+        time.sleep(0.0015)
+    assert guard.p95 == 0.3
+
+
+def test_upstream_guard_does_not_hedge_before_warming_up():
+    guard = server.UpstreamGuard("test", 5, True)
+    for _ in range(19):
+        guard.record(0.1, True)
+    assert guard.take_hedge() is None
+    guard.record(0.1, True)
+    assert guard.take_hedge() == pytest.approx(0.1)
+
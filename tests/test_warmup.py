@@ -0,0 +1,50 @@
+import asyncio
+import json
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def warmup_state(monkeypatch):
+    state = {**server.warmup_state, "ready": False, "runs": 0}
+    monkeypatch.setattr(server, "warmup_state", state)
+    return state
+
+
+def test_warmup_fills_the_template_cache_once_per_trip(db, warmup_state, tmp_path, monkeypatch):
+    config = tmp_path / "warmup.json"
+    config.write_text(json.dumps([
+        {"destination": "Hampi", "theme": "heritage"},
+        {"destination": "Hampi", "theme": "heritage"},
+        {"theme": "spiritual"},
+    ]))
+    monkeypatch.setattr(server, "WARMUP_CONFIG_FILE", config)
+    server.template_cache.local.clear()
+
+    asyncio.run(server.run_warmup())
+
+    assert warmup_state["ready"]
+    assert (warmup_state["runs"], warmup_state["targets"], warmup_state["warmed"]) == (1, 1, 1)
+    assert server.template_cache.get(("Hampi", 25000, 3, "heritage", False)) is not None
+
+
+def test_warmup_failures_are_counted(db, warmup_state, tmp_path, monkeypatch):
+    config = tmp_path / "warmup.json"
+    config.write_text(json.dumps([{"destination": "Hampi", "duration": "three"}]))
+    monkeypatch.setattr(server, "WARMUP_CONFIG_FILE", config)
+
+    asyncio.run(server.run_warmup())
+
+    assert warmup_state["ready"]
+    assert (warmup_state["warmed"], warmup_state["failed"]) == (0, 1)
+
+
+def test_unreadable_warmup_config_is_ignored(tmp_path, monkeypatch):
+    config = tmp_path / "warmup.json"
+    config.write_text("not json")
+    monkeypatch.setattr(server, "WARMUP_CONFIG_FILE", config)
+    assert server.load_configured_warmup_targets() == []
+    monkeypatch.setattr(server, "WARMUP_CONFIG_FILE", tmp_path / "missing.json")
+    assert server.load_configured_warmup_targets() == []